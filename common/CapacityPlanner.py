@@ -0,0 +1,183 @@
+#####################################################################
+# CapacityPlanner
+#   Pre-flight check of the expanded input against VPN limits
+#   Before the first write, limits and current usage are read with a few
+#   bulk GETs:
+#     - config msgVpn  : maxMsgSpoolUsage (MB), maxEndpointCount,
+#                        maxSubscriptionCount
+#     - monitor msgVpn : current subscription count (capacity.usageAttrs)
+#     - config queues  : existing queues and their maxMsgSpoolUsage
+#                        (one paged GET projected to 2 attributes)
+#   The plan is charged with
+#     - endpoints    : new queues and new DMQs (templates.dmqueue)
+#     - spool        : maxMsgSpoolUsage of new queues + increase of existing
+#                      ones. The sum of queue quotas is checked against
+#                      VPN maxMsgSpoolUsage * capacity.spoolOversubscription
+#     - subscriptions: subscriptions of new queues. existing queues are
+#                      assumed to keep their count
+#   A resource fails the check only if the plan adds to it and the total
+#   goes over the limit: queue quotas are caps and VPNs are often
+#   oversubscribed already, a plan that adds nothing always fits.
+#   If the limits can't be read, plan raises ValueError (no check is
+#   not a passed check)
+#   Policy (capacity.policy or --capacity):
+#     reject: nothing is written if the plan doesn't fit
+#     trim  : new queues that don't fit are dropped (input order)
+#     warn  : report only
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import time
+
+sys.path.insert(0, os.path.abspath("."))
+from common import TraceHandler
+
+# Globals
+Verbose = 0
+log = None
+
+Resources = ['endpoints', 'spool', 'subscriptions']
+
+class CapacityPlanner():
+
+    def __init__(self, semp_h, cfg, verbose = 0):
+        global Verbose
+        global log
+        Verbose = verbose
+        log = cfg['log_handler'].get()
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        self.semp_h = semp_h
+        self.cfg = cfg
+        self.capacity_cfg = cfg['system'].get('capacity', {})
+        sys_cfg = cfg['system']
+        self.vpn_url = '{}/{}/msgVpns/{}'.format(cfg['router']['sempUrl'], sys_cfg['semp']['configUrl'], cfg['router']['vpn'])
+        self.vpn_monitor_url = '{}/{}/msgVpns/{}'.format(cfg['router']['sempUrl'], sys_cfg['semp']['monitorUrl'], cfg['router']['vpn'])
+
+    #--------------------------------------------------------------------
+    # read_limits
+    # VPN limits and current usage
+    # returns ({resource: limit}, {resource: in use}, {queueName: spool MB})
+    # raises ValueError if the VPN or its queues can't be read
+    #--------------------------------------------------------------------
+    def read_limits (self):
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        semp_h = self.semp_h
+        vpn = semp_h.get_config_json(self.vpn_url, select=['maxMsgSpoolUsage', 'maxEndpointCount', 'maxSubscriptionCount'],
+                                     strict=True).get('data', {})
+        spool = vpn.get('maxMsgSpoolUsage')
+        oversub = self.capacity_cfg.get('spoolOversubscription', 1.0)
+        if spool is not None and oversub != 1:
+            spool = int(spool * oversub)
+        limits = {'endpoints': vpn.get('maxEndpointCount'),
+                  'spool': spool,
+                  'subscriptions': vpn.get('maxSubscriptionCount')}
+
+        queues = {}
+        for q in semp_h.get_collection_data(self.vpn_url + '/queues', select=['queueName', 'maxMsgSpoolUsage'], strict=True):
+            queues[q['queueName']] = q.get('maxMsgSpoolUsage') or 0
+        usage = {'endpoints': len(queues), 'spool': sum(queues.values()), 'subscriptions': None}
+
+        # current usage not derivable from config (eg: subscriptions) comes from monitor msgVpn
+        usage_attrs = {k: v for k, v in self.capacity_cfg.get('usageAttrs', {}).items() if v}
+        if usage_attrs:
+            monitor = semp_h.get_config_json(self.vpn_monitor_url, select=sorted(set(usage_attrs.values()))).get('data', {})
+            for resource, attr in usage_attrs.items():
+                if monitor.get(attr) is not None:
+                    usage[resource] = monitor[attr]
+        if usage['subscriptions'] is None:
+            log.info ('Capacity: current subscription count of VPN {} is unknown (capacity.usageAttrs.subscriptions). '
+                      'Checking the subscriptions added by the plan only'.format(self.cfg['router']['vpn']))
+            usage['subscriptions'] = 0
+        return limits, usage, queues
+
+    #--------------------------------------------------------------------
+    # plan
+    # charge expanded queues against the limits
+    # returns result dict:
+    #   fits      : plan fits as given
+    #   report    : {resource: {limit, inUse, plan, after}}
+    #   skipped   : new queues dropped (policy trim)
+    #   queue_defs: expanded queues to apply (policy trim), else None
+    #--------------------------------------------------------------------
+    def plan (self, queue_in, policy='reject'):
+        log.enter ('Entering {}::{} policy: {}'.format(__class__.__name__, inspect.stack()[0][3], policy))
+        cfg = self.cfg
+        t0 = time.time()
+        with TraceHandler.span('capacity_read'):
+            limits, usage, existing = self.read_limits()
+
+        dmq_template = cfg['templates'].get('dmqueue')
+        dmq_spool = (dmq_template or {}).get('maxMsgSpoolUsage', 0)
+        need = {r: 0 for r in Resources}     # whole plan
+        accepted = {r: 0 for r in Resources} # plan after trim
+        dmqs = set()       # new DMQs charged (whole plan)
+        dmqs_kept = set()  # new DMQs charged (after trim)
+        keep = []
+        skipped = []
+        for data in queue_in:
+            qname = data['queueName']
+            spool = data.get('maxMsgSpoolUsage', 0)
+            cost = {r: 0 for r in Resources}
+            if qname in existing:
+                cost['spool'] = max(0, spool - existing[qname])
+            else:
+                cost['endpoints'] = 1
+                cost['spool'] = spool
+                cost['subscriptions'] = len([t for t in data.get('subscriptionTopic', '').split(':') if t.strip()])
+            dmq = data.get('deadMsgQueue')
+            new_dmq = dmq_template is not None and dmq and not dmq.startswith('#') and dmq not in existing
+            if new_dmq and dmq not in dmqs:
+                dmqs.add(dmq)
+                need['endpoints'] += 1
+                need['spool'] += dmq_spool
+            for r in Resources:
+                need[r] += cost[r]
+
+            if policy != 'trim':
+                continue
+            if new_dmq and dmq not in dmqs_kept:
+                cost['endpoints'] += 1
+                cost['spool'] += dmq_spool
+            if qname not in existing and not self.fits(limits, usage, accepted, cost):
+                skipped.append(qname)
+                continue
+            if new_dmq:
+                dmqs_kept.add(dmq)
+            for r in Resources:
+                accepted[r] += cost[r]
+            keep.append(data)
+
+        report = {}
+        for r in Resources:
+            report[r] = {'limit': limits[r], 'inUse': usage[r], 'plan': need[r], 'after': usage[r] + need[r]}
+        fits = self.fits(limits, usage, need, {})
+        log.info ('Capacity: plan checked in {:.2f}s ({} new DMQs)'.format(time.time() - t0, len(dmqs)))
+        return {'fits': fits, 'report': report, 'skipped': skipped,
+                'queue_defs': keep if policy == 'trim' else None}
+
+    # only resources the plan adds to can fail
+    def fits (self, limits, usage, need, cost):
+        for r in Resources:
+            if self.exceeds(limits[r], usage[r], need[r] + cost.get(r, 0)):
+                return False
+        return True
+
+    def exceeds (self, limit, in_use, added):
+        return limit is not None and added > 0 and in_use + added > limit
+
+    #--------------------------------------------------------------------
+    # print_report
+    #--------------------------------------------------------------------
+    def print_report (self, result):
+        log.notice ('Capacity of VPN {}:'.format(self.cfg['router']['vpn']))
+        log.notice ('{:>20} : {:>12} {:>12} {:>12} {:>12}'.format('resource', 'limit', 'in use', 'plan', 'after'))
+        for r, rpt in result['report'].items():
+            over = self.exceeds(rpt['limit'], rpt['inUse'], rpt['plan'])
+            log.notice ('{:>20} : {:>12} {:>12} {:>12} {:>12}{}'.format(r, str(rpt['limit']), rpt['inUse'], rpt['plan'],
+                                                                         rpt['after'], '  EXCEEDED' if over else ''))
+        if result['skipped']:
+            log.warn ('Capacity: {} new queues dropped from the plan: {}'.format(len(result['skipped']),
+                      ', '.join(result['skipped'][:20]) + (' ...' if len(result['skipped']) > 20 else '')))
@@ -1,6 +1,7 @@
 ##############################################################################
 # JsonHandler
 #   JSON Handling functions
+#   JsonReader: prefetching reader for restores (see SempHandler.apply_links)
 #
 # Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
 ##############################################################################
@@ -11,6 +12,10 @@ import pprint
 import inspect
 from urllib.parse import unquote
 import pathlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 pp = pprint.PrettyPrinter(indent=4)
 Verbose = 0
@@ -84,7 +89,8 @@ class JsonHandler():
 
         with open(json_file, "r") as fp:
             json_payload = json.load(fp) 
-        log.debug ('read_json_data: json_data : {}'.format(json.dumps(json_payload, indent=2)))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug ('read_json_data: json_data : {}'.format(json.dumps(json_payload, indent=2)))
 
         if 'data' not in json_payload:
             log.warn ("Unable to parse json file: {}. Skipping".format(json_file))
@@ -107,7 +113,8 @@ class JsonHandler():
         obj['links'] = links
         obj['next_page_uri'] = next_page_uri
         #obj['next_pg'] = next_pg
-        log.trace ('read_json_data: Object:', json.dumps(obj, indent=2))
+        if log.isEnabledFor(logging.TRACE):
+            log.trace ('read_json_data: Object: {}'.format(json.dumps(obj, indent=2)))
         return obj
 
     def save_json_file (self,outfile, json_data):
@@ -136,3 +143,73 @@ class JsonHandler():
         if Verbose > 2:
             pp.pprint(json_files)
         return json_files
+
+class JsonReader():
+    """ prefetching reader of exported JSON files
+
+        Files of a directory are decoded by reader threads ahead of use
+        (up to prefetch files ahead), so the caller POSTs the current file
+        while the next ones are read. Decoded files and directory listings
+        are kept (up to cacheFiles files) and reused when the same path is
+        visited again
+    """
+
+    def __init__(self, json_h, prefetch=8, readers=1, cache_files=1000):
+        self.json_h = json_h
+        self.prefetch = prefetch
+        self.cache_files = cache_files
+        self.pool = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='json-reader')
+        self.lock = threading.Lock()
+        self.files = OrderedDict() # path -> future of read_json_data
+        self.lists = {}            # (path, obj) -> [json files]
+        self.stats = {'listed': 0, 'read': 0, 'reused': 0, 'waited': 0}
+
+    # list_json_files, cached per (path, obj)
+    def list_json_files (self, path, obj):
+        key = (str(path), obj)
+        with self.lock:
+            if key in self.lists:
+                return self.lists[key]
+        files = self.json_h.list_json_files(path, obj)
+        with self.lock:
+            self.lists[key] = files
+            self.stats['listed'] += 1
+        return files
+
+    def submit (self, json_file):
+        key = str(json_file)
+        with self.lock:
+            f = self.files.get(key)
+            if f is not None:
+                self.files.move_to_end(key)
+                return f, True
+            f = self.pool.submit(self.json_h.read_json_data, key)
+            self.files[key] = f
+            self.stats['read'] += 1
+            while len(self.files) > self.cache_files:
+                self.files.popitem(last=False)
+            return f, False
+
+    #--------------------------------------------------------------------
+    # read
+    # yields (json_file, decoded object) in order. upcoming files are
+    # read in the background while the caller works on the current one
+    #--------------------------------------------------------------------
+    def read (self, json_files):
+        json_files = list(json_files)
+        futures = []
+        for i, json_file in enumerate(json_files):
+            # keep the window ahead of the current file submitted
+            while len(futures) < min(len(json_files), i + 1 + self.prefetch):
+                futures.append(self.submit(json_files[len(futures)]))
+            f, reused = futures[i]
+            if reused:
+                self.stats['reused'] += 1
+            if not f.done():
+                self.stats['waited'] += 1
+            yield json_file, f.result()
+
+    def print_stats (self, log):
+        log.notice ("JSON Reader Stats:")
+        for k,v in self.stats.items():
+            log.notice("{:>20} : {}".format(k, v))
@@ -1,12 +1,21 @@
 ########################################################################
 # LogHandler
 #  Log file handling
+#  Log file is rotated by size (system.logMaxBytes) keeping
+#  system.logBackupCount gzipped segments. With rotation on, each app
+#  appends to logs/<app>.log across runs so the limits apply to the
+#  app, not to one run. Repetitive per request INFO
+#  lines are sampled (see sampled())
 #
 # Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
 ########################################################################
 
 import os, sys, inspect, traceback
 import logging
+import logging.handlers
+import threading
+import gzip
+import shutil
 import time
 import json
 
@@ -31,9 +40,18 @@ class LogHandler :
          if 'verbose' in cfg :
             self.m_verbose = cfg['verbose']
          logdir = cfg['system']['system']['logDir']
+         self.m_max_bytes = cfg['system']['system'].get('logMaxBytes', 0)
+         self.m_backup_count = cfg['system']['system'].get('logBackupCount', 5)
+         self.m_sample_every = cfg['system']['system'].get('logSampleEvery', 1)
+         self.m_samples = {}
+         self.m_sample_lock = threading.Lock()
 
          #ts = 'now' # for testing
-         self.m_logfile = './{}/{}-{}.log'.format(logdir, self.m_appname, ts())
+         # rotated log uses a stable name per app, else one file per run
+         if self.m_max_bytes:
+            self.m_logfile = './{}/{}.log'.format(logdir, self.m_appname)
+         else:
+            self.m_logfile = './{}/{}-{}.log'.format(logdir, self.m_appname, ts())
          print (f'Opening log file for {self.m_appname} : {self.m_logfile}')
          self.m_init = False
          # create log dir if it doesn't exist
@@ -77,7 +95,9 @@ class LogHandler :
 
       self.m_logger = logging.getLogger(self.m_appname)
 
-      self.m_logger.trace = lambda msg, *args: self.m_logger._log(logging.TRACE, msg, args)
+      # custom levels check the level first (Logger._log doesn't) so
+      # disabled trace / enter lines don't build log records
+      self.m_logger.trace = lambda msg, *args: self.log(logging.TRACE, msg, args)
       # additional traces
       self.m_logger.dump_json = lambda msg, *args: self.m_logger._log(logging.TRACE, msg, json.dumps(args, indent=2))
       self.m_logger.dump_list = lambda msg, *args: self.m_logger._log(logging.TRACE, msg, json.dumps(list(args), indent=2))
@@ -85,9 +105,10 @@ class LogHandler :
       self.m_logger.dump_xml = lambda msg, *args: self.m_logger._log(logging.TRACE, msg, json.dumps(args, indent=2))
 
       #self.m_logger.audit = lambda msg, *args: self.m_logger._log(logging.AUDIT, msg, args)
-      self.m_logger.notice = lambda msg, *args: self.m_logger._log(logging.NOTICE, msg, args)
-      self.m_logger.status = lambda msg, *args: self.m_logger._log(logging.STATUS, msg, args)
-      self.m_logger.enter = lambda msg, *args: self.m_logger._log(logging.ENTER, msg, args)
+      self.m_logger.notice = lambda msg, *args: self.log(logging.NOTICE, msg, args)
+      self.m_logger.status = lambda msg, *args: self.log(logging.STATUS, msg, args)
+      self.m_logger.enter = lambda msg, *args: self.log(logging.ENTER, msg, args)
+      self.m_logger.sampled = self.sampled
       self.m_logger.setLevel(logging.INFO)
 
       formatter = logging.Formatter('%(asctime)s : %(name)s [%(levelname)s] %(message)s')
@@ -96,8 +117,13 @@ class LogHandler :
 
       #stream_formatter = logging.Formatter('%(message)s')
 
-      # file handler
-      fh = logging.FileHandler(self.m_logfile)
+      # file handler. rotated by size, old segments are gzipped
+      if self.m_max_bytes:
+         fh = logging.handlers.RotatingFileHandler(self.m_logfile, maxBytes=self.m_max_bytes, backupCount=self.m_backup_count)
+         fh.namer = lambda name: name + '.gz'
+         fh.rotator = gzip_rotator
+      else:
+         fh = logging.FileHandler(self.m_logfile)
       fh.setLevel(logging.INFO)
       if self.m_verbose > 2 :
          print ("** Setting file log level to TRACE ***")
@@ -127,6 +153,25 @@ class LogHandler :
 
       self.m_init = True
 
+   def log(self, level, msg, args):
+      if self.m_logger.isEnabledFor(level):
+         self.m_logger._log(level, msg, args)
+
+   # ------------------------------------------------------------------------------
+   # sampled
+   #   True for 1 in logSampleEvery calls per key (and always at DEBUG)
+   #   Use for repetitive INFO lines. Errors should not be sampled
+   #     if log.sampled('post'):
+   #        log.info ('SEMP POST returned: {}'.format(...))
+   #
+   def sampled(self, key):
+      if self.m_sample_every <= 1 or self.m_logger.isEnabledFor(logging.DEBUG):
+         return True
+      with self.m_sample_lock:
+         n = self.m_samples.get(key, 0)
+         self.m_samples[key] = n + 1
+      return n % self.m_sample_every == 0
+
    # ------------------------------------------------------------------------------
    # Return logging.logger to apps
    #
@@ -169,4 +214,13 @@ class LogHandler :
          traceback.print_exc(file=fh)
          fh.close()
 
-      sys.exit(2)
\ No newline at end of file
+      sys.exit(2)
+
+# ------------------------------------------------------------------------------
+# gzip_rotator
+#   compress rotated log segment
+#
+def gzip_rotator (source, dest):
+   with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+      shutil.copyfileobj(f_in, f_out)
+   os.remove(source)
@@ -0,0 +1,345 @@
+#####################################################################
+# ObjectConfig
+#   Declarative provisioning of VPN objects (aclProfiles, clientProfiles,
+#   clientUsernames, restDeliveryPoints, queues, ...) and their child
+#   collections
+#
+#   Schema   : registry of object types (system schema). Per type:
+#              URL path, identifying key(s), template, enable attributes,
+#              template attributes not sent and child collections.
+#              Attributes that need the object disabled to change come
+#              from semp.requiresDisable.<type>
+#   ObjectInput: expands input objects (name generators as in QueueInput)
+#              on top of templates.<template>
+#   Objects  : one reconcile engine for every type
+#              - one paged GET per type, projected to key + input attrs
+#              - objects of a type are created / patched by a pool of
+#                semp.workers threads (bounded in flight)
+#              - only changed attributes are patched. object is disabled
+#                only if a changed attribute requires it
+#              - child collections listed in the input are reconciled:
+#                missing added, changed patched, extra deleted (patch mode)
+#              - types are applied in schema order (referenced types first)
+#
+#   Input yaml:
+#     objects:
+#       aclProfiles:
+#         - name: team1-acl
+#           template: {clientConnectDefaultAction: allow}
+#           children:
+#             subscribeTopicExceptions:
+#               - {subscribeTopicExceptionSyntax: smf, subscribeTopicException: team1/>}
+#       clientUsernames:
+#         - name: team1-user{1..3}
+#           template: {aclProfileName: team1-acl}
+#     templates:
+#       clientUsernames: {...}   # defaults per type (schema template)
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import time
+import threading
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+sys.path.insert(0, os.path.abspath("."))
+from common import QueueInput
+from common import TraceHandler
+from common import ProgressHandler
+
+# Globals
+Verbose = 0
+log = None
+Stats = {'created': 0, 'patched': 0, 'disabled': 0, 'unchanged': 0, 'deleted': 0, 'failed': 0}
+StatsLock = threading.Lock()
+
+class Schema():
+    """ object type registry (system schema) """
+
+    def __init__(self, cfg):
+        self.types = cfg['system']['schema']
+        self.requires_disable = cfg['system']['semp'].get('requiresDisable', {})
+
+    def names (self):
+        return list(self.types.keys())
+
+    def get (self, obj_type, parent=None):
+        spec = parent['children'][obj_type] if parent else self.types.get(obj_type)
+        if spec is None:
+            raise ValueError('Unknown object type {}'.format(obj_type))
+        return spec
+
+    # identifying attributes of a type
+    def keys (self, spec):
+        key = spec['key']
+        return key if type(key) is list else [key]
+
+    # URL segment of an object: key values joined with ','
+    def url_key (self, spec, data):
+        return ','.join(quote(str(data[k]), safe='') for k in self.keys(spec))
+
+    def label (self, spec, data):
+        return ','.join(str(data.get(k)) for k in self.keys(spec))
+
+    def disable_attrs (self, obj_type):
+        return self.requires_disable.get(obj_type, [])
+
+class ObjectInput():
+    """ objects from user input, expanded on top of templates """
+
+    def __init__(self, cfg, objects, verbose = 0):
+        self.cfg = cfg
+        self.objects = objects if objects else {}
+        self.schema = Schema(cfg)
+        # name generators ({0..9} {a,b}) and {index} substitution as in queues
+        self.names = QueueInput.QueueInput(cfg, None, verbose)
+
+    #--------------------------------------------------------------------
+    # expand
+    # yields (data, children) of obj_type
+    # children: {child type: [child data]}
+    #--------------------------------------------------------------------
+    def expand (self, obj_type):
+        schema = self.schema
+        spec = schema.get(obj_type)
+        key = schema.keys(spec)[0]
+        template = self.cfg['templates'].get(spec.get('template', obj_type), {})
+        for entry in self.objects.get(obj_type, []):
+            if type(entry) is not dict:
+                entry = {'name': str(entry)}
+            for name, values in self.names.expand_name(entry['name']):
+                data = {k: v for k, v in template.items() if k not in spec.get('exclude', [])}
+                for k, v in (entry.get('template') or {}).items():
+                    data[k] = self.names.substitute(v, values)
+                data[key] = name
+                data['msgVpnName'] = self.cfg['router']['vpn']
+                for attr in spec.get('enableAttrs', []):
+                    data.setdefault(attr, True)
+                children = {}
+                for child_type, child_entries in (entry.get('children') or {}).items():
+                    children[child_type] = [self.child_data(spec, child_type, c, values) for c in child_entries or []]
+                yield data, children
+
+    def child_data (self, spec, child_type, entry, values):
+        child_spec = self.schema.get(child_type, spec)
+        template = self.cfg['templates'].get(child_spec.get('template', child_type), {})
+        data = dict(template)
+        if type(entry) is not dict:
+            # leaf shorthand: list of key values (eg: subscription topics)
+            entry = {self.schema.keys(child_spec)[0]: entry}
+        for k, v in entry.items():
+            data[k] = self.names.substitute(v, values)
+        for attr in child_spec.get('enableAttrs', []):
+            data.setdefault(attr, True)
+        return data
+
+    def types (self):
+        # schema order. referenced types (profiles) before users of them
+        unknown = [t for t in self.objects if t not in self.schema.types]
+        if unknown:
+            raise ValueError('Unknown object types {} (see system schema)'.format(unknown))
+        return [t for t in self.schema.names() if self.objects.get(t)]
+
+class Objects():
+
+    def __init__(self, semp_h, cfg, verbose = 0, progress = True):
+        global Verbose
+        global log
+        Verbose = verbose
+        log = cfg['log_handler'].get()
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        self.semp_h = semp_h
+        self.cfg = cfg
+        self.schema = Schema(cfg)
+        self.progress = progress
+        self.vpn_url = '{}/{}/msgVpns/{}'.format(cfg['router']['sempUrl'], cfg['system']['semp']['configUrl'], cfg['router']['vpn'])
+        self.failed = set() # (type, name)
+
+    def count (self, key):
+        with StatsLock:
+            Stats[key] += 1
+
+    #--------------------------------------------------------------------
+    # read_collection
+    # existing objects of a collection {url key: data}, projected to the
+    # key + attrs. one GET per page
+    #--------------------------------------------------------------------
+    def read_collection (self, url, spec, attrs):
+        keys = self.schema.keys(spec)
+        select = keys + sorted(a for a in attrs if a not in keys and a != 'msgVpnName')
+        current = {}
+        for d in self.semp_h.get_collection_data(url, select=select):
+            current[self.schema.url_key(spec, d)] = d
+        return current
+
+    #--------------------------------------------------------------------
+    # apply
+    # reconcile all types in input (schema order)
+    #--------------------------------------------------------------------
+    def apply (self, object_in, patch_it, only=None):
+        for obj_type in object_in.types():
+            if only and obj_type not in only:
+                continue
+            with TraceHandler.span('reconcile', 'objects', type=obj_type):
+                self.reconcile(obj_type, object_in.expand(obj_type), patch_it)
+        log.notice ('{} objects failed'.format(len(self.failed)))
+        return self.failed
+
+    #--------------------------------------------------------------------
+    # reconcile
+    # create / patch objects of one type and their children
+    #--------------------------------------------------------------------
+    def reconcile (self, obj_type, objects, patch_it):
+        log.enter ('Entering {}::{} type: {}'.format(__class__.__name__, inspect.stack()[0][3], obj_type))
+        spec = self.schema.get(obj_type)
+        url = '{}/{}'.format(self.vpn_url, spec.get('path', obj_type))
+        objects = list(objects)
+        attrs = set()
+        for data, _ in objects:
+            attrs.update(data.keys())
+        t0 = time.time()
+        with TraceHandler.span('read_collection', 'objects', type=obj_type):
+            current = self.read_collection(url, spec, attrs)
+        log.info ('{}: {} in input, {} in VPN {}'.format(obj_type, len(objects), len(current), self.cfg['router']['vpn']))
+
+        workers = self.cfg['system']['semp']['workers']
+        progress_h = ProgressHandler.ProgressHandler(self.cfg, obj_type, len(objects), self.semp_h.calls).start() \
+                     if self.progress else ProgressHandler.No_Progress
+        pending = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for data, children in objects:
+                f = pool.submit(self.reconcile_object, obj_type, spec, url, data, children,
+                                current.get(self.schema.url_key(spec, data)), patch_it)
+                f.label = self.schema.label(spec, data)
+                pending.add(f)
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self.check_futures(obj_type, done, progress_h)
+            done, pending = wait(pending)
+            self.check_futures(obj_type, done, progress_h)
+        progress_h.stop()
+        log.notice ('{}: {} objects reconciled in {:.2f}s'.format(obj_type, len(objects), time.time() - t0))
+
+    def check_futures (self, obj_type, done, progress_h):
+        for f in done:
+            ok = f.exception() is None and f.result()
+            if f.exception() is not None:
+                log.error ('{} {}: failed: {}'.format(obj_type, f.label, f.exception()))
+            if not ok:
+                self.count('failed')
+                self.failed.add((obj_type, f.label))
+            progress_h.done(ok)
+
+    #--------------------------------------------------------------------
+    # reconcile_object
+    # one object (and its children). current: existing object or None
+    # returns True if the object is as desired
+    #--------------------------------------------------------------------
+    def reconcile_object (self, obj_type, spec, url, data, children, current, patch_it):
+        label = self.schema.label(spec, data)
+        with TraceHandler.span(obj_type, 'objects', object=label):
+            obj_url = '{}/{}'.format(url, self.schema.url_key(spec, data))
+            if current is None:
+                resp = self.semp_h.http_post(url, data)
+                if resp != 'OK':
+                    log.warn ('{} {}: {}'.format(obj_type, label, resp))
+                    return False
+                self.count('created')
+                status = 'created'
+            elif patch_it:
+                status = self.update_object(obj_type, spec, obj_url, data, current)
+            else:
+                self.count('unchanged')
+                status = 'exists'
+            ok = True
+            for child_type, child_data in children.items():
+                ok = self.reconcile_children(child_type, self.schema.get(child_type, spec), obj_url,
+                                             child_data, current is not None, patch_it) and ok
+            log.info ('{} {}: {}'.format(obj_type, label, status))
+            return ok
+
+    #--------------------------------------------------------------------
+    # update_object
+    # patch changed attributes only. attributes not returned by GET
+    # (write only, eg: password) are not compared
+    #--------------------------------------------------------------------
+    def update_object (self, obj_type, spec, obj_url, data, current):
+        keys = self.schema.keys(spec)
+        changed = {k: v for k, v in data.items() if k not in keys and k != 'msgVpnName' and k in current and current[k] != v}
+        if not changed:
+            self.count('unchanged')
+            return 'unchanged'
+        for k in keys + ['msgVpnName']:
+            if k in data:
+                changed[k] = data[k]
+        enable_attrs = spec.get('enableAttrs', [])
+        requires_disable = [k for k in changed if k in self.schema.disable_attrs(obj_type)]
+        if not requires_disable or not enable_attrs:
+            self.count('patched')
+            self.check_patch(self.semp_h.http_patch(obj_url, changed))
+            return 'patched {}'.format(sorted(k for k in changed if k not in keys and k != 'msgVpnName'))
+
+        # disable, patch and restore enable attributes
+        self.count('disabled')
+        t0 = time.time()
+        disable = {k: data[k] for k in keys + ['msgVpnName'] if k in data}
+        disable.update({k: False for k in enable_attrs})
+        self.check_patch(self.semp_h.http_patch(obj_url, disable))
+        for k in enable_attrs:
+            changed[k] = data.get(k, True)
+        resp = self.semp_h.http_patch(obj_url, changed)
+        if resp.status_code != 200:
+            # don't leave the object disabled: restore enable attributes
+            restore = {k: v for k, v in disable.items() if k not in enable_attrs}
+            restore.update({k: current.get(k, True) for k in enable_attrs})
+            if self.semp_h.http_patch(obj_url, restore).status_code != 200:
+                log.error ('{} {}: could not be enabled again after a failed patch. It is DISABLED'.format(obj_type, obj_url))
+            self.check_patch(resp)
+        return 'patched {} (disabled {:.3f}s)'.format(sorted(requires_disable), time.time() - t0)
+
+    def check_patch (self, resp):
+        if resp.status_code != 200:
+            raise ValueError('patch failed ({})'.format(resp.status_code))
+
+    #--------------------------------------------------------------------
+    # reconcile_children
+    # child collection of an object: add missing, patch changed (non
+    # leaf), delete extra (patch mode). existing: parent existed before
+    #--------------------------------------------------------------------
+    def reconcile_children (self, child_type, spec, parent_url, children, existing, patch_it):
+        url = '{}/{}'.format(parent_url, spec.get('path', child_type))
+        current = {}
+        if existing:
+            attrs = set()
+            for data in children:
+                attrs.update(data.keys())
+            current = self.read_collection(url, spec, attrs if not spec.get('leaf') else [])
+        ok = True
+        desired = set()
+        for data in children:
+            key = self.schema.url_key(spec, data)
+            desired.add(key)
+            if key not in current:
+                resp = self.semp_h.http_post(url, data)
+                if resp not in ['OK'] + self.cfg['system']['status']['statusOk']:
+                    log.warn ('{} {}: {}'.format(child_type, self.schema.label(spec, data), resp))
+                    ok = False
+            elif patch_it and not spec.get('leaf'):
+                self.update_object(child_type, spec, '{}/{}'.format(url, key), data, current[key])
+        if patch_it:
+            for key in current:
+                if key not in desired:
+                    log.debug ('Deleting {} {}'.format(child_type, key))
+                    if self.semp_h.http_delete('{}/{}'.format(url, key)).status_code != 200:
+                        ok = False
+                        continue
+                    self.count('deleted')
+        return ok
+
+    def print_stats (self):
+        log.notice ('Object Stats:')
+        for k,v in Stats.items():
+            log.notice('{:>20} : {}'.format(k, v))
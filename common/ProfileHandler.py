@@ -0,0 +1,232 @@
+########################################################################
+# ProfileHandler
+#  CPU and memory profiling for scripts using common/*
+#   cpu    : deterministic profiler (cProfile) on main and worker threads
+#            (Python 3.12+: one sys.monitoring based profile covers all
+#            threads. older: one profile per thread)
+#   sample : sampling profiler (all threads, low overhead)
+#  Writes a pstats file (cpu) or collapsed stacks (sample) plus a sorted
+#  top-N hotspot summary. tracemalloc snapshots are taken at phase
+#  boundaries (ProfileHandler.phase('config_load'))
+#  add_arguments / run_main give every script the same --trace /
+#  --profile options and entry point wrapper
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+########################################################################
+
+import os, sys
+import io
+import time
+import threading
+import tracemalloc
+import cProfile
+import pstats
+from collections import Counter
+
+sys.path.insert(0, os.path.abspath("."))
+from common import TraceHandler
+
+# active profiler (None when profiling is off)
+Profiler = None
+
+class ProfileHandler :
+   'CPU / memory profiler wrapper'
+
+   def __init__ (self, mode, outdir, appname, top_n=25, interval=0.005):
+      self.mode = mode
+      self.top_n = top_n
+      self.interval = interval
+      os.makedirs(outdir, exist_ok=True)
+      self.m_prefix = '{}/{}-{}'.format(outdir, appname, time.strftime("%Y%m%d-%H%M%S"))
+      self.profiles = []        # cProfile.Profile per thread (cpu)
+      self.samples = Counter()  # collapsed stack -> count (sample)
+      self.self_samples = Counter()
+      self.nsamples = 0
+      self.phases = []          # (phase, current, peak, top allocations)
+      self.last_snapshot = None
+      self.lock = threading.Lock()
+      self.running = False
+
+   # ------------------------------------------------------------------------------
+   # start / stop
+   #
+   def start (self):
+      global Profiler
+      Profiler = self
+      tracemalloc.start()
+      self.t0 = time.time()
+      self.running = True
+      if self.mode == 'cpu':
+         if sys.version_info < (3, 12):
+            threading.setprofile(self.thread_profile)
+         prof = cProfile.Profile()
+         self.profiles.append(prof)
+         prof.enable()
+      else:
+         self.sampler = threading.Thread(target=self.sample_loop, name='profile-sampler', daemon=True)
+         self.sampler.start()
+      return self
+
+   def stop (self):
+      global Profiler
+      self.running = False
+      if self.mode == 'cpu':
+         if sys.version_info < (3, 12):
+            threading.setprofile(None)
+         self.profiles[0].disable()
+      else:
+         self.sampler.join()
+      self.elapsed = time.time() - self.t0
+      self.phase('end')
+      tracemalloc.stop()
+      Profiler = None
+      self.save()
+
+   # ------------------------------------------------------------------------------
+   # thread_profile
+   #   installed with threading.setprofile. First call in a new thread
+   #   replaces itself with a cProfile.Profile for that thread.
+   #   Python < 3.12 only: on 3.12+ cProfile uses sys.monitoring (one
+   #   profiler per interpreter) and a second enable() raises ValueError
+   #
+   def thread_profile (self, frame, event, arg):
+      prof = cProfile.Profile()
+      with self.lock:
+         self.profiles.append(prof)
+      prof.enable()
+
+   # ------------------------------------------------------------------------------
+   # sample_loop
+   #   sample stacks of all threads every interval seconds
+   #
+   def sample_loop (self):
+      me = threading.get_ident()
+      while self.running:
+         for tid, frame in sys._current_frames().items():
+            if tid == me:
+               continue
+            stack = []
+            f = frame
+            while f is not None:
+               stack.append('{}:{}'.format(f.f_code.co_name, os.path.basename(f.f_code.co_filename)))
+               f = f.f_back
+            if not stack:
+               continue
+            self.self_samples['{} ({}:{})'.format(frame.f_code.co_name, frame.f_code.co_filename, frame.f_lineno)] += 1
+            self.samples[';'.join(reversed(stack))] += 1
+            self.nsamples += 1
+         time.sleep(self.interval)
+
+   # ------------------------------------------------------------------------------
+   # snapshot
+   #   tracemalloc snapshot at a phase boundary
+   #
+   def snapshot (self, name):
+      if not tracemalloc.is_tracing():
+         return
+      current, peak = tracemalloc.get_traced_memory()
+      snap = tracemalloc.take_snapshot().filter_traces([
+         tracemalloc.Filter(False, tracemalloc.__file__),
+         tracemalloc.Filter(False, '<frozen importlib._bootstrap>')])
+      if self.last_snapshot is None:
+         top = snap.statistics('lineno')[:10]
+      else:
+         top = snap.compare_to(self.last_snapshot, 'lineno')[:10]
+      self.last_snapshot = snap
+      self.phases.append((name, current, peak, [str(t) for t in top]))
+      print ('Profile phase {}: memory current {:.1f} KB peak {:.1f} KB'.format(name, current / 1024, peak / 1024))
+
+   # ------------------------------------------------------------------------------
+   # save
+   #   pstats (cpu) or collapsed stacks (sample) + summary text
+   #
+   def save (self):
+      summary = io.StringIO()
+      summary.write('Profile mode: {}  elapsed: {:.3f}s\n\n'.format(self.mode, self.elapsed))
+      if self.mode == 'cpu':
+         stats = None
+         for prof in self.profiles:
+            try:
+               if stats is None:
+                  stats = pstats.Stats(prof, stream=summary)
+               else:
+                  stats.add(prof)
+            except TypeError:
+               pass # thread profile without data
+         if stats is None:
+            print ('Profile: no cpu profile data collected')
+            summary.write('No cpu profile data collected\n')
+         else:
+            stats_file = '{}.pstats'.format(self.m_prefix)
+            stats.dump_stats(stats_file)
+            print ('Profile stats written to {}'.format(stats_file))
+            summary.write('Threads profiled: {}\n'.format(len(self.profiles)))
+            stats.sort_stats('cumulative').print_stats(self.top_n)
+            stats.sort_stats('tottime').print_stats(self.top_n)
+      else:
+         stacks_file = '{}.stacks'.format(self.m_prefix)
+         with open(stacks_file, 'w') as fp:
+            for stack, n in self.samples.most_common():
+               fp.write('{} {}\n'.format(stack, n))
+         print ('Profile stacks (collapsed, for flamegraph) written to {}'.format(stacks_file))
+         summary.write('Samples: {} (every {}s)\n\n'.format(self.nsamples, self.interval))
+         summary.write('Top {} functions by self samples:\n'.format(self.top_n))
+         for where, n in self.self_samples.most_common(self.top_n):
+            summary.write('{:>8} {:6.1f}%  {}\n'.format(n, 100.0 * n / max(1, self.nsamples), where))
+
+      summary.write('\nMemory by phase (tracemalloc):\n')
+      for name, current, peak, top in self.phases:
+         summary.write('\n[{}] current {:.1f} KB peak {:.1f} KB\n'.format(name, current / 1024, peak / 1024))
+         for t in top:
+            summary.write('    {}\n'.format(t))
+
+      summary_file = '{}-summary.txt'.format(self.m_prefix)
+      with open(summary_file, 'w') as fp:
+         fp.write(summary.getvalue())
+      print ('Profile summary written to {}'.format(summary_file))
+
+   # phase boundary - see phase() below
+   def phase (self, name):
+      self.snapshot(name)
+
+# ------------------------------------------------------------------------------
+# phase
+#   mark a phase boundary. no-op when profiling is off
+#
+def phase (name):
+   profiler = Profiler
+   if profiler is not None:
+      profiler.phase(name)
+
+# ------------------------------------------------------------------------------
+# add_arguments
+#   --trace / --profile / --profile-dir for a script entry point
+#
+def add_arguments (p, trace_help='write Chrome trace-event JSON (SEMP calls, local phases) to this file'):
+   p.add_argument('--trace', dest="trace_file", required=False, default=None,
+                  help=trace_help)
+   p.add_argument('--profile', dest="profile", choices=['cpu', 'sample'], required=False, default=None,
+                  help='profile the run: cpu (deterministic) or sample (sampling). Memory is snapshot at phase boundaries')
+   p.add_argument('--profile-dir', dest="profile_dir", required=False, default='logs/profile',
+                  help='directory for profile output (default: logs/profile)')
+
+# ------------------------------------------------------------------------------
+# run_main
+#   run(r) with the tracer / profiler asked for on the command line.
+#   trace and profile are saved even if run fails or exits
+#
+def run_main (r, appname, run):
+   trace_h = None
+   if r.trace_file:
+      trace_h = TraceHandler.TraceHandler(r.trace_file).start()
+   prof_h = None
+   if r.profile:
+      prof_h = ProfileHandler(r.profile, r.profile_dir, appname).start()
+   try:
+      return run(r)
+   finally:
+      if prof_h:
+         prof_h.stop()
+      if trace_h:
+         trace_h.stop()
+         trace_h.save()
@@ -0,0 +1,130 @@
+########################################################################
+# ProgressHandler
+#  Progress of a provisioning loop: items/s, SEMP calls/s, error rate
+#  and ETA over a sliding window (system progress.window seconds)
+#
+#  On a TTY one status line is updated in place. Otherwise (CI logs,
+#  redirected output) a line is printed every progress.interval seconds.
+#  Workers only bump counters (done()). Rates are computed and printed
+#  by a reporter thread, so cost per item is one lock + 2 increments
+#
+#  progress_h = ProgressHandler.ProgressHandler(cfg, 'queues', total, semp_calls).start()
+#  ... progress_h.done(ok) per item ...
+#  progress_h.stop()
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+########################################################################
+
+import sys
+import time
+import threading
+from collections import deque
+
+class ProgressHandler :
+   'sliding window progress reporter'
+
+   def __init__ (self, cfg, label, total=None, calls=None, stream=None):
+      progress_cfg = cfg['system'].get('progress', {})
+      self.label = label
+      self.total = total
+      self.calls = calls   # callable returning SEMP calls so far (optional)
+      self.stream = stream or sys.stdout
+      self.tty = self.stream.isatty()
+      self.window = progress_cfg.get('window', 30)
+      self.interval = progress_cfg.get('ttyInterval', 0.5) if self.tty else progress_cfg.get('interval', 10)
+      self.n = 0
+      self.errors = 0
+      self.lock = threading.Lock()
+      self.stopped = threading.Event()
+      self.samples = deque() # (time, done, errors, calls)
+      self.width = 0
+
+   def start (self):
+      self.t0 = time.time()
+      self.calls0 = self.calls() if self.calls else 0
+      self.samples.append((self.t0, 0, 0, self.calls0))
+      self.thread = threading.Thread(target=self.run, name='progress', daemon=True)
+      self.thread.start()
+      return self
+
+   def done (self, ok=True):
+      with self.lock:
+         self.n += 1
+         if not ok:
+            self.errors += 1
+
+   def stop (self):
+      self.stopped.set()
+      self.thread.join()
+      self.report(final=True)
+
+   # ------------------------------------------------------------------------------
+   # reporter thread
+   # ------------------------------------------------------------------------------
+   def run (self):
+      while not self.stopped.wait(self.interval):
+         self.report()
+
+   def sample (self):
+      now = time.time()
+      with self.lock:
+         n, errors = self.n, self.errors
+      calls = self.calls() if self.calls else 0
+      self.samples.append((now, n, errors, calls))
+      while len(self.samples) > 2 and self.samples[1][0] < now - self.window:
+         self.samples.popleft()
+      return self.samples[0], self.samples[-1]
+
+   def report (self, final=False):
+      first, last = self.sample()
+      now, n, errors, calls = last
+      if final:
+         # whole run
+         first = (self.t0, 0, 0, self.calls0)
+      elapsed = now - first[0]
+      rate = (n - first[1]) / elapsed if elapsed > 0 else 0
+      call_rate = (calls - first[3]) / elapsed if elapsed > 0 else 0
+      done_w = n - first[1]
+      err_rate = 100.0 * (errors - first[2]) / done_w if done_w else 0
+
+      line = '{}: {}{}'.format(self.label, n, '/{}'.format(self.total) if self.total else '')
+      if self.total:
+         line += ' ({:.0f}%)'.format(100.0 * n / self.total if self.total else 100)
+      line += ' | {:.1f} {}/s'.format(rate, self.label)
+      if self.calls:
+         line += ' | {:.1f} SEMP calls/s'.format(call_rate)
+      line += ' | errors {} ({:.1f}%)'.format(errors, err_rate)
+      if final:
+         line += ' | {:.1f}s'.format(now - self.t0)
+      elif self.total and rate > 0:
+         line += ' | ETA {}'.format(self.eta((self.total - n) / rate))
+
+      if self.tty:
+         pad = max(0, self.width - len(line))
+         self.width = len(line)
+         self.stream.write('\r' + line + ' ' * pad + ('\n' if final else ''))
+      else:
+         self.stream.write(line + '\n')
+      self.stream.flush()
+
+   def eta (self, seconds):
+      seconds = int(seconds)
+      if seconds >= 3600:
+         return '{}h{:02d}m'.format(seconds // 3600, seconds % 3600 // 60)
+      if seconds >= 60:
+         return '{}m{:02d}s'.format(seconds // 60, seconds % 60)
+      return '{}s'.format(seconds)
+
+class NoProgress :
+   'progress used when reporting is off'
+
+   def start (self):
+      return self
+
+   def done (self, ok=True):
+      pass
+
+   def stop (self):
+      pass
+
+No_Progress = NoProgress()
@@ -0,0 +1,274 @@
+#####################################################################
+# ProvisionDaemon
+#   Long running provisioner
+#   Watches an input directory (polling mtimes) and / or takes reconcile
+#   requests on a local HTTP endpoint. SEMP connections (SempHandler
+#   session) and the live broker index (QueueState) stay warm between
+#   changes. When an input file changes, only queues whose expanded
+#   definition changed since the last apply are reconciled.
+#   Queues that failed are retried every daemon.retry seconds and the
+#   index is reloaded every daemon.refresh seconds (system config).
+#   Attributes a file sets that are not in the index yet are added to
+#   it (one bulk read) so only attributes the file sets are compared.
+#
+#   HTTP endpoint:
+#     POST /reconcile   {"file": "input/queues.yaml"}
+#     GET  /status
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import json
+import time
+import hashlib
+import threading
+import queue
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.abspath("."))
+from common import YamlHandler
+from common import QueueInput
+from common import QueueConfig2
+
+# Globals
+Verbose = 0
+log = None
+Stats = {'reconciles': 0, 'queues': 0, 'skipped': 0, 'retries': 0, 'refreshes': 0}
+
+class ProvisionDaemon():
+
+    def __init__(self, semp_h, cfg, state, verbose = 0):
+        global Verbose
+        global log
+        Verbose = verbose
+        log = cfg['log_handler'].get()
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        self.semp_h = semp_h
+        self.cfg = cfg
+        self.state = state
+        self.yaml_h = YamlHandler.YamlHandler()
+        self.applied = {}  # input file -> {queueName: hash of applied definition}
+        self.mtimes = {}   # input file -> mtime
+        self.retries = {}  # input file with failed queues -> next retry time
+        self.jobs = queue.Queue()
+        self.running = True
+
+    #--------------------------------------------------------------------
+    # hash_queue
+    # stable hash of an expanded queue definition
+    #--------------------------------------------------------------------
+    def hash_queue (self, data):
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).digest()
+
+    #--------------------------------------------------------------------
+    # reconcile_file
+    # apply queues from input file that changed since last apply
+    #--------------------------------------------------------------------
+    def reconcile_file (self, path):
+        log.enter ('Entering {}::{} file: {}'.format(__class__.__name__, inspect.stack()[0][3], path))
+        cfg = self.cfg
+        t0 = time.time()
+        input_data = self.yaml_h.read_config_file(path)
+        router = input_data.get('router', {})
+        if router.get('sempUrl') != cfg['router']['sempUrl'] or router.get('vpn') != cfg['router']['vpn']:
+            log.warn ('Skipping {}: router {} vpn {} is not served by this daemon'.format(path, router.get('sempUrl'), router.get('vpn')))
+            Stats['skipped'] += 1
+            return {'file': path, 'status': 'skipped'}
+
+        # file templates on top of daemon config
+        file_cfg = dict(cfg)
+        file_cfg['templates'] = input_data['templates']
+        queue_in = QueueInput.QueueInput(file_cfg, input_data.get('queues'), Verbose, input_data.get('queueFiles', []))
+
+        applied = self.applied.get(path, {})
+        hashes = {}
+        affected = []
+        for data in queue_in:
+            h = self.hash_queue(data)
+            hashes[data['queueName']] = h
+            if applied.get(data['queueName']) != h:
+                affected.append(data)
+        if queue_in.errors:
+            for qname, errors in queue_in.errors.items():
+                log.error ('Invalid subscriptions in queue {}: {}'.format(qname, '; '.join(errors)))
+            return {'file': path, 'status': 'invalid', 'errors': queue_in.errors}
+        removed = [q for q in applied if q not in hashes]
+        if removed:
+            log.warn ('{} queues removed from {} (not deleted): {}'.format(len(removed), path, removed[:10]))
+
+        failed = set()
+        if affected:
+            self.index_attrs(affected)
+            queue_h = QueueConfig2.Queues(self.semp_h, file_cfg, None, Verbose, self.state, progress=False)
+            queue_h.create_or_update_queue(True, affected)
+            failed = queue_h.failed_queues
+        # failed queues are retried on next change or after daemon.retry seconds
+        for qname in failed:
+            hashes.pop(qname, None)
+        self.applied[path] = hashes
+        if failed:
+            self.retries[path] = time.time() + cfg['system']['daemon']['retry']
+        else:
+            self.retries.pop(path, None)
+
+        Stats['reconciles'] += 1
+        Stats['queues'] += len(affected)
+        result = {'file': path, 'status': 'ok' if not failed else 'failed', 'queues': len(hashes) + len(failed),
+                  'reconciled': len(affected), 'failed': sorted(failed), 'removed': removed,
+                  'seconds': round(time.time() - t0, 3)}
+        log.notice ('Reconciled {}: {} of {} queues changed ({} failed) in {:.2f}s'.format(
+                    path, len(affected), result['queues'], len(failed), result['seconds']))
+        return result
+
+    #--------------------------------------------------------------------
+    # index_attrs
+    # add attributes of queues to the live index if missing. otherwise
+    # they are never equal to the index and the queues are always patched
+    #--------------------------------------------------------------------
+    def index_attrs (self, queue_defs):
+        attrs = set()
+        for data in queue_defs:
+            attrs.update(data.keys())
+        missing = attrs - self.state.attrs - set(['subscriptionTopic', 'msgVpnName'])
+        if missing:
+            log.notice ('Adding {} to queue index'.format(sorted(missing)))
+            self.state.load(sorted(self.state.attrs | missing))
+
+    #--------------------------------------------------------------------
+    # scan
+    # input files (*.yaml, *.yml) under watch_dir with changed mtime
+    #--------------------------------------------------------------------
+    def scan (self, watch_dir):
+        changed = []
+        seen = set()
+        for root, _, files in os.walk(watch_dir):
+            for fname in sorted(files):
+                if not fname.endswith(('.yaml', '.yml')):
+                    continue
+                path = os.path.join(root, fname)
+                seen.add(path)
+                mtime = os.stat(path).st_mtime
+                if self.mtimes.get(path) != mtime:
+                    self.mtimes[path] = mtime
+                    changed.append(path)
+        for path in [p for p in self.mtimes if p not in seen]:
+            log.notice ('Input file {} removed'.format(path))
+            del self.mtimes[path]
+            self.applied.pop(path, None)
+            self.retries.pop(path, None)
+        return changed
+
+    #--------------------------------------------------------------------
+    # run
+    # main loop. reconciles are serialized here
+    #  - changed files in watch_dir (every interval seconds)
+    #  - jobs from HTTP endpoint
+    #  - files with failed queues (daemon.retry)
+    #  - state reload every refresh seconds (0: never)
+    #--------------------------------------------------------------------
+    def run (self, watch_dir=None, interval=2, refresh=0):
+        next_scan = 0
+        while self.running:
+            now = time.time()
+            if refresh and now - self.state.loaded > refresh:
+                try:
+                    self.state.load(self.state_attrs())
+                    Stats['refreshes'] += 1
+                except Exception as e:
+                    log.error ('Queue index refresh failed: {}. Keeping current index'.format(e))
+                    self.state.loaded = now
+            for path in [p for p, t in self.retries.items() if now >= t]:
+                log.notice ('Retrying failed queues of {}'.format(path))
+                Stats['retries'] += 1
+                self.do_reconcile(path)
+            if watch_dir and now >= next_scan:
+                for path in self.scan(watch_dir):
+                    self.do_reconcile(path)
+                next_scan = now + interval
+            try:
+                path, done = self.jobs.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            done['result'] = self.do_reconcile(path)
+            done['event'].set()
+
+    def do_reconcile (self, path):
+        try:
+            return self.reconcile_file(path)
+        except Exception as e:
+            log.error ('Reconcile of {} failed: {}'.format(path, e))
+            if path in self.retries:
+                self.retries[path] = time.time() + self.cfg['system']['daemon']['retry']
+            return {'file': path, 'status': 'error', 'error': str(e)}
+
+    # attributes kept in the live index
+    def state_attrs (self):
+        attrs = set(self.cfg['templates']['queue'].keys()) | set(['egressEnabled', 'ingressEnabled'])
+        return sorted(attrs | self.state.attrs)
+
+    #--------------------------------------------------------------------
+    # submit
+    # queue a reconcile from another thread and wait for the result
+    #--------------------------------------------------------------------
+    def submit (self, path, timeout=None):
+        done = {'event': threading.Event(), 'result': None}
+        self.jobs.put((path, done))
+        done['event'].wait(timeout)
+        return done['result']
+
+    def status (self):
+        return {'stats': Stats, 'files': {p: len(h) for p, h in self.applied.items()},
+                'stateQueues': len(self.state.queues), 'stateLoaded': self.state.loaded}
+
+    #--------------------------------------------------------------------
+    # start_http
+    # local HTTP endpoint in a background thread
+    #--------------------------------------------------------------------
+    def start_http (self, port, host='127.0.0.1'):
+        daemon = self
+
+        class Handler (BaseHTTPRequestHandler):
+            def log_message (self, fmt, *args):
+                log.debug ('http: ' + fmt % args)
+
+            def reply (self, code, body):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('content-type', 'application/json')
+                self.send_header('content-length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET (self):
+                if self.path == '/status':
+                    return self.reply(200, daemon.status())
+                self.reply(404, {'error': 'not found'})
+
+            def do_POST (self):
+                if self.path != '/reconcile':
+                    return self.reply(404, {'error': 'not found'})
+                try:
+                    n = int(self.headers.get('content-length') or 0)
+                    req = json.loads(self.rfile.read(n))
+                    path = req['file']
+                except Exception as e:
+                    return self.reply(400, {'error': 'bad request: {}'.format(e)})
+                if not os.path.isfile(path):
+                    return self.reply(404, {'error': 'no such file {}'.format(path)})
+                self.reply(200, daemon.submit(path))
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.httpd.serve_forever, name='http', daemon=True).start()
+        log.notice ('Listening on http://{}:{}'.format(host, port))
+
+    def stop (self):
+        self.running = False
+        if getattr(self, 'httpd', None):
+            self.httpd.shutdown()
+
+    def print_stats(self):
+        log.notice ("Daemon Stats:")
+        for k,v in Stats.items():
+            log.notice("{:>20} : {}".format(k, v))
@@ -0,0 +1,214 @@
+#####################################################################
+# ProvisionService
+#   Local provisioning API for self-service queue requests
+#   Requests (JSON) are coalesced over a short window into one batch
+#   per router / VPN, identical queue requests are deduplicated and each
+#   batch is run thru one shared provisioning engine (Queues).
+#   Callers get the result for their own queues.
+#
+#   POST /queues  {"vpn": "vpn1",                # optional, default router vpn
+#                  "queues": ["team1/q1",        # entries as in input yaml
+#                             {"name": "team1/q{1..2}", "template": {...}}]}
+#   GET  /status
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import json
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.abspath("."))
+from common import QueueInput
+from common import QueueConfig2
+
+# Globals
+Verbose = 0
+log = None
+Stats = {'requests': 0, 'batches': 0, 'queues': 0, 'deduplicated': 0, 'conflicts': 0, 'failed': 0}
+
+class ProvisionRequest():
+    """ one caller request waiting for its batch """
+
+    def __init__(self, key, queue_defs):
+        self.key = key               # (sempUrl, vpn)
+        self.queue_defs = queue_defs # expanded queues
+        self.results = {}            # queueName -> status
+        self.batch = None
+        self.event = threading.Event()
+
+class ProvisionService():
+
+    def __init__(self, semp_h, cfg, window = 0.5, patch_it = True, verbose = 0):
+        global Verbose
+        global log
+        Verbose = verbose
+        log = cfg['log_handler'].get()
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        self.semp_h = semp_h
+        self.cfg = cfg
+        self.window = window
+        self.patch_it = patch_it
+        self.pending = {}  # (sempUrl, vpn) -> [ProvisionRequest]
+        self.cond = threading.Condition()
+        self.running = True
+        self.batch_id = 0
+
+    #--------------------------------------------------------------------
+    # vpn_cfg
+    # cfg for a VPN on the service router
+    #--------------------------------------------------------------------
+    def vpn_cfg (self, vpn):
+        cfg = dict(self.cfg)
+        cfg['router'] = dict(self.cfg['router'])
+        cfg['router']['vpn'] = vpn
+        return cfg
+
+    #--------------------------------------------------------------------
+    # submit
+    # expand request queues and wait for the batch to complete
+    #--------------------------------------------------------------------
+    def submit (self, req_json, timeout=None):
+        vpn = req_json.get('vpn', self.cfg['router']['vpn'])
+        queue_in = QueueInput.QueueInput(self.vpn_cfg(vpn), req_json['queues'], Verbose)
+        queue_defs = list(queue_in)
+        if queue_in.errors:
+            raise ValueError('invalid subscriptions {}'.format(json.dumps(queue_in.errors)))
+        req = ProvisionRequest((self.cfg['router']['sempUrl'], vpn), queue_defs)
+        with self.cond:
+            Stats['requests'] += 1
+            self.pending.setdefault(req.key, []).append(req)
+            self.cond.notify()
+        if not req.event.wait(timeout):
+            return {'status': 'timeout'}
+        failed = [q for q, s in req.results.items() if s != 'ok']
+        return {'status': 'ok' if not failed else 'failed', 'batch': req.batch, 'results': req.results}
+
+    #--------------------------------------------------------------------
+    # run
+    # batcher loop. waits for a request, collects more for window
+    # seconds, then runs one batch per router / VPN
+    #--------------------------------------------------------------------
+    def run (self):
+        while self.running:
+            with self.cond:
+                while self.running and not self.pending:
+                    self.cond.wait(0.5)
+            if not self.running:
+                break
+            time.sleep(self.window)
+            with self.cond:
+                batches, self.pending = self.pending, {}
+            for key, reqs in batches.items():
+                try:
+                    self.run_batch(key, reqs)
+                except Exception as e:
+                    log.error ('Batch for {} failed: {}'.format(key, e))
+                    for req in reqs:
+                        for d in req.queue_defs:
+                            req.results.setdefault(d['queueName'], 'error')
+                finally:
+                    for req in reqs:
+                        req.event.set()
+
+    #--------------------------------------------------------------------
+    # run_batch
+    # merge requests (dedupe identical queues, reject conflicting ones)
+    # and provision the merged set in one pass
+    #--------------------------------------------------------------------
+    def run_batch (self, key, reqs):
+        self.batch_id = self.batch_id + 1
+        batch = self.batch_id
+        t0 = time.time()
+        merged = {}  # queueName -> (data, hash)
+        owners = {}  # queueName -> [requests]
+        for req in reqs:
+            req.batch = batch
+            for data in req.queue_defs:
+                qname = data['queueName']
+                h = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).digest()
+                if qname not in merged:
+                    merged[qname] = (data, h)
+                    owners[qname] = [req]
+                elif merged[qname][1] == h:
+                    Stats['deduplicated'] += 1
+                    owners[qname].append(req)
+                else:
+                    Stats['conflicts'] += 1
+                    req.results[qname] = 'conflict'
+                    log.warn ('Batch {}: conflicting definition for queue {}. Rejected'.format(batch, qname))
+
+        log.notice ('Batch {}: {} requests, {} queues for router {} vpn {}'.format(batch, len(reqs), len(merged), key[0], key[1]))
+        queue_h = QueueConfig2.Queues(self.semp_h, self.vpn_cfg(key[1]), None, Verbose, progress=False)
+        queue_h.create_or_update_queue(self.patch_it, [data for data, _ in merged.values()])
+        # failed_queues has queues that raised and queues the broker
+        # rejected (queue or subscription POST). both are 'failed'
+        for qname, reqs_q in owners.items():
+            status = 'failed' if qname in queue_h.failed_queues else 'ok'
+            for req in reqs_q:
+                req.results[qname] = status
+        Stats['batches'] += 1
+        Stats['queues'] += len(merged)
+        Stats['failed'] += len(queue_h.failed_queues)
+        log.notice ('Batch {}: done in {:.2f}s ({} failed)'.format(batch, time.time() - t0, len(queue_h.failed_queues)))
+
+    #--------------------------------------------------------------------
+    # start_http
+    # local HTTP endpoint. each request is served by its own thread
+    # and blocks until its batch is done
+    #--------------------------------------------------------------------
+    def start_http (self, port, host='127.0.0.1'):
+        service = self
+
+        class Handler (BaseHTTPRequestHandler):
+            def log_message (self, fmt, *args):
+                log.debug ('http: ' + fmt % args)
+
+            def reply (self, code, body):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('content-type', 'application/json')
+                self.send_header('content-length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET (self):
+                if self.path == '/status':
+                    return self.reply(200, {'stats': Stats})
+                self.reply(404, {'error': 'not found'})
+
+            def do_POST (self):
+                if self.path != '/queues':
+                    return self.reply(404, {'error': 'not found'})
+                try:
+                    n = int(self.headers.get('content-length') or 0)
+                    req = json.loads(self.rfile.read(n))
+                    if not req.get('queues'):
+                        raise ValueError('no queues')
+                except Exception as e:
+                    return self.reply(400, {'error': 'bad request: {}'.format(e)})
+                try:
+                    result = service.submit(req)
+                except Exception as e:
+                    return self.reply(400, {'error': 'invalid queues: {}'.format(e)})
+                self.reply(200, result)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.httpd.serve_forever, name='http', daemon=True).start()
+        log.notice ('Listening on http://{}:{}'.format(host, port))
+
+    def stop (self):
+        self.running = False
+        with self.cond:
+            self.cond.notify()
+        if getattr(self, 'httpd', None):
+            self.httpd.shutdown()
+
+    def print_stats(self):
+        log.notice ("Service Stats:")
+        for k,v in Stats.items():
+            log.notice("{:>20} : {}".format(k, v))
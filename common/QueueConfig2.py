@@ -10,15 +10,23 @@ import sys, os, inspect
 import json
 from urllib.parse import unquote, quote
 import pprint
+import time
+import threading
+import fnmatch
+from common import TraceHandler
+from common import ProgressHandler
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Globals
 pp = pprint.PrettyPrinter(indent=4)
 Verbose = 0
 log = None
+Stats = {'failed': 0, 'unchanged': 0, 'patched': 0, 'disabled': 0, 'deleted': 0}
+StatsLock = threading.Lock()
 
 class Queues():
 
-    def __init__(self, semp_h, cfg, input_data, verbose = 0):
+    def __init__(self, semp_h, cfg, input_data, verbose = 0, state = None, progress = True):
         global Verbose
         global log
         Verbose = verbose
@@ -26,34 +34,61 @@ class Queues():
         self.semp_h = semp_h
         self.cfg = cfg
         self.input_data = input_data
+        self.state = state # optional QueueState (live broker index)
+        self.downtime = [] # (seconds disabled, queueName)
+        self.progress = progress # show progress (see common/ProgressHandler.py)
+
+    def count (self, key):
+        with StatsLock:
+            Stats[key] += 1
+
+    def progress_handler (self, label, total):
+        if not self.progress:
+            return ProgressHandler.No_Progress
+        return ProgressHandler.ProgressHandler(self.cfg, label, total, self.semp_h.calls).start()
     #--------------------------------------------------------------------
     # get_topic_list
     # Get list of topics from SEMP response
     #--------------------------------------------------------------------
-    def get_topic_list (self, resp):
+    def get_topic_list (self, url):
+
+        # only subscriptionTopic is needed. fetch all pages, projected
+        topic_list = []
+        for sub in self.semp_h.get_collection_data(url, select=['subscriptionTopic']):
+            topic_list.append(sub['subscriptionTopic'])
+        return topic_list
+
+    #--------------------------------------------------------------------
+    # get_subscription_topics
+    # ':' separated subscriptionTopic to list of topics
+    #--------------------------------------------------------------------
+    def get_subscription_topics (self, data):
 
-        resp_json = json.loads(resp.text)
         topic_list = []
-        if 'data' in resp_json:
-            for sub in resp_json['data']:
-                topic_list.append(sub['subscriptionTopic'])
+        for topics in data.get('subscriptionTopic', '').split(':'):
+            topic = topics.strip()
+            if topic != "":
+                topic_list.append(topic)
         return topic_list
 
     #--------------------------------------------------------------------
     # create_or_update_queues
     # Create Queues with http post
-    # If queue exists (http_post retunred ALREADY_EXISTS)
-    #    disable it
-    #    update using http_patch and enable it
+    # If queue exists and --patch (http_post retunred ALREADY_EXISTS)
+    #    patch changed attributes (see update_queue)
     #  Add topic subscriptions list to queue
-    #  In patch mode, remove existing subscriptions and reapply new
+    #  In patch mode, remove subscriptions not in input and add missing
+    #
+    # Queues are provisioned by a pool of semp.workers threads.
+    # DMQs referenced by the queues (deadMsgQueue) are created once each
+    # (templates.dmqueue) and the dependent queues wait for them.
+    # queue_defs: list of expanded queues to use instead of input_data
     #--------------------------------------------------------------------
-    def create_or_update_queue (self, patch_it):
+    def create_or_update_queue (self, patch_it, queue_defs=None):
 
-        semp_h = self.semp_h
         cfg = self.cfg
         sys_cfg = cfg['system']
-        input_data = self.input_data
+        input_data = self.input_data if queue_defs is None else queue_defs
         
         msg_vpn_name = cfg['router']['vpn']
         if patch_it:
@@ -61,147 +96,406 @@ class Queues():
         else:
             log.info ('Creating Queues in VPN: {} on router: {}'.format(msg_vpn_name, cfg['router']['sempUrl']))
 
-        # Loop through each row and generate obj for SEMP Req
+        num_queues = input_data.count() if queue_defs is None else len(queue_defs)
+        workers = sys_cfg['semp']['workers']
+        n = 0
+
+        # DMQs get their own pool so queues waiting on a DMQ can't starve it
+        dmq_pool = ThreadPoolExecutor(max_workers=workers)
+        self.dmq_futures = {}
+        self.failed_queues = set()
+        self.progress_h = self.progress_handler('queues', num_queues)
+        pending = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # input_data is a stream of expanded queue definitions (see QueueInput)
+            for data in input_data:
+                n = n + 1
+                dmq_future = self.submit_dmqueue(dmq_pool, data.get('deadMsgQueue'), patch_it)
+                f = pool.submit(self.provision_queue, data, patch_it, dmq_future)
+                f.qname = data['queueName']
+                pending.add(f)
+                # keep a bounded number of queues in flight. input is not read ahead
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self.check_futures(done)
+            done, pending = wait(pending)
+            self.check_futures(done)
+        dmq_pool.shutdown()
+        for dmq, f in self.dmq_futures.items():
+            if f.exception() is not None or not f.result():
+                self.count('failed')
+                self.failed_queues.add(dmq)
+        self.progress_h.stop()
+        log.notice ('{} queues processed. {} DMQs ({} failed queues)'.format(n, len(self.dmq_futures), Stats['failed']))
+        self.print_downtime()
+
+    # queues that raised or were not created / updated (eg: POST rejected
+    # by the broker, failed subscription) go to failed_queues
+    def check_futures (self, done):
+        for f in done:
+            if f.exception() is not None:
+                self.count('failed')
+                self.failed_queues.add(f.qname)
+                log.error ('Queue provisioning failed: {} {}'.format(f.qname, f.exception()))
+                self.progress_h.done(False)
+            elif not f.result():
+                self.count('failed')
+                self.failed_queues.add(f.qname)
+                self.progress_h.done(False)
+            else:
+                self.progress_h.done(True)
+
+    #--------------------------------------------------------------------
+    # provision_queue
+    # create or update one queue and its subscriptions
+    # waits for the DMQ of the queue (if created by us) first
+    # returns False if the broker rejected the queue or one of its
+    # subscriptions
+    #--------------------------------------------------------------------
+    def provision_queue (self, data, patch_it, dmq_future=None):
+
+        with TraceHandler.span('queue', 'queue', queueName=data['queueName']):
+            return self.provision_queue_1(data, patch_it, dmq_future)
+
+    def provision_queue_1 (self, data, patch_it, dmq_future=None):
+
+        semp_h = self.semp_h
+        cfg = self.cfg
+        sys_cfg = cfg['system']
+        msg_vpn_name = cfg['router']['vpn']
         semp_config_url = '{}/{}/msgVpns'.format(cfg['router']['sempUrl'], sys_cfg['semp']['configUrl'])
         semp_queue_config_url = f"{semp_config_url}/{msg_vpn_name}/queues"
-        num_queues = len(input_data)
-        n = 0
 
-        queue_props = []
-        # get list of tags from Cfg['queue']
-        for k in cfg['templates']['queue']:
-            queue_props.append(k)
-        # add required tags
-        queue_props.append('queueName')
-        #queue_props.append('msgVpnName')
-        if Verbose > 2:
-            print ('Tags:', queue_props)    
-        
-        for qname in input_data:
-            n = n + 1
-            #print ('data read', d)
-            #print (f"VPN name: [{d['msgVpnName']}]")
-            data=cfg['templates']['queue'].copy()
-            # add required missing params
-            data['queueName'] = qname
-            data['msgVpnName'] = msg_vpn_name
-            log.info ('Processing queue: {} (Patch: {})'.format(qname, patch_it))
-
-            # enable queues
-            data['egressEnabled'] = True
-            data['ingressEnabled'] = True
-            #if Verbose > 2:
-            #    print ('data enhanced'); pp.pprint(data)
-            # remove subscriptionTopic
-            sub_topic_saved = data['subscriptionTopic']
-            data.pop('subscriptionTopic', None)
-            ###################################################
-            # post to router - create queue
-            #
-            print (f"\n{n:2}/{num_queues:3} ) Creating queue: {qname}")
+        qname = data['queueName']
+        t0 = time.time()
+        log.debug ('Processing queue: {} (Patch: {})'.format(qname, patch_it))
+        if dmq_future is not None:
+            with TraceHandler.span('dmq_wait', 'queue'):
+                dmq_ok = dmq_future.result()
+            if not dmq_ok:
+                # queue would point to a DMQ that doesn't exist
+                log.error ('Queue {}: DMQ {} failed. Queue not provisioned'.format(qname, data.get('deadMsgQueue')))
+                return False
+        #if Verbose > 2:
+        #    print ('data enhanced'); pp.pprint(data)
+        # remove subscriptionTopic
+        topic_list = self.get_subscription_topics(data)
+        data.pop('subscriptionTopic', None)
+        ###################################################
+        # post to router - create queue
+        #
+        state = self.state
+        if patch_it and state is not None and state.exists(qname):
+            # known to exist (live index). skip the POST
+            resp = 'ALREADY_EXISTS'
+        else:
             resp = semp_h.http_post (semp_queue_config_url, data)
-            if patch_it and resp == 'ALREADY_EXISTS':
-                #---------------------------------------------------
-                # If Queue exists, patch it
-                #
-                log.info (f'Queue {qname} exists. Disable and patch it')
-                # disable queue first
-                data0 = {}
-                data0['queueName'] = qname
-                data0['msgVpnName'] = msg_vpn_name
-                data0['egressEnabled'] = False
-                #data0['ingressEnabled'] = False
-                semp_h.http_patch (f"{semp_queue_config_url}/{qname}", data0)
-                # Patch with new values and enable
-                semp_h.http_patch (f"{semp_queue_config_url}/{qname}", data)
-
-            if patch_it:
-                # remove subscriptions first
-                log.info (f'Reapplying subscriptions on Queue {qname} (PATCH)')
-                semp_queue_sub_config_url = f"{semp_config_url}/{msg_vpn_name}/queues/{qname}/subscriptions"
-                resp = semp_h.http_get(semp_queue_sub_config_url)
-                for topic in self.get_topic_list (resp):
-                    log.info (f'Deleting subscription topic: [{topic}]')
-                    semp_queue_sub_delete_url = f"{semp_config_url}/{msg_vpn_name}/queues/{qname}/subscriptions/{quote(topic, safe='')}"
-                    log.info(f'SEMP post url: {semp_queue_sub_delete_url}')
-                    semp_h.http_delete (semp_queue_sub_delete_url)
-            # now add subscription topics
-            for topics in sub_topic_saved.split(':'):
-                topic = topics.strip()
-                if topic != "":
-                    data = {}
-                    data['msgVpnName'] = msg_vpn_name
-                    data['queueName'] = qname
-                    data['subscriptionTopic'] = topic
-                    log.info (f'Adding subscription topic: [{topic}] on queue {qname}')
-                    semp_queue_sub_config_url = f"{semp_config_url}/{msg_vpn_name}/queues/{qname}/subscriptions"
-                    semp_h.http_post (semp_queue_sub_config_url, data)
+            if resp == 'OK' and state is not None:
+                state.update(qname, data)
+                state.set_topics(qname, [])
+        status = 'created' if resp == 'OK' else resp
+        current_topics = set()
+        updated = True
+        if patch_it and resp == 'ALREADY_EXISTS':
+            #---------------------------------------------------
+            # If Queue exists, patch only what changed
+            #
+            updated, status = self.update_queue (data)
+            current_topics = state.get_topics(qname) if state is not None else None
+            if current_topics is None:
+                semp_queue_sub_config_url = f"{semp_config_url}/{msg_vpn_name}/queues/{quote(qname, safe='')}/subscriptions"
+                current_topics = set(self.get_topic_list (semp_queue_sub_config_url))
 
+        deleted = 0
+        added = 0
+        sub_failed = 0
+        if patch_it:
+            # remove subscriptions not in input
+            for topic in current_topics:
+                if topic in topic_list:
+                    continue
+                log.debug (f'Deleting subscription topic: [{topic}]')
+                semp_queue_sub_delete_url = f"{semp_config_url}/{msg_vpn_name}/queues/{quote(qname, safe='')}/subscriptions/{quote(topic, safe='')}"
+                if semp_h.http_delete (semp_queue_sub_delete_url).status_code != 200:
+                    sub_failed = sub_failed + 1
+                    continue
+                deleted = deleted + 1
+        # now add subscription topics (missing ones in patch mode)
+        for topic in topic_list:
+            if topic in current_topics:
+                continue
+            data = {}
+            data['msgVpnName'] = msg_vpn_name
+            data['queueName'] = qname
+            data['subscriptionTopic'] = topic
+            log.debug (f'Adding subscription topic: [{topic}] on queue {qname}')
+            semp_queue_sub_config_url = f"{semp_config_url}/{msg_vpn_name}/queues/{quote(qname, safe='')}/subscriptions"
+            if semp_h.http_post (semp_queue_sub_config_url, data) not in ('OK', 'ALREADY_EXISTS'):
+                sub_failed = sub_failed + 1
+                continue
+            added = added + 1
+        if state is not None:
+            state.set_topics(qname, topic_list)
+        # one summary line per queue. warn if the queue was not created / updated
+        summary = 'Queue {}: {}, subscriptions +{} -{} ({:.3f}s)'.format(qname, status, added, deleted, time.time() - t0)
+        if sub_failed:
+            summary = summary + ' {} subscriptions failed'.format(sub_failed)
+        if (resp == 'OK' or (patch_it and resp == 'ALREADY_EXISTS')) and updated and not sub_failed:
+            log.info (summary)
+        else:
+            log.warn (summary)
+        # existing queue without --patch is left as is, not a failure
+        if patch_it and resp == 'ALREADY_EXISTS' and not updated:
+            return False
+        return resp in ('OK', 'ALREADY_EXISTS') and not sub_failed
+
+    #--------------------------------------------------------------------
+    # update_queue
+    # Patch existing queue with changed attributes only.
+    # Queue is disabled only if one of the changed attributes requires it
+    # (semp.requiresDisable.queues). Everything else is applied live.
+    # Disable is egress only (consumers pause, publishers keep spooling)
+    # unless semp.disableIngress is set
+    # Time spent disabled is recorded in self.downtime
+    # returns (ok, status). ok is False if the queue could not be read or
+    # a PATCH was rejected. A queue disabled for a patch that failed is
+    # enabled again
+    #--------------------------------------------------------------------
+    def update_queue (self, data):
+
+        semp_h = self.semp_h
+        cfg = self.cfg
+        sys_cfg = cfg['system']
+        qname = data['queueName']
+        msg_vpn_name = cfg['router']['vpn']
+        semp_queue_url = '{}/{}/msgVpns/{}/queues/{}'.format(cfg['router']['sempUrl'], sys_cfg['semp']['configUrl'],
+                                                           msg_vpn_name, quote(qname, safe=''))
+
+        if self.state is not None and self.state.exists(qname):
+            current = self.state.get(qname)
+        else:
+            # a failed read is not 'everything changed'
+            try:
+                current = semp_h.get_config_json(semp_queue_url, select=list(data.keys()), strict=True)
+            except ValueError as e:
+                log.error ('Queue {}: unable to read current config ({}). Not updated'.format(qname, e))
+                return False, 'read failed'
+            current = current.get('data', {})
+        changed = {k: v for k, v in data.items() if k not in ['queueName', 'msgVpnName'] and current.get(k) != v}
+        if not changed:
+            log.debug (f'Queue {qname} exists. No changes')
+            self.count('unchanged')
+            return True, 'unchanged'
+        changed['queueName'] = qname
+        changed['msgVpnName'] = msg_vpn_name
+
+        requires_disable = [k for k in changed if k in sys_cfg['semp']['requiresDisable']['queues']]
+        if not requires_disable:
+            log.debug (f'Queue {qname} exists. Patching {sorted(changed)} live')
+            resp = semp_h.http_patch (semp_queue_url, changed)
+            if resp.status_code != 200:
+                return False, 'patch failed ({})'.format(resp.status_code)
+            self.count('patched')
+            if self.state is not None:
+                self.state.update(qname, changed)
+            return True, 'patched {}'.format(sorted(k for k in changed if k not in ['queueName', 'msgVpnName']))
+
+        log.debug (f'Queue {qname} exists. {requires_disable} requires disable. Disable and patch it')
+        t0 = time.time()
+        # disable queue first
+        data0 = {}
+        data0['queueName'] = qname
+        data0['msgVpnName'] = msg_vpn_name
+        data0['egressEnabled'] = False
+        # ingress too only if asked: publishers are rejected while it is off
+        disable_ingress = sys_cfg['semp'].get('disableIngress', False)
+        if disable_ingress:
+            data0['ingressEnabled'] = False
+        resp = semp_h.http_patch (semp_queue_url, data0)
+        if resp.status_code != 200:
+            return False, 'disable failed ({})'.format(resp.status_code)
+        self.count('disabled')
+        # Patch with new values and enable
+        changed['egressEnabled'] = data.get('egressEnabled', True)
+        if disable_ingress:
+            changed['ingressEnabled'] = data.get('ingressEnabled', True)
+        resp = semp_h.http_patch (semp_queue_url, changed)
+        elapsed = time.time() - t0
+        if resp.status_code != 200:
+            # don't leave the queue disabled: restore what was disabled
+            data1 = {k: current.get(k, True) for k in data0 if k.endswith('Enabled')}
+            data1['queueName'] = qname
+            data1['msgVpnName'] = msg_vpn_name
+            if semp_h.http_patch (semp_queue_url, data1).status_code != 200:
+                log.error ('Queue {}: patch failed ({}) and the queue could not be enabled again. Queue is DISABLED'.format(
+                           qname, resp.status_code))
+                return False, 'patch failed ({}), queue left disabled'.format(resp.status_code)
+            log.error ('Queue {}: patch failed ({}). Queue enabled again after {:.3f}s'.format(
+                       qname, resp.status_code, time.time() - t0))
+            return False, 'patch failed ({})'.format(resp.status_code)
+        if self.state is not None:
+            self.state.update(qname, changed)
+        self.downtime.append((elapsed, qname))
+        log.notice ('Queue {} was disabled for {:.3f}s'.format(qname, elapsed))
+        return True, 'patched {} (disabled {:.3f}s)'.format(sorted(k for k in changed if k not in ['queueName', 'msgVpnName', 'egressEnabled', 'ingressEnabled']), elapsed)
+
+    #--------------------------------------------------------------------
+    # print_downtime
+    # Summary of time queues spent disabled during update
+    #--------------------------------------------------------------------
+    def print_downtime (self):
+        log.notice ('Queue Update Stats:')
+        for k,v in Stats.items():
+            log.notice('{:>20} : {}'.format(k, v))
+        if not self.downtime:
+            return
+        total = sum(d for d, _ in self.downtime)
+        worst = max(self.downtime)
+        log.notice ('{:>20} : {:.3f}s'.format('disabled avg', total / len(self.downtime)))
+        log.notice ('{:>20} : {:.3f}s ({})'.format('disabled max', worst[0], worst[1]))
+
+    #--------------------------------------------------------------------
+    # submit_dmqueue
+    # Submit DMQ creation the first time a deadMsgQueue is seen.
+    # Returns future for the DMQ (None if nothing to wait for)
+    # System DMQs (#DEAD_MSG_QUEUE) always exist and are not created.
+    # Without templates.dmqueue, DMQs are expected to exist already
+    #--------------------------------------------------------------------
+    def submit_dmqueue (self, pool, dmq_name, patch_it):
+
+        if not dmq_name or dmq_name.startswith('#') or 'dmqueue' not in self.cfg['templates']:
+            return None
+        if dmq_name not in self.dmq_futures:
+            log.debug ('New DMQ {}'.format(dmq_name))
+            self.dmq_futures[dmq_name] = pool.submit(self.create_or_update_dmqueue, dmq_name, patch_it)
+        return self.dmq_futures[dmq_name]
 
     #--------------------------------------------------------------------
     # create_or_update_dmqueue
     # Special handling or DMQ. 
-    # Get list of deadMsgQueue from input file and create them 
+    # Called once per distinct deadMsgQueue in the input
     # All of them are created with same properties (cfg['templates']['dmqueue'])
     # No subscriptions are supported for DMQ. 
     # If you really want a DMQ with override properties / subscriptions, 
     # then provision it as a regular queue
+    # returns True if the DMQ exists (created, updated or already there)
+    # queues waiting on a DMQ that failed are not provisioned
     #--------------------------------------------------------------------
-    def create_or_update_dmqueue (self, patch_it):
+    def create_or_update_dmqueue (self, queue, patch_it):
+
+        with TraceHandler.span('dmqueue', 'queue', queueName=queue):
+            return self.create_or_update_dmqueue_1(queue, patch_it)
+
+    def create_or_update_dmqueue_1 (self, queue, patch_it):
 
         semp_h = self.semp_h
         cfg = self.cfg
         sys_cfg = cfg['system']
-        input_df = self.input_df
-        if patch_it:
-            log.info ('Patching DMQueues in VPN: {} on router: {}'.format(cfg['vpn']['msgVpnNames'][0], cfg['router']['sempUrl'])) 
-        else:
-            log.info ('Creating DMQueues in VPN: {} on router: {}'.format(cfg['vpn']['msgVpnNames'][0], cfg['router']['sempUrl']))
-
-        # Loop through each row and generate obj for SEMP Req
-        msg_vpn_name = cfg['vpn']['msgVpnNames'][0]
+        msg_vpn_name = cfg['router']['vpn']
         semp_config_url = '{}/{}/msgVpns'.format(cfg['router']['sempUrl'], sys_cfg['semp']['configUrl'])
         semp_queue_config_url = f"{semp_config_url}/{msg_vpn_name}/queues"
-        num_queues = len(input_df.index)
-        n = 0
+        log.debug ('Processing DMQ queue: {} (Patch: {})'.format(queue, patch_it))
 
-        queue_props = []
-        # get list of tags from Cfg['queue']
-        for k in cfg['templates']['dmqueue']:
-            queue_props.append(k)
-        # add required tags
-        queue_props.append('deadMsgQueue')
-        #queue_props.append('msgVpnName')
-        if Verbose > 2:
-            print ('Tags:', queue_props)
-        
-        for index, qdata in input_df.iterrows():
-            n = n + 1
-            #print ('data read', d)
-            #print (f"VPN name: [{d['msgVpnName']}]")
-            data={}
-            data=cfg['templates']['dmqueue'].copy()
-            #data['messageVpn'] = msg_vpn_name
-            queue = qdata['queueName'].strip()
-            log.info ('Processing DMQ queue: {} (Patch: {})'.format(queue, patch_it))
-
-            # enable queues
-            data['egressEnabled'] = True
-            data['ingressEnabled'] = True
-            data['msgVpnName'] = msg_vpn_name
-            data['queueName'] = queue
-            data.pop('subscriptionTopic', None)
+        data=cfg['templates']['dmqueue'].copy()
+        # enable queues
+        data['egressEnabled'] = True
+        data['ingressEnabled'] = True
+        data['msgVpnName'] = msg_vpn_name
+        data['queueName'] = queue
+        data.pop('subscriptionTopic', None)
 
-            ###################################################
-            # post to router - create queue
+        ###################################################
+        # post to router - create queue
+        #
+        resp = semp_h.http_post (semp_queue_config_url, data)
+        status = 'created' if resp == 'OK' else resp
+        if patch_it and resp == 'ALREADY_EXISTS':
+            #---------------------------------------------------
+            # If Queue exists, patch it
             #
-            print (f"\n{n:2}/{num_queues:3} ) Creating queue: <{queue}>")
-            resp = semp_h.http_post (semp_queue_config_url, data)
-            if patch_it and resp == 'ALREADY_EXISTS':
-                #---------------------------------------------------
-                # If Queue exists, patch it
-                #
-                log.info (f'Queue {queue} exists. Disable and patch it')
-
-                # Patch with new values and enable
-                semp_h.http_patch (f"{semp_queue_config_url}/{queue}", data)
\ No newline at end of file
+            # Patch changed values only
+            updated, status = self.update_queue (data)
+            ok = updated
+        else:
+            # existing DMQ without --patch is used as is
+            ok = resp in ('OK', 'ALREADY_EXISTS')
+        if ok:
+            log.info ('DMQ {}: {}'.format(queue, status))
+        else:
+            log.error ('DMQ {}: {}'.format(queue, status))
+        return ok
+
+    #--------------------------------------------------------------------
+    # is_owned
+    # queue name matches one of the owned patterns
+    # patterns with wildcards (* ? [) are globs, others are name prefixes
+    #--------------------------------------------------------------------
+    def is_owned (self, qname, owned):
+        for pattern in owned:
+            if not pattern.strip():
+                continue # never matches everything
+            if any(c in pattern for c in '*?['):
+                if fnmatch.fnmatchcase(qname, pattern):
+                    return True
+            elif qname.startswith(pattern):
+                return True
+        return False
+
+    #--------------------------------------------------------------------
+    # prune_plan
+    # owned queues in the VPN that are not in the input
+    # one paged GET projected to queueName. DMQs used by input queues
+    # are kept
+    #--------------------------------------------------------------------
+    def prune_plan (self, owned):
+        log.enter ('Entering {}::{} owned: {}'.format(__class__.__name__, inspect.stack()[0][3], owned))
+        cfg = self.cfg
+        desired = set()
+        for data in self.input_data:
+            desired.add(data['queueName'])
+            if data.get('deadMsgQueue'):
+                desired.add(data['deadMsgQueue'])
+
+        url = '{}/{}/msgVpns/{}/queues'.format(cfg['router']['sempUrl'], cfg['system']['semp']['configUrl'], cfg['router']['vpn'])
+        with TraceHandler.span('prune_plan'):
+            existing = [q['queueName'] for q in self.semp_h.get_collection_data(url, select=['queueName'])]
+        plan = sorted(q for q in existing if q not in desired and self.is_owned(q, owned))
+        log.notice ('Prune plan: {} of {} queues in VPN {} not in input ({} owned patterns)'.format(
+                    len(plan), len(existing), cfg['router']['vpn'], len(owned)))
+        return plan
+
+    #--------------------------------------------------------------------
+    # prune_queues
+    # delete queues in plan concurrently
+    #--------------------------------------------------------------------
+    def prune_queues (self, plan):
+        log.enter ('Entering {}::{} {} queues'.format(__class__.__name__, inspect.stack()[0][3], len(plan)))
+        cfg = self.cfg
+        url = '{}/{}/msgVpns/{}/queues'.format(cfg['router']['sempUrl'], cfg['system']['semp']['configUrl'], cfg['router']['vpn'])
+        self.failed_queues = set()
+        t0 = time.time()
+        progress_h = self.progress_handler('deletes', len(plan))
+        with ThreadPoolExecutor(max_workers=cfg['system']['semp']['workers']) as pool:
+            futures = {pool.submit(self.delete_queue, url, qname): qname for qname in plan}
+            for f in futures:
+                qname = futures[f]
+                if f.exception() is not None or f.result().status_code != 200:
+                    self.count('failed')
+                    self.failed_queues.add(qname)
+                    log.error ('Queue delete failed: {} {}'.format(qname, f.exception() or f.result().status_code))
+                    progress_h.done(False)
+                    continue
+                self.count('deleted')
+                if self.state is not None:
+                    self.state.remove(qname)
+                log.info ('Deleted queue {}'.format(qname))
+                progress_h.done()
+        progress_h.stop()
+        elapsed = time.time() - t0
+        deleted = len(plan) - len(self.failed_queues)
+        log.notice ('Pruned {} queues ({} failed) in {:.2f}s ({:.1f} queues/s)'.format(
+                    deleted, len(self.failed_queues), elapsed, deleted / elapsed if elapsed > 0 else 0))
+
+    def delete_queue (self, url, qname):
+        with TraceHandler.span('delete_queue', 'queue', queueName=qname):
+            return self.semp_h.http_delete('{}/{}'.format(url, quote(qname, safe='')))
@@ -0,0 +1,285 @@
+#####################################################################
+# QueueInput
+#   Queue definitions from user input
+#   Expands queue entries in input yaml lazily into a stream of queue
+#   definitions (template + overrides). Supports generators:
+#     - literal name        : TestQ/GitActions/1
+#     - range / list        : orders/shard/{0000..4095}  orders/{us,eu}/{0..3}
+#     - pattern with extras : name: orders/shard/{0000..4095}
+#                             template:       # per pattern overrides
+#                                maxBindCount: 2
+#                             subscriptions:  # {index} / {0} {1} .. refer
+#                                - orders/{index}/>   # to generated values
+#   Expansion is lazy; memory stays constant regardless of number of
+#   queues a pattern generates
+#
+#   Queues can also be streamed from CSV / JSONL files (one queue per
+#   row: queueName + per queue overrides on top of templates.queue).
+#   Optional 'subscriptions' column / key: topics added to the queue.
+#   In CSV it is one cell with ':' separated topics (a/b:c/>), as in
+#   subscriptionTopic; in JSONL a list or a ':' separated string.
+#   Files are read in chunks (input.chunkSize rows) as provisioning
+#   consumes the stream
+#
+#   Subscription topics are normalized and deduplicated as queues are
+#   expanded (see TopicValidator). Topic errors are collected per queue
+#   in self.errors; validate() checks the whole input up front
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import re
+import csv
+import json
+import itertools
+
+sys.path.insert(0, os.path.abspath("."))
+from common import TraceHandler
+from common import TopicValidator
+
+# Globals
+Verbose = 0
+log = None
+
+# {a..b} {a..b..step} {x,y,z}
+GeneratorRe = re.compile(r'\{([^{}]*(?:\.\.|,)[^{}]*)\}')
+# {index} {0} {1} ...
+PlaceholderRe = re.compile(r'\{(index|\d+)\}')
+
+class QueueInput():
+
+    def __init__(self, cfg, queue_entries, verbose = 0, queue_files=None):
+        global Verbose
+        global log
+        Verbose = verbose
+        log = cfg['log_handler'].get()
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        self.cfg = cfg
+        self.entries = queue_entries if queue_entries else []
+        self.files = queue_files if queue_files else []
+        self.chunk_size = cfg['system']['input']['chunkSize']
+        self.topic_v = TopicValidator.TopicValidator(cfg)
+        self.errors = {} # queueName -> subscription topic errors
+
+    #--------------------------------------------------------------------
+    # parse_generator
+    # '0000..4095' -> ('range', start, stop, step, width)
+    # 'us,eu'      -> ('list', ['us', 'eu'])
+    #--------------------------------------------------------------------
+    def parse_generator (self, spec):
+        if '..' in spec:
+            parts = spec.split('..')
+            start, stop = parts[0], parts[1]
+            step = int(parts[2]) if len(parts) > 2 else 1
+            width = len(start) if len(start) > 1 and start.startswith('0') else 0
+            start, stop = int(start), int(stop)
+            if stop < start:
+                step = -abs(step)
+                return ('range', range(start, stop - 1, step), width)
+            return ('range', range(start, stop + 1, abs(step)), width)
+        return ('list', [v.strip() for v in spec.split(',')], 0)
+
+    def generator_values (self, gen):
+        kind, values, width = gen
+        if kind == 'range':
+            for v in values:
+                yield str(v).zfill(width) if width else str(v)
+        else:
+            yield from values
+
+    #--------------------------------------------------------------------
+    # expand_name
+    # lazily expand a name pattern. yields (name, [generated values])
+    # nested generators are walked like an odometer (last one fastest)
+    #--------------------------------------------------------------------
+    def expand_name (self, pattern):
+        specs = GeneratorRe.findall(pattern)
+        if not specs:
+            yield pattern, []
+            return
+        gens = [self.parse_generator(spec) for spec in specs]
+        pieces = GeneratorRe.split(pattern)[::2] # literal parts between generators
+
+        def walk (i, values):
+            if i == len(gens):
+                name = pieces[0]
+                for n, v in enumerate(values):
+                    name = name + v + pieces[n + 1]
+                yield name, values
+                return
+            for v in self.generator_values(gens[i]):
+                yield from walk(i + 1, values + [v])
+
+        yield from walk(0, [])
+
+    def count_name (self, pattern):
+        n = 1
+        for spec in GeneratorRe.findall(pattern):
+            kind, values, _ = self.parse_generator(spec)
+            n = n * len(values)
+        return n
+
+    #--------------------------------------------------------------------
+    # substitute
+    # replace {index} / {0} {1} .. in string values with generated values
+    #--------------------------------------------------------------------
+    def substitute (self, value, values):
+        if type(value) is not str or not values:
+            return value
+        def repl (m):
+            k = m.group(1)
+            i = 0 if k == 'index' else int(k)
+            return values[i] if i < len(values) else m.group(0)
+        return PlaceholderRe.sub(repl, value)
+
+    #--------------------------------------------------------------------
+    # expand_queue
+    # Queue template expanded for a queue name with optional overrides.
+    # This is the desired state of the queue (includes subscriptionTopic)
+    #--------------------------------------------------------------------
+    def expand_queue (self, qname, overrides=None, subscriptions=None, values=None):
+
+        cfg = self.cfg
+        data = cfg['templates']['queue'].copy()
+        if overrides:
+            for k, v in overrides.items():
+                data[k] = self.substitute(v, values)
+        # add required missing params
+        data['queueName'] = qname
+        data['msgVpnName'] = cfg['router']['vpn']
+        # enable queues
+        data['egressEnabled'] = True
+        data['ingressEnabled'] = True
+        if subscriptions:
+            topics = [data.get('subscriptionTopic') or ''] + [self.substitute(t, values) for t in subscriptions]
+            data['subscriptionTopic'] = ':'.join(t for t in topics if t)
+        return data
+
+    #--------------------------------------------------------------------
+    # entry_parts
+    # queue entry (str or dict) -> (name pattern, overrides, subscriptions)
+    #--------------------------------------------------------------------
+    def entry_parts (self, entry):
+        if type(entry) is dict:
+            return entry['name'], entry.get('template'), entry.get('subscriptions')
+        return str(entry), None, None
+
+    #--------------------------------------------------------------------
+    # read_rows
+    # stream rows from a CSV (header row required) or JSONL file
+    # in chunks of chunk_size rows
+    #--------------------------------------------------------------------
+    def read_rows (self, fname):
+        log.info ('Reading queues from {}'.format(fname))
+        with open(fname, newline='') as fp:
+            if fname.endswith('.csv'):
+                reader = csv.DictReader(fp)
+            else:
+                reader = (json.loads(line) for line in fp if line.strip())
+            n = 0
+            while True:
+                chunk = list(itertools.islice(reader, self.chunk_size))
+                if not chunk:
+                    break
+                n = n + len(chunk)
+                log.debug ('read_rows: {} rows read from {}'.format(n, fname))
+                yield from chunk
+
+    #--------------------------------------------------------------------
+    # coerce
+    # CSV values are strings. Convert to template value type (int / bool)
+    #--------------------------------------------------------------------
+    def coerce (self, key, value):
+        if type(value) is not str:
+            return value
+        value = value.strip()
+        template_value = self.cfg['templates']['queue'].get(key)
+        if type(template_value) is str:
+            return value
+        if type(template_value) is bool or value.lower() in ['true', 'false']:
+            return value.lower() in ['true', 'yes', '1']
+        if type(template_value) is int or re.fullmatch(r'-?\d+', value):
+            try:
+                return int(value)
+            except ValueError:
+                return value
+        return value
+
+    def row_to_queue (self, row):
+        row = dict(row)
+        qname = row.pop('queueName').strip()
+        subscriptions = row.pop('subscriptions', None)
+        if type(subscriptions) is str:
+            subscriptions = [t for t in subscriptions.split(':') if t.strip()]
+        overrides = {}
+        for k, v in row.items():
+            if k is None or v is None or v == '':
+                continue # empty csv cells use template value
+            overrides[k] = self.coerce(k, v)
+        return self.expand_queue(qname, overrides, subscriptions)
+
+    def __iter__ (self):
+        for entry in self.entries:
+            pattern, overrides, subscriptions = self.entry_parts(entry)
+            for qname, values in self.expand_name(pattern):
+                with TraceHandler.span('expand', 'input'):
+                    data = self.expand_queue(qname, overrides, subscriptions, values)
+                    self.check_topics(data)
+                yield data
+        for fname in self.files:
+            for row in self.read_rows(fname):
+                with TraceHandler.span('expand', 'input'):
+                    data = self.row_to_queue(row)
+                    self.check_topics(data)
+                yield data
+
+    def check_topics (self, data):
+        errors = self.topic_v.normalize_queue(data)
+        if errors:
+            self.errors[data['queueName']] = errors
+
+    #--------------------------------------------------------------------
+    # validate
+    # expand whole input once (no SEMP calls) and return topic errors
+    # {queueName: [errors]}
+    #--------------------------------------------------------------------
+    def validate (self):
+        self.errors = {}
+        n = 0
+        for _ in self:
+            n = n + 1
+        log.info ('validate: {} queues checked, {} with invalid subscriptions'.format(n, len(self.errors)))
+        return self.errors
+
+    #--------------------------------------------------------------------
+    # count
+    # number of queues in the input - computed without expanding
+    # files are counted by records: CSV rows (blank lines skipped, quoted
+    # multi-line cells are one row) and non blank JSONL lines
+    #--------------------------------------------------------------------
+    def count (self):
+        n = sum(self.count_name(self.entry_parts(entry)[0]) for entry in self.entries)
+        for fname in self.files:
+            n = n + self.count_rows(fname)
+        return n
+
+    def count_rows (self, fname):
+        n = 0
+        with open(fname, newline='') as fp:
+            if fname.endswith('.csv'):
+                for row in csv.reader(fp):
+                    if row:
+                        n = n + 1
+                if n > 0:
+                    n = n - 1 # header
+            else:
+                for line in fp:
+                    if line.strip():
+                        n = n + 1
+        return n
+
+    def names (self):
+        for data in self:
+            yield data['queueName']
@@ -0,0 +1,173 @@
+#####################################################################
+# QueueMonitor
+#   Bulk queue depth / spool usage collector using SEMPv2 monitor API
+#   Pages thru msgVpns/<vpn>/queues with projected fields,
+#   writes delta encoded samples (JSONL or CSV) and keeps a rolling
+#   window to report top-N queues by spool growth
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import json
+import csv
+import time
+import heapq
+from collections import deque
+
+# Globals
+Verbose = 0
+log = None
+Stats = {'polls': 0, 'failed': 0, 'samples': 0, 'changed': 0, 'records': 0}
+
+class QueueMonitor():
+
+    def __init__(self, semp_h, cfg, verbose = 0):
+        global Verbose
+        global log
+        Verbose = verbose
+        log = cfg['log_handler'].get()
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        self.semp_h = semp_h
+        self.cfg = cfg
+        mon_cfg = cfg['system']['monitor']
+        self.fields = mon_cfg['fields']
+        self.growth_field = mon_cfg['growthField']
+        self.window = mon_cfg['window']
+        self.last = {}      # queueName -> last sample (for delta encoding)
+        self.history = {}   # queueName -> deque of (ts, growth_field value)
+        self.out_fp = None
+        self.csv_w = None
+
+    #--------------------------------------------------------------------
+    # monitor_url
+    # SEMP monitor url for queues collection in the VPN
+    #--------------------------------------------------------------------
+    def monitor_url (self):
+        cfg = self.cfg
+        sys_cfg = cfg['system']
+        return '{}/{}/msgVpns/{}/queues'.format(cfg['router']['sempUrl'], sys_cfg['semp']['monitorUrl'], cfg['router']['vpn'])
+
+    #--------------------------------------------------------------------
+    # open_output / close_output
+    # Samples are written as they are collected. CSV has one column per
+    # field, unchanged values are left empty
+    #--------------------------------------------------------------------
+    def open_output (self, outfile, fmt='jsonl'):
+        path,_ = os.path.split(outfile)
+        if path:
+            os.makedirs(path, exist_ok=True)
+        log.info ('Writing {} samples to {}'.format(fmt, outfile))
+        self.out_fp = open(outfile, 'a', newline='')
+        if fmt == 'csv':
+            self.csv_w = csv.DictWriter(self.out_fp, fieldnames=['ts', 'queueName', 'removed'] + self.fields,
+                                        extrasaction='ignore')
+            if self.out_fp.tell() == 0:
+                self.csv_w.writeheader()
+
+    def close_output (self):
+        if self.out_fp:
+            self.out_fp.close()
+            self.out_fp = None
+
+    def write_record (self, rec):
+        Stats['records'] += 1
+        if self.out_fp is None:
+            return
+        if self.csv_w:
+            self.csv_w.writerow(rec)
+        else:
+            self.out_fp.write(json.dumps(rec, separators=(',', ':')))
+            self.out_fp.write('\n')
+
+    #--------------------------------------------------------------------
+    # poll
+    # One bulk paged read of all queues in the VPN.
+    # Only changed fields are written. First sample of a queue is
+    # written in full. Queues that went away get a 'removed' record
+    # If the read fails the poll is skipped (returns None): a failed read
+    # is not an empty VPN, queues and their history are kept
+    #--------------------------------------------------------------------
+    def poll (self):
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        ts = round(time.time(), 3)
+        try:
+            data = self.semp_h.get_collection_data(self.monitor_url(), select=['queueName'] + self.fields, strict=True)
+        except ValueError as e:
+            Stats['failed'] += 1
+            log.error ('Poll failed: {}. Skipped'.format(e))
+            return None
+        Stats['polls'] += 1
+        seen = set()
+        for q in data:
+            qname = q['queueName']
+            seen.add(qname)
+            Stats['samples'] += 1
+            prev = self.last.get(qname)
+            sample = {k: q.get(k) for k in self.fields}
+            if prev is None:
+                delta = sample
+            else:
+                delta = {k: v for k, v in sample.items() if prev.get(k) != v}
+            if delta:
+                Stats['changed'] += 1
+                rec = {'ts': ts, 'queueName': qname}
+                rec.update(delta)
+                self.write_record(rec)
+            self.last[qname] = sample
+
+            hist = self.history.get(qname)
+            if hist is None:
+                hist = self.history[qname] = deque(maxlen=self.window)
+            hist.append((ts, sample.get(self.growth_field) or 0))
+
+        for qname in [q for q in self.last if q not in seen]:
+            self.write_record({'ts': ts, 'queueName': qname, 'removed': True})
+            del self.last[qname]
+            self.history.pop(qname, None)
+
+        if self.out_fp:
+            self.out_fp.flush()
+        log.debug ('poll: {} queues, {} records so far'.format(len(data), Stats['records']))
+        return len(data)
+
+    #--------------------------------------------------------------------
+    # top_growth
+    # top-N queues by growth of growthField over the rolling window
+    #--------------------------------------------------------------------
+    def top_growth (self, n):
+        growth = ((hist[-1][1] - hist[0][1], qname) for qname, hist in self.history.items() if len(hist) > 1)
+        return heapq.nlargest(n, growth)
+
+    def print_top_growth (self, n):
+        top = self.top_growth(n)
+        if not top:
+            return
+        log.notice ('Top {} queues by {} growth (last {} polls):'.format(n, self.growth_field, self.window))
+        for g, qname in top:
+            log.notice ('{:>20} : {}'.format(g, qname))
+
+    #--------------------------------------------------------------------
+    # run
+    # poll every interval seconds. count = 0 runs forever
+    #--------------------------------------------------------------------
+    def run (self, interval, count=0, top_n=10):
+        n = 0
+        while True:
+            t0 = time.time()
+            nq = self.poll()
+            n = n + 1
+            if nq is None:
+                print ('{}) Poll failed. Skipped'.format(n))
+            else:
+                print ('{}) Polled {} queues in {:.2f}s ({} records written)'.format(n, nq, time.time() - t0, Stats['records']))
+            self.print_top_growth(top_n)
+            if count and n >= count:
+                break
+            time.sleep(max(0, interval - (time.time() - t0)))
+
+    def print_stats(self):
+        log.notice ("Monitor Stats:")
+        for k,v in Stats.items():
+            log.notice("{:>20} : {}".format(k, v))
@@ -0,0 +1,194 @@
+#####################################################################
+# QueuePlan
+#   One provisioning plan from many input files
+#   Every input file is expanded (QueueInput) and merged into a single
+#   deduplicated plan keyed by (router, vpn, queueName):
+#     - same queue with the same attributes in several files: kept once.
+#       subscriptions are the union of all files
+#     - same queue with different attribute values: conflict. the queue
+#       is left out of the plan and reported with the values per file
+#     - different templates.dmqueue for the same router / vpn: conflict
+#   Subscriptions owned by queues of different files that overlap
+#   (equal, covers, covered, overlaps - see SubscriptionIndex) are
+#   reported: the same message would be spooled for two teams
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import json
+import time
+
+sys.path.insert(0, os.path.abspath("."))
+from common import QueueInput
+from common import SubscriptionIndex
+from common import TraceHandler
+
+# Globals
+Verbose = 0
+log = None
+Stats = {'files': 0, 'queues': 0, 'merged': 0, 'conflicts': 0, 'overlaps': 0}
+
+class PlanGroup():
+    """ merged queues for one router / vpn """
+
+    def __init__(self, key, cfg):
+        self.key = key          # (sempUrl, vpn)
+        self.cfg = cfg          # cfg of first file (router, templates)
+        self.queues = {}        # queueName -> expanded data (without subscriptionTopic)
+        self.topics = {}        # queueName -> {topic: [files]}
+        self.sources = {}       # queueName -> [files]
+        self.conflicts = {}     # queueName -> {attr: {file: value}}
+        self.dmqueue = {}       # file -> templates.dmqueue
+
+    def queue_defs (self):
+        for qname, data in self.queues.items():
+            if qname in self.conflicts:
+                continue
+            data = dict(data)
+            data['subscriptionTopic'] = ':'.join(self.topics[qname])
+            yield data
+
+class QueuePlan():
+
+    def __init__(self, cfg, verbose = 0):
+        global Verbose
+        global log
+        Verbose = verbose
+        log = cfg['log_handler'].get()
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        self.cfg = cfg
+        self.groups = {}  # (sempUrl, vpn) -> PlanGroup
+        self.errors = {}  # file -> {queueName: topic errors}
+
+    #--------------------------------------------------------------------
+    # file_cfg
+    # cfg for one input file (its router and templates)
+    #--------------------------------------------------------------------
+    def file_cfg (self, input_data):
+        cfg = dict(self.cfg)
+        cfg['router'] = dict(input_data['router'], **self.cfg['router']) # password from environment
+        cfg['templates'] = (input_data.get('templates') or {}).copy()
+        return cfg
+
+    #--------------------------------------------------------------------
+    # add_file
+    # expand queues of one input file and merge them into the plan
+    #--------------------------------------------------------------------
+    def add_file (self, fname, input_data):
+        log.enter ('Entering {}::{} file: {}'.format(__class__.__name__, inspect.stack()[0][3], fname))
+        cfg = self.file_cfg(input_data)
+        key = (cfg['router']['sempUrl'], cfg['router']['vpn'])
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = PlanGroup(key, cfg)
+        if 'dmqueue' in cfg['templates']:
+            group.dmqueue[fname] = cfg['templates']['dmqueue']
+
+        queue_in = QueueInput.QueueInput(cfg, input_data.get('queues'), Verbose, input_data.get('queueFiles', []))
+        n = 0
+        with TraceHandler.span('merge_file', file=fname):
+            for data in queue_in:
+                n = n + 1
+                self.merge(group, fname, data)
+        if queue_in.errors:
+            self.errors[fname] = queue_in.errors
+        Stats['files'] += 1
+        log.info ('{}: {} queues for router {} vpn {}'.format(fname, n, key[0], key[1]))
+
+    def merge (self, group, fname, data):
+        qname = data['queueName']
+        topics = [t for t in data.pop('subscriptionTopic', '').split(':') if t]
+        Stats['queues'] += 1
+        if qname not in group.queues:
+            group.queues[qname] = data
+            group.sources[qname] = [fname]
+            group.topics[qname] = {}
+        else:
+            Stats['merged'] += 1
+            group.sources[qname].append(fname)
+            current = group.queues[qname]
+            for attr in sorted(set(current) | set(data)):
+                if current.get(attr) == data.get(attr):
+                    continue
+                values = group.conflicts.setdefault(qname, {}).setdefault(attr, {})
+                if not values:
+                    values[group.sources[qname][0]] = current.get(attr)
+                values[fname] = data.get(attr)
+        for topic in topics:
+            group.topics[qname].setdefault(topic, []).append(fname)
+
+    #--------------------------------------------------------------------
+    # check
+    # conflicts and cross file subscription overlaps per router / vpn
+    # returns report {router|vpn: {queues, conflicts, overlaps}}
+    #--------------------------------------------------------------------
+    def check (self):
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        t0 = time.time()
+        report = {}
+        for key, group in self.groups.items():
+            dmqs = list(group.dmqueue.values())
+            if any(d != dmqs[0] for d in dmqs[1:]):
+                group.conflicts['templates.dmqueue'] = {'dmqueue': group.dmqueue}
+            with TraceHandler.span('plan_overlaps'):
+                overlaps = self.overlaps(group)
+            Stats['conflicts'] += len(group.conflicts)
+            Stats['overlaps'] += len(overlaps)
+            report['{}|{}'.format(*key)] = {
+                'queues': len(group.queues) - len([q for q in group.conflicts if q in group.queues]),
+                'conflicts': {q: {'files': group.sources.get(q, list(group.dmqueue)), 'values': v}
+                              for q, v in group.conflicts.items()},
+                'overlaps': overlaps}
+        log.info ('Plan checked in {:.2f}s'.format(time.time() - t0))
+        return report
+
+    #--------------------------------------------------------------------
+    # overlaps
+    # subscriptions of queues from different files that can match the
+    # same topic. each pair is reported once
+    #--------------------------------------------------------------------
+    def overlaps (self, group):
+        index = SubscriptionIndex.SubscriptionIndex()
+        owner = {} # queueName -> files defining it
+        for qname, topics in group.topics.items():
+            index.add_queue(qname, topics)
+            owner[qname] = set(group.sources[qname])
+        result = []
+        seen = set()
+        for qname, topics in group.topics.items():
+            for topic in topics:
+                for other_q, other_t, relation in index.overlaps(topic):
+                    if owner[other_q] & owner[qname]:
+                        continue # same team
+                    pair = tuple(sorted([(qname, topic), (other_q, other_t)]))
+                    if pair in seen:
+                        continue
+                    seen.add(pair)
+                    result.append({'queue': qname, 'subscription': topic, 'files': sorted(owner[qname]),
+                                   'otherQueue': other_q, 'otherSubscription': other_t,
+                                   'otherFiles': sorted(owner[other_q]), 'relation': relation})
+        return result
+
+    def print_report (self, report):
+        for key, rpt in report.items():
+            log.notice ('Plan for {}: {} queues, {} conflicts, {} overlapping subscriptions'.format(
+                        key, rpt['queues'], len(rpt['conflicts']), len(rpt['overlaps'])))
+            for qname, c in rpt['conflicts'].items():
+                log.error ('Conflict: {} in {}: {}'.format(qname, ', '.join(c['files']), json.dumps(c['values'], sort_keys=True)))
+            for o in rpt['overlaps']:
+                log.warn ('Overlap: {} {} ({}) {} {} {} ({})'.format(o['queue'], o['subscription'], ', '.join(o['files']),
+                          o['relation'], o['otherQueue'], o['otherSubscription'], ', '.join(o['otherFiles'])))
+
+    def save_report (self, report, outfile):
+        path,_ = os.path.split(outfile)
+        os.makedirs(path, exist_ok=True)
+        log.notice ('Writing plan report to {}'.format(outfile))
+        with open(outfile, 'w') as fp:
+            json.dump(report, fp, indent=2, sort_keys=True)
+
+    def print_stats(self):
+        log.notice ("Plan Stats:")
+        for k,v in Stats.items():
+            log.notice("{:>20} : {}".format(k, v))
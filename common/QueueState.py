@@ -0,0 +1,81 @@
+#####################################################################
+# QueueState
+#   Live index of queues on the broker (queueName -> attributes)
+#   Loaded with one bulk paged read and kept up to date with the writes
+#   done by Queues. Lets long running provisioners (see ProvisionDaemon)
+#   skip the per queue GET / POST round trips for queues they know.
+#   Subscriptions are loaded per queue on first use
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import threading
+import time
+
+# Globals
+Verbose = 0
+log = None
+
+class QueueState():
+
+    def __init__(self, semp_h, cfg, verbose = 0):
+        global Verbose
+        global log
+        Verbose = verbose
+        log = cfg['log_handler'].get()
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        self.semp_h = semp_h
+        self.cfg = cfg
+        self.queues = {}   # queueName -> attributes
+        self.topics = {}   # queueName -> set of subscription topics (once read)
+        self.lock = threading.Lock()
+        self.loaded = None
+        self.attrs = set() # attributes in the index
+
+    #--------------------------------------------------------------------
+    # load
+    # bulk read of all queues in the VPN projected to attrs
+    # raises ValueError if the read fails (index is kept as it was)
+    #--------------------------------------------------------------------
+    def load (self, attrs):
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        cfg = self.cfg
+        sys_cfg = cfg['system']
+        url = '{}/{}/msgVpns/{}/queues'.format(cfg['router']['sempUrl'], sys_cfg['semp']['configUrl'], cfg['router']['vpn'])
+        select = ['queueName'] + [a for a in attrs if a not in ['queueName', 'subscriptionTopic']]
+        queues = {}
+        for q in self.semp_h.get_collection_data(url, select=select, strict=True):
+            queues[q['queueName']] = q
+        with self.lock:
+            self.queues = queues
+            self.topics = {}
+            self.attrs = set(select)
+        self.loaded = time.time()
+        log.notice ('Queue state loaded: {} queues in VPN {}'.format(len(queues), cfg['router']['vpn']))
+
+    def exists (self, qname):
+        return qname in self.queues
+
+    def get (self, qname):
+        return self.queues.get(qname)
+
+    # record attributes written to the broker
+    def update (self, qname, data):
+        with self.lock:
+            current = self.queues.setdefault(qname, {'queueName': qname})
+            current.update({k: v for k, v in data.items() if k != 'subscriptionTopic'})
+
+    def remove (self, qname):
+        with self.lock:
+            self.queues.pop(qname, None)
+            self.topics.pop(qname, None)
+
+    # None if subscriptions of the queue are not known yet
+    def get_topics (self, qname):
+        return self.topics.get(qname)
+
+    def set_topics (self, qname, topics):
+        with self.lock:
+            self.topics[qname] = set(topics)
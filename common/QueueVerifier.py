@@ -0,0 +1,167 @@
+#####################################################################
+# QueueVerifier
+#   Post-apply verification of queues
+#   Reads back queues in the VPN with paged bulk GETs (projected to the
+#   template attributes) and compares them with expanded templates.
+#   Each queue is normalized to a canonical form and compared by hash,
+#   attributes are only diffed for queues whose hashes differ.
+#   Produces a pass/fail report per queue
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import json
+import time
+import hashlib
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+
+# Globals
+Verbose = 0
+log = None
+Stats = {'verified': 0, 'passed': 0, 'failed': 0, 'missing': 0}
+
+class QueueVerifier():
+
+    def __init__(self, semp_h, cfg, queue_h, verbose = 0):
+        global Verbose
+        global log
+        Verbose = verbose
+        log = cfg['log_handler'].get()
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        self.semp_h = semp_h
+        self.cfg = cfg
+        self.queue_h = queue_h
+        sys_cfg = cfg['system']
+        self.semp_queue_config_url = '{}/{}/msgVpns/{}/queues'.format(cfg['router']['sempUrl'], sys_cfg['semp']['configUrl'], cfg['router']['vpn'])
+        self.workers = sys_cfg['semp']['workers']
+
+    #--------------------------------------------------------------------
+    # read_queues
+    # All queues in the VPN, projected to the attributes we care about.
+    # One GET per page (semp.pageSize queues)
+    # strict: raise ValueError if the read fails (see get_collection_data)
+    #--------------------------------------------------------------------
+    def read_queues (self, attrs, strict=False):
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        select = ['queueName'] + [a for a in attrs if a != 'queueName']
+        queues = {}
+        for q in self.semp_h.get_collection_data(self.semp_queue_config_url, select=select, strict=strict):
+            queues[q['queueName']] = q
+        log.info ('read_queues: {} queues in VPN {}'.format(len(queues), self.cfg['router']['vpn']))
+        return queues
+
+    #--------------------------------------------------------------------
+    # read_subscriptions
+    # SEMPv2 has no VPN wide subscription collection. Subscriptions are
+    # read per queue (paged, projected) using a pool of workers
+    #--------------------------------------------------------------------
+    def read_subscriptions (self, qnames, strict=False):
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+
+        def read_one (qname):
+            url = '{}/{}/subscriptions'.format(self.semp_queue_config_url, quote(qname, safe=''))
+            return qname, [s['subscriptionTopic'] for s in self.semp_h.get_collection_data(url, select=['subscriptionTopic'], strict=strict)]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return dict(pool.map(read_one, qnames))
+
+    #--------------------------------------------------------------------
+    # canonical_hash
+    # stable hash of queue attrs (+ subscriptions if not None)
+    #--------------------------------------------------------------------
+    def canonical_hash (self, queue, attrs, topics):
+        canon = {k: queue.get(k) for k in attrs}
+        if topics is not None:
+            canon['subscriptionTopic'] = sorted(set(topics))
+        return hashlib.sha1(json.dumps(canon, sort_keys=True, separators=(',', ':')).encode()).digest()
+
+    #--------------------------------------------------------------------
+    # compare_queue
+    # returns dict of attr: {'desired': x, 'actual': y} for mismatches
+    #--------------------------------------------------------------------
+    def compare_queue (self, desired, actual, desired_topics, actual_topics):
+        diffs = {}
+        for k, v in desired.items():
+            if k in ['subscriptionTopic', 'msgVpnName']:
+                continue
+            if actual.get(k) != v:
+                diffs[k] = {'desired': v, 'actual': actual.get(k)}
+        if actual_topics is not None and set(desired_topics) != set(actual_topics):
+            diffs['subscriptionTopic'] = {'missing': sorted(set(desired_topics) - set(actual_topics)),
+                                          'extra': sorted(set(actual_topics) - set(desired_topics))}
+        return diffs
+
+    #--------------------------------------------------------------------
+    # verify
+    # Compare desired queues (expanded templates) against the broker
+    # Returns report dict: {queueName: {'status': PASS|FAIL|MISSING, 'diffs': {}}}
+    # Reads are strict: raises ValueError if the broker can't be read
+    # (a failed read is not drift)
+    #--------------------------------------------------------------------
+    def verify (self, desired_queues, check_subscriptions=True):
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        queue_h = self.queue_h
+        t0 = time.time()
+        desired_queues = list(desired_queues)
+        attrs = set()
+        for desired in desired_queues:
+            attrs.update(desired.keys())
+        attrs -= set(['subscriptionTopic', 'msgVpnName', 'queueName'])
+        actual_queues = self.read_queues(sorted(attrs), strict=True)
+
+        actual_subs = {}
+        if check_subscriptions:
+            actual_subs = self.read_subscriptions([d['queueName'] for d in desired_queues if d['queueName'] in actual_queues],
+                                                  strict=True)
+
+        report = {}
+        for desired in desired_queues:
+            qname = desired['queueName']
+            Stats['verified'] += 1
+            if qname not in actual_queues:
+                Stats['missing'] += 1
+                report[qname] = {'status': 'MISSING', 'diffs': {}}
+                continue
+            keys = [k for k in desired if k not in ['subscriptionTopic', 'msgVpnName']]
+            desired_topics = queue_h.get_subscription_topics(desired)
+            actual_topics = actual_subs.get(qname)
+            if self.canonical_hash(desired, keys, desired_topics if actual_topics is not None else None) == \
+               self.canonical_hash(actual_queues[qname], keys, actual_topics):
+                Stats['passed'] += 1
+                report[qname] = {'status': 'PASS', 'diffs': {}}
+                continue
+            diffs = self.compare_queue(desired, actual_queues[qname], desired_topics, actual_topics)
+            if diffs:
+                Stats['failed'] += 1
+                report[qname] = {'status': 'FAIL', 'diffs': diffs}
+            else:
+                Stats['passed'] += 1
+                report[qname] = {'status': 'PASS', 'diffs': {}}
+        log.info ('verify: {} queues verified in {:.2f}s'.format(len(desired_queues), time.time() - t0))
+        return report
+
+    #--------------------------------------------------------------------
+    # print_report / save_report
+    #--------------------------------------------------------------------
+    def print_report (self, report):
+        for qname, r in report.items():
+            if r['status'] == 'PASS':
+                log.info ('VERIFY {:>8} : {}'.format(r['status'], qname))
+            else:
+                log.error ('VERIFY {:>8} : {} {}'.format(r['status'], qname, json.dumps(r['diffs'], sort_keys=True)))
+
+    def save_report (self, report, outfile):
+        path,_ = os.path.split(outfile)
+        if path:
+            os.makedirs(path, exist_ok=True)
+        log.notice ('Writing verify report to {}'.format(outfile))
+        with open(outfile, 'w') as fp:
+            json.dump(report, fp, indent=4, sort_keys=True)
+
+    def print_stats(self):
+        log.notice ("Verify Stats:")
+        for k,v in Stats.items():
+            log.notice("{:>20} : {}".format(k, v))
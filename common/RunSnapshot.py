@@ -0,0 +1,149 @@
+#####################################################################
+# RunSnapshot
+#   Prior state of the queues an apply touches, for rollback
+#   Before create-queues2 writes anything, the queues in the input (and
+#   the DMQs they use) are read with one bulk paged GET (projected to
+#   the input attributes) plus pooled per queue subscription reads, and
+#   saved as a compact gzipped JSON file per run:
+#     <outputDir>/runs/<vpn>-<timestamp>.json.gz
+#   Queues that did not exist are recorded as null and listed in
+#   'absent'. The reads are strict: if the bulk read or any
+#   subscription read fails, capture raises ValueError and the run must
+#   stop before any write (a failed read is not an empty VPN).
+#   Rollback replays the snapshot thru Queues.create_or_update_queue
+#   (patch mode, same minimal-diff writes as the forward path) and
+#   deletes the queues the run created: only those confirmed absent
+#   when the snapshot was taken.
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import json
+import gzip
+import time
+
+sys.path.insert(0, os.path.abspath("."))
+from common import LogHandler
+from common import QueueVerifier
+from common import QueueConfig2
+from common import TraceHandler
+
+# Globals
+Verbose = 0
+log = None
+
+class RunSnapshot():
+
+    def __init__(self, semp_h, cfg, verbose = 0):
+        global Verbose
+        global log
+        Verbose = verbose
+        log = cfg['log_handler'].get()
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        self.semp_h = semp_h
+        self.cfg = cfg
+        self.run_dir = '{}/runs'.format(cfg['system']['system']['outputDir'])
+
+    def run_file (self, run_id):
+        return '{}/{}.json.gz'.format(self.run_dir, run_id)
+
+    #--------------------------------------------------------------------
+    # capture
+    # save prior state of queues in input (and extra queues, eg: prune
+    # plan). returns run id
+    # raises ValueError if the queues / subscriptions can't be read
+    #--------------------------------------------------------------------
+    def capture (self, queue_in, extra=None):
+        log.enter ('Entering {}::{}'.format(__class__.__name__, inspect.stack()[0][3]))
+        cfg = self.cfg
+        t0 = time.time()
+        qnames = set(extra or [])
+        attrs = set(['egressEnabled', 'ingressEnabled'])
+        for data in queue_in:
+            qnames.add(data['queueName'])
+            attrs.update(data.keys())
+            dmq = data.get('deadMsgQueue')
+            if dmq and not dmq.startswith('#') and 'dmqueue' in cfg['templates']:
+                qnames.add(dmq)
+        if 'dmqueue' in cfg['templates']:
+            attrs.update(cfg['templates']['dmqueue'].keys())
+        attrs -= set(['subscriptionTopic', 'msgVpnName', 'queueName'])
+
+        verify_h = QueueVerifier.QueueVerifier(self.semp_h, cfg, None, Verbose)
+        with TraceHandler.span('snapshot_queues'):
+            actual = verify_h.read_queues(sorted(attrs), strict=True)
+        existing = [q for q in qnames if q in actual]
+        with TraceHandler.span('snapshot_subscriptions'):
+            topics = verify_h.read_subscriptions(existing, strict=True)
+
+        queues = {}
+        for qname in sorted(qnames):
+            if qname not in actual:
+                queues[qname] = None
+                continue
+            data = actual[qname]
+            data['msgVpnName'] = cfg['router']['vpn']
+            data['subscriptionTopic'] = ':'.join(topics.get(qname, []))
+            queues[qname] = data
+
+        run_id = '{}-{}'.format(cfg['router']['vpn'], LogHandler.ts())
+        snapshot = {'runId': run_id, 'router': cfg['router']['sempUrl'], 'vpn': cfg['router']['vpn'],
+                    'attrs': sorted(attrs), 'queues': queues,
+                    'absent': sorted(q for q in qnames if q not in actual)}
+        os.makedirs(self.run_dir, exist_ok=True)
+        with gzip.open(self.run_file(run_id), 'wt') as fp:
+            json.dump(snapshot, fp, separators=(',', ':'))
+        log.notice ('Run {}: prior state of {} queues ({} new) saved to {} in {:.2f}s'.format(
+                    run_id, len(queues), len(queues) - len(existing), self.run_file(run_id), time.time() - t0))
+        return run_id
+
+    #--------------------------------------------------------------------
+    # load
+    #--------------------------------------------------------------------
+    def load (self, run_id):
+        fname = self.run_file(run_id)
+        if not os.path.isfile(fname):
+            raise ValueError('No snapshot for run {} ({})'.format(run_id, fname))
+        with gzip.open(fname, 'rt') as fp:
+            snapshot = json.load(fp)
+        if snapshot['router'] != self.cfg['router']['sempUrl'] or snapshot['vpn'] != self.cfg['router']['vpn']:
+            raise ValueError('Run {} was on router {} vpn {}'.format(run_id, snapshot['router'], snapshot['vpn']))
+        return snapshot
+
+    #--------------------------------------------------------------------
+    # rollback
+    # restore prior state
+    #  - queues that existed: patched back (changed attrs / subscriptions)
+    #  - queues created by the run: deleted. only queues in 'absent'
+    #    (confirmed by a successful read at capture). other null
+    #    queues are left alone
+    # DMQs are restored from the snapshot like other queues, not from
+    # templates.dmqueue
+    #--------------------------------------------------------------------
+    def rollback (self, run_id):
+        log.enter ('Entering {}::{} run: {}'.format(__class__.__name__, inspect.stack()[0][3], run_id))
+        snapshot = self.load(run_id)
+        t0 = time.time()
+        cfg = dict(self.cfg)
+        cfg['templates'] = {k: v for k, v in self.cfg['templates'].items() if k != 'dmqueue'}
+        queue_h = QueueConfig2.Queues(self.semp_h, cfg, None, Verbose)
+        restore = [data for data in snapshot['queues'].values() if data is not None]
+        absent = set(snapshot.get('absent', []))
+        created = sorted(q for q, data in snapshot['queues'].items() if data is None and q in absent)
+        unknown = sorted(q for q, data in snapshot['queues'].items() if data is None and q not in absent)
+        if unknown:
+            log.warn ('Rollback of run {}: {} queues not confirmed absent before the run. Not deleted: {}'.format(
+                      run_id, len(unknown), ', '.join(unknown)))
+        log.notice ('Rollback of run {}: restoring {} queues, deleting {} queues created by the run'.format(
+                    run_id, len(restore), len(created)))
+        with TraceHandler.span('rollback_restore'):
+            queue_h.create_or_update_queue(True, restore)
+        failed = set(queue_h.failed_queues)
+        if created:
+            with TraceHandler.span('rollback_delete'):
+                queue_h.prune_queues(created)
+            failed.update(queue_h.failed_queues)
+        log.notice ('Rollback of run {} done in {:.2f}s ({} failed)'.format(run_id, time.time() - t0, len(failed)))
+        return failed
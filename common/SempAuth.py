@@ -0,0 +1,147 @@
+##############################################################################
+# SempAuth
+#   Credential providers for SEMP requests (router sempAuth)
+#     basic: HTTP basic auth. header is built once
+#     oauth: OAuth bearer token (client credentials grant)
+#            router.oauth.tokenUrl (+ optional scope). sempUser is the
+#            client id and SEMP_PASSWORD the client secret
+#   One provider is shared by all worker threads (set as session.auth).
+#   The token is cached and refreshed semp.auth.refreshBefore seconds
+#   before it expires: one thread refreshes while the others keep using
+#   the current token. A 401 causes one refresh for all threads that
+#   got it with the same token (see refresh)
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+##############################################################################
+
+import sys, os, inspect
+import time
+import base64
+import threading
+import requests
+from requests.auth import AuthBase
+
+Verbose = 0
+log = None
+Stats = {'tokens': 0, 'refreshed_401': 0, 'refresh_failed': 0}
+
+#-----------------------------------------------------------------------
+# provider
+#   credential provider for the router in cfg
+#
+def provider(cfg, session=None):
+    global log
+    log = cfg['log_handler'].get()
+    router = cfg['router']
+    kind = router.get('sempAuth', 'basic')
+    if kind == 'basic':
+        return BasicAuth(router['sempUser'], router['sempPassword'])
+    if kind == 'oauth':
+        oauth = router['oauth']
+        return OAuthToken(oauth['tokenUrl'], router['sempUser'], router['sempPassword'], oauth.get('scope'),
+                          cfg['system']['semp'].get('auth', {}).get('refreshBefore', 30), session)
+    raise ValueError('Unknown sempAuth {} (basic | oauth)'.format(kind))
+
+class BasicAuth(AuthBase):
+    """ HTTP basic auth """
+
+    def __init__(self, user, password):
+        self.user = user
+        creds = base64.b64encode('{}:{}'.format(user, password).encode()).decode()
+        self.value = 'Basic ' + creds
+
+    def __call__(self, r):
+        r.headers['Authorization'] = self.value
+        return r
+
+    # credentials can't change. nothing to retry with
+    def refresh(self, used):
+        return False
+
+    def print_stats(self):
+        pass
+
+class Token():
+    def __init__(self, value, expires_at, refresh_at):
+        self.value = value
+        self.expires_at = expires_at
+        self.refresh_at = refresh_at
+
+class OAuthToken(AuthBase):
+    """ cached OAuth bearer token shared by all threads """
+
+    def __init__(self, token_url, client_id, client_secret, scope=None, refresh_before=30, session=None):
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope
+        self.refresh_before = refresh_before
+        self.session = session or requests.Session()
+        self.lock = threading.Lock()
+        self.current = None
+
+    def __call__(self, r):
+        r.headers['Authorization'] = 'Bearer ' + self.token()
+        return r
+
+    #--------------------------------------------------------------------
+    # fetch
+    # new token from the token endpoint. called with self.lock held
+    #--------------------------------------------------------------------
+    def fetch(self):
+        data = {'grant_type': 'client_credentials'}
+        if self.scope:
+            data['scope'] = self.scope
+        t0 = time.time()
+        resp = self.session.post(self.token_url, data=data, auth=(self.client_id, self.client_secret))
+        if resp.status_code != 200:
+            raise ValueError('Token request to {} returned {}'.format(self.token_url, resp.status_code))
+        body = resp.json()
+        expires_in = body.get('expires_in', 3600)
+        self.current = Token(body['access_token'], t0 + expires_in,
+                             t0 + max(expires_in - self.refresh_before, expires_in / 2))
+        Stats['tokens'] += 1
+        log.info ('New SEMP token from {} (expires in {}s)'.format(self.token_url, expires_in))
+
+    #--------------------------------------------------------------------
+    # token
+    # valid token. before expiry (refresh window) one thread refreshes and
+    # the others use the current token. expired: all wait for the refresh
+    #--------------------------------------------------------------------
+    def token(self):
+        t = self.current
+        now = time.time()
+        if t is not None and now < t.refresh_at:
+            return t.value
+        if t is not None and now < t.expires_at:
+            if self.lock.acquire(blocking=False):
+                try:
+                    if self.current is t:
+                        self.fetch()
+                except Exception as e:
+                    Stats['refresh_failed'] += 1
+                    log.warn ('Early token refresh failed: {}. Using current token'.format(e))
+                finally:
+                    self.lock.release()
+            return self.current.value
+        with self.lock:
+            if self.current is t:
+                self.fetch()
+            return self.current.value
+
+    #--------------------------------------------------------------------
+    # refresh
+    # request with header 'used' got 401. only the first thread with that
+    # token fetches a new one; returns True to retry the request
+    #--------------------------------------------------------------------
+    def refresh(self, used):
+        with self.lock:
+            if self.current is not None and used == 'Bearer ' + self.current.value:
+                Stats['refreshed_401'] += 1
+                self.fetch()
+        return True
+
+    def print_stats(self):
+        log.notice ("Auth Stats:")
+        for k,v in Stats.items():
+            log.notice("{:>20} : {}".format(k, v))
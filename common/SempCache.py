@@ -0,0 +1,125 @@
+#####################################################################
+# SempCache
+#   Optional read-through cache for SEMP GETs (see SempHandler.http_get)
+#    - LRU bounded by total response size (semp.cache.maxBytes)
+#    - TTL per collection (semp.cache.ttl). The collection of a URL is
+#      the last collection name in the path
+#        .../msgVpns/vpn1/queues/q1/subscriptions -> subscriptions
+#        .../msgVpns/vpn1/queues/q1               -> queues
+#    - writes (POST, PATCH, PUT, DELETE) invalidate cached URLs under
+#      the written URL and the collections above it
+#    - concurrent GETs for the same URL share one request
+#   Only 200 responses from the config API are cached
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+# Globals
+Stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'invalidated': 0, 'evicted': 0}
+
+class SempCache():
+
+    def __init__(self, cache_cfg, config_url):
+        self.max_bytes = cache_cfg.get('maxBytes', 50000000)
+        self.ttls = cache_cfg.get('ttl', {})
+        self.default_ttl = self.ttls.get('default', 30)
+        self.config_path = '/' + config_url.strip('/') + '/'
+        self.entries = OrderedDict() # key -> (url, expires, size, resp)
+        self.inflight = {}           # key -> Future
+        self.size = 0
+        self.generation = 0          # bumped on every write
+        self.lock = threading.Lock()
+
+    #--------------------------------------------------------------------
+    # cacheable
+    # only config API URLs. monitor data changes all the time
+    #--------------------------------------------------------------------
+    def cacheable (self, url):
+        return self.config_path in urlparse(url).path
+
+    def ttl (self, url):
+        parts = [p for p in urlparse(url).path.split('/') if p]
+        collection = None
+        if 'msgVpns' in parts:
+            # names and collections alternate after msgVpns
+            i = parts.index('msgVpns')
+            collection = parts[i + 2 * ((len(parts) - i - 1) // 2)]
+        return self.ttls.get(collection, self.default_ttl)
+
+    #--------------------------------------------------------------------
+    # get
+    # cached response for key or fetch() it. one fetch per key at a time
+    #--------------------------------------------------------------------
+    def get (self, key, url, fetch):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self.entries.move_to_end(key)
+                    Stats['hits'] += 1
+                    return entry[3]
+                self.drop(key)
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                Stats['misses'] += 1
+                future = self.inflight[key] = Future()
+                generation = self.generation
+            else:
+                Stats['coalesced'] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            resp = fetch()
+            size = len(resp.content) # read body now. response is shared
+        except Exception as e:
+            with self.lock:
+                del self.inflight[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.inflight[key]
+            # a write since the fetch started may have changed the object
+            if resp.status_code == 200 and generation == self.generation and size <= self.max_bytes:
+                self.entries[key] = (url, time.time() + self.ttl(url), size, resp)
+                self.size += size
+                while self.size > self.max_bytes:
+                    self.drop(next(iter(self.entries)))
+                    Stats['evicted'] += 1
+        future.set_result(resp)
+        return resp
+
+    def drop (self, key):
+        entry = self.entries.pop(key)
+        self.size -= entry[2]
+
+    #--------------------------------------------------------------------
+    # invalidate
+    # after a write to url: drop cached URLs under url (the object and
+    # its children) and above it (collections and parents listing it)
+    #--------------------------------------------------------------------
+    def invalidate (self, url):
+        path = urlparse(url).path.rstrip('/')
+        with self.lock:
+            self.generation += 1
+            for key in [k for k, e in self.entries.items() if self.related(path, urlparse(e[0]).path.rstrip('/'))]:
+                self.drop(key)
+                Stats['invalidated'] += 1
+
+    def related (self, path, cached):
+        return cached == path or cached.startswith(path + '/') or path.startswith(cached + '/')
+
+    def print_stats (self, log):
+        log.notice ("SEMP Cache Stats:")
+        for k,v in Stats.items():
+            log.notice("{:>20} : {}".format(k, v))
+        log.notice("{:>20} : {} ({} bytes)".format('entries', len(self.entries), self.size))
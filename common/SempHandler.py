@@ -8,13 +8,17 @@
 
 import sys, os, inspect
 import pprint
+import threading
 import json
+import logging
 import requests
-from requests.auth import HTTPBasicAuth
 from urllib.parse import unquote # for Python 3.7
 
 sys.path.insert(0, os.path.abspath("."))
 from common import JsonHandler
+from common import TraceHandler
+from common import SempCache
+from common import SempAuth
 from collections import defaultdict
 
 pp = pprint.PrettyPrinter(indent=4)
@@ -23,6 +27,9 @@ Cfg = {}
 json_h = None
 log = None
 Stats = {'get': 0, 'post': 0, 'patch': 0, 'delete': 0 }
+StatsLock = threading.Lock() # SempHandler is shared by worker threads
+# POST statuses that are part of normal runs (logged at debug, sampled at info)
+QuietStatus = ['ALREADY_EXISTS', 'USER_SKIPPED']
 
 #-----------------------------------------------------------------------
 # Object to convert custom json to python object
@@ -49,69 +56,162 @@ class SempHandler:
         self.vpn = vpn
         self.out_dir = outdir
 
+        # one session for all requests - keeps connections to the broker
+        # open between requests. pool sized for semp.workers threads
+        workers = Cfg['system']['semp'].get('workers', 1)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(10, workers))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # credentials (basic or OAuth token) shared by all requests / workers
+        self.auth = SempAuth.provider(Cfg, requests.Session())
+        self.session.auth = self.auth
+
+        # optional snapshot db for get_link_data exports (SnapshotStore)
+        self.store = None
+
+        # optional GET cache (semp.cache.enabled)
+        self.cache = None
+        cache_cfg = Cfg['system']['semp'].get('cache', {})
+        if cache_cfg.get('enabled'):
+            self.cache = SempCache.SempCache(cache_cfg, Cfg['system']['semp']['configUrl'])
+
+        # restore (apply_links): export files are read ahead of the POSTs
+        restore_cfg = Cfg['system']['semp'].get('restore', {})
+        self.reader = JsonHandler.JsonReader(json_h, restore_cfg.get('prefetch', 8), restore_cfg.get('readers', 1),
+                                             restore_cfg.get('cacheFiles', 1000))
+
 
     #-------------------------------------------------------------  
     # http_get
     #  
-    def http_get(self, url, params=None):
+    def http_get(self, url, params=None, select=None, where=None):
         global Stats
         log.enter ("Entering {}:{} url: {} params: {}".format( __class__.__name__, inspect.stack()[0][3], url, params))
 
-        Stats['get'] += 1
-        n = Stats['get']
+        params = self.semp_params(params, select, where)
+        if self.cache is not None and self.cache.cacheable(url):
+            key = (url, json.dumps(params, sort_keys=True))
+            return self.cache.get(key, url, lambda: self.semp_get(url, params))
+        return self.semp_get(url, params)
+
+    #-------------------------------------------------------------  
+    # semp_get
+    #   GET from the broker (no cache)
+    #
+    def semp_get(self, url, params=None):
+        n = self.count('get')
 
-        log.info  (f'GET URL ({n}): {url}')
+        if log.sampled('get'):
+            log.info  (f'GET URL ({n}): {url} params: {params}')
         verb = 'get'
-        semp_user = Cfg["router"]["sempUser"]
-        semp_pass = Cfg["router"]["sempPassword"]
         hdrs = {"content-type": "application/json"}
-        auth = HTTPBasicAuth(semp_user, semp_pass)
-        if params:
-            resp = getattr(requests, verb)(url, 
+        with TraceHandler.semp_span(verb, url) as sp:
+            resp = self.send(verb, url, 
                 headers=hdrs,
-                auth=auth,
                 params=params,
                 data=None,
                 verify=True)
-        else:
-            resp = getattr(requests, verb)(url, 
-                headers=hdrs,
-                auth=auth,
-                data=None,
-                verify=True)
+            sp.set(status=resp.status_code)
         #log.info ('SEMP GET returned: {}'.format(resp))
         #log.info ('SEMP GET returned: {}'.format(json.dump(resp, indent=4, sort_keys=True)))
-        log.info ('http_get {} returned:\n{}'.format(url,resp))
+        if resp.status_code != 200:
+            log.warn ('http_get {} returned {}'.format(url, resp.status_code))
+        elif log.sampled('get_resp'):
+            log.info ('http_get {} returned: {}'.format(url, resp))
         #log.trace ('http_get returned: {}'.format(json.dumps(resp, indent=4)))
         log.trace ('http_get returned: {}'.format(resp))
 
 
         return resp
 
+    #-------------------------------------------------------------
+    # send
+    #   request thru the shared session (auth from self.auth).
+    #   on 401 the credential provider refreshes the token once for all
+    #   workers that used it, and the request is retried once
+    #
+    def send(self, verb, url, **kwargs):
+        resp = self.session.request(verb, url, **kwargs)
+        if resp.status_code == 401 and self.auth.refresh(resp.request.headers.get('Authorization')):
+            log.notice ('SEMP {} {} returned 401. Retrying with new token'.format(verb.upper(), url))
+            resp = self.session.request(verb, url, **kwargs)
+        return resp
+
+    #-------------------------------------------------------------
+    # invalidate
+    #   drop cached GETs affected by a write to url
+    #
+    def invalidate(self, url):
+        if self.cache is not None:
+            self.cache.invalidate(url)
+
+    #-------------------------------------------------------------
+    # count
+    #   thread safe request counter. returns count for the verb
+    #
+    def count(self, verb):
+        with StatsLock:
+            Stats[verb] += 1
+            return Stats[verb]
+
+    # total SEMP requests so far (progress reporting)
+    def calls(self):
+        return sum(Stats.values())
+
+    #-------------------------------------------------------------
+    # semp_params
+    #   merge SEMPv2 select= (field projection) and where= (server side
+    #   filter) into request params. select / where can be a list or
+    #   a comma separated string
+    #   eg: select=['queueName','maxMsgSpoolUsage'] where=['queueName==orders/*']
+    #
+    def semp_params(self, params=None, select=None, where=None):
+        params = dict(params) if params else {}
+        if select:
+            params['select'] = select if type(select) is str else ','.join(select)
+        if where:
+            params['where'] = where if type(where) is str else ','.join(where)
+        return params if params else None
+
     #-------------------------------------------------------------  
     # http_post
     #
     def http_post(self, url, json_data):
         log.enter ("Entering {}:{} url = {}".format( __class__.__name__, inspect.stack()[0][3], url))
-        log.info('SEMP POST url: {}'.format(url))
-        log.info ('SEMP posting json-data: {}'.format (json.dumps(json_data, indent=4, sort_keys=True)))
+        self.count('post')
         verb = 'post'
-        semp_user = Cfg["router"]["sempUser"]
-        semp_pass = Cfg["router"]["sempPassword"]
-        resp = getattr(requests, verb)(url, 
-            headers={"content-type": "application/json"},
-            auth=(semp_user, semp_pass),
-            data=(json.dumps(json_data) if json_data != None else None),
-            verify=True)
+        with TraceHandler.span('json_encode', 'json'):
+            body = json.dumps(json_data) if json_data != None else None
+        with TraceHandler.semp_span(verb, url) as sp:
+            resp = self.send(verb, url, 
+                headers={"content-type": "application/json"},
+                data=body,
+                verify=True)
+            sp.set(status=resp.status_code)
+        self.invalidate(url)
         log.trace ('http_post resp : {}'.format(resp))
         log.trace ("resp text : {}".format(resp.text))
-        json_resp = json.loads(resp.text)
-
-        log.info ('SEMP POST returned: {}'.format(json.dumps(json_resp, indent=4, sort_keys=True)))
+        with TraceHandler.span('json_decode', 'json'):
+            json_resp = json.loads(resp.text)
+
+        # request / response at INFO: sampled when ok or an expected status
+        # (ALREADY_EXISTS, USER_SKIPPED), always on error (incl NOT_ALLOWED)
+        expected = json_resp['meta']['responseCode'] == 200 or \
+                   json_resp['meta'].get('error', {}).get('status') in QuietStatus
+        if not expected or log.sampled('post'):
+            with TraceHandler.span('log_json', 'log'):
+                log.info ('SEMP POST url: {} json-data: {} returned: {}'.format(url, json.dumps(json_data, sort_keys=True),
+                                                                           json.dumps(json_resp['meta'], sort_keys=True)))
 
         if json_resp['meta']['responseCode'] == 200:
             log.debug (' http_post returned {}'. format(json_resp['meta']['responseCode']))
             return "OK"          
+        elif expected:
+            log.debug ("http_post returned {} ({})".format(json_resp['meta']['responseCode'],
+                                            json_resp['meta']['error']['status']))
+            return json_resp['meta']['error']['status']
         else:
             log.error  ("http_post returned {} ({})".format(json_resp['meta']['responseCode'],
                                             json_resp['meta']['error']['status']))
@@ -125,30 +225,35 @@ class SempHandler:
     #
     def http_patch (self, url, json_data):
         log.enter ("Entering {}:{} url = {}".format( __class__.__name__, inspect.stack()[0][3], url))
-        log.info('SEMP PATCH url: {}'.format(url))
-        log.info ('SEMP patching json-data: {}'.format(json.dumps(json_data, indent=4, sort_keys=True)))
-        log.trace ('patching json-data:\n', json.dumps(json_data, indent=4, sort_keys=True))
+        self.count('patch')
 
         verb = 'patch'
-        semp_user = Cfg["router"]["sempUser"]
-        semp_pass = Cfg["router"]["sempPassword"]
-        resp = getattr(requests, verb)(url, 
-            headers={"content-type": "application/json"},
-            auth=(semp_user, semp_pass),
-            data=(json.dumps(json_data) if json_data != None else None),
-            verify=False)
+        if log.isEnabledFor(logging.TRACE):
+            log.trace ('patching json-data:\n{}'.format(json.dumps(json_data, indent=4, sort_keys=True)))
+        with TraceHandler.span('json_encode', 'json'):
+            body = json.dumps(json_data) if json_data != None else None
+        with TraceHandler.semp_span(verb, url) as sp:
+            resp = self.send(verb, url, 
+                headers={"content-type": "application/json"},
+                data=body,
+                verify=False)
+            sp.set(status=resp.status_code)
+        self.invalidate(url)
         log.trace ('http_patch resp : {}'.format(resp))
         log.trace ("resp text : {}".format(resp.text))
-        json_resp = json.loads(resp.text)
-
-        #log.info ('SEMP PATCH returned: {}'.format(json_resp))
+        with TraceHandler.span('json_decode', 'json'):
+            json_resp = json.loads(resp.text)
 
-        log.info ('SEMP PATCH returned: {}'.format(json.dumps(json_resp, indent=4, sort_keys=True)))
+        # request / response at INFO: sampled when ok, always on error
+        if json_resp['meta']['responseCode'] != 200 or log.sampled('patch'):
+            with TraceHandler.span('log_json', 'log'):
+                log.info ('SEMP PATCH url: {} json-data: {} returned: {}'.format(url, json.dumps(json_data, sort_keys=True),
+                                                                            json.dumps(json_resp['meta'], sort_keys=True)))
 
         if json_resp['meta']['responseCode'] == 200:
-            log.debug (' http_patch returned ', json_resp['meta']['responseCode'])            
+            log.debug (' http_patch returned {}'.format(json_resp['meta']['responseCode']))            
         else:
-            log.debug ("         http_patch returned {} ({}) : {}".format(json_resp['meta']['responseCode'],
+            log.error ("http_patch returned {} ({}) : {}".format(json_resp['meta']['responseCode'],
                                                           json_resp['meta']['error']['status'],
                                                           json_resp['meta']['error']['description']))
 
@@ -163,13 +268,11 @@ class SempHandler:
         log.info('SEMP putting json-data: {}'.format(json.dumps(json_data, indent=4, sort_keys=True)))
         log.trace ('posting json-data:\n', json.dumps(json_data, indent=4, sort_keys=True))
         verb = 'put'
-        semp_user = Cfg["router"]["sempUser"]
-        semp_pass = Cfg["router"]["sempPassword"]
-        resp = getattr(requests, verb)(url, 
+        resp = self.send(verb, url, 
             headers={"content-type": "application/json"},
-            auth=(semp_user, semp_pass),
             data=(json.dumps(json_data) if json_data != None else None),
             verify=True)
+        self.invalidate(url)
         
         #log.info ('SEMP PUT returned: {}'.format(json.dump(resp.json(), indent=4, sort_keys=True)))
         log.info ('SEMP PUT returned: {}'.format(resp.json()))
@@ -184,22 +287,21 @@ class SempHandler:
         log.enter ("Entering {}:{} url = {}".format( __class__.__name__, inspect.stack()[0][3], url))
         ignore_status = ['INVALID_PATH']
 
+        self.count('delete')
 
-        semp_user = Cfg["router"]["sempUser"]
-        semp_pass = Cfg["router"]["sempPassword"]
-        
-        log.info('SEMP DELETE url: {}'.format(url))
-
-        log.debug ("   DELETE URL {} ({})".format(unquote(url), semp_user))
+        log.debug ("   DELETE URL {}".format(unquote(url)))
    
-        resp = requests.delete(url, 
-            headers={"content-type": "application/json"},
-            auth=(semp_user, semp_pass),
-            data=(None),
-            verify=False)
+        with TraceHandler.semp_span('delete', url) as sp:
+            resp = self.send('delete', url, 
+                headers={"content-type": "application/json"},
+                data=(None),
+                verify=False)
+            sp.set(status=resp.status_code)
+        self.invalidate(url)
         
-        log.info ('SEMP DELETE returned: {}'.format(resp))
-        log.debug ('http_delete returning : {}'.format(json.dump(resp.json(), indent=4, sort_keys=True)))
+        if resp.status_code != 200 or log.sampled('delete'):
+            log.info ('SEMP DELETE url: {} returned: {}'.format(url, resp))
+        log.debug ('http_delete returning : {}'.format(json.dumps(resp.json(), sort_keys=True)))
         log.trace ('Response:\n%s',resp.json())
         if (resp.status_code != 200):
             log.error ('Non-200 Response text: {}'.format(resp.text))
@@ -220,8 +322,13 @@ class SempHandler:
 
         return self.get_config_json(url)
 
-    def get_config_json (self, url, collections=False, paging=True):
-        """ get vpn object config json """
+    def get_config_json (self, url, collections=False, paging=True, select=None, where=None, strict=False):
+        """ get vpn object config json
+            select: list of attributes to return (SEMPv2 select=)
+            where : list of filter expressions (SEMPv2 where=). collections only
+            strict: raise ValueError if the GET fails (default: warn and
+                    return the error response)
+        """
         log.enter ('Entering {}::{} url = {}'.format(__class__.__name__, inspect.stack()[0][3], url))
         verb='get'
 
@@ -240,24 +347,51 @@ class SempHandler:
             if paging :
                 log.debug ("   Get URL {} [{}] (*)".format(u_url, page_size))
                 params = {'count':page_size}
-                resp = self.http_get(url, params)
+                resp = self.http_get(url, params, select, where)
             else:
                 log.debug ("   Get URL {} (*)".format(u_url))
-                resp = self.http_get(url)
+                resp = self.http_get(url, select=select, where=where)
         else:
             # No paging for non-collection objects
             log.debug ("   Get URL {}".format(u_url))
-            resp = self.http_get(url) 
+            resp = self.http_get(url, select=select) 
 
             log.trace ("Get: req.json(): {}".format(resp.json()))
+        with TraceHandler.span('json_decode', 'json'):
+            json_resp = resp.json()
         if (resp.status_code != 200):
+            if strict:
+                raise ValueError('GET {} returned {}'.format(u_url, resp.status_code))
             log.warn (f'Unable to parse URL {u_url}. Skipping')
             log.debug (resp.text)
-            return resp.json()
+            return json_resp
 
             #raise RuntimeError
         else:
-            return resp.json()
+            return json_resp
+
+    def get_collection_data (self, url, select=None, where=None, strict=False):
+        """ get all objects in a collection (eg: msgVpns/<vpn>/queues)
+            follows nextPageUri and returns list of data from all pages.
+            select / where are sent on first page only. nextPageUri carries them
+            strict: raise ValueError if any page fails instead of returning
+                    the objects read so far
+        """
+        log.enter ('Entering {}::{} url = {}'.format(__class__.__name__, inspect.stack()[0][3], url))
+
+        json_data = self.get_config_json(url, True, True, select, where, strict)
+        data = []
+        while True:
+            if 'data' in json_data:
+                data.extend(json_data['data'])
+            meta_data = json_data.get('meta', {})
+            if 'paging' not in meta_data:
+                break
+            next_page_uri = meta_data['paging']['nextPageUri']
+            log.debug ("Processing Next Page URI : %s", unquote(next_page_uri))
+            json_data = self.get_config_json(next_page_uri, strict=strict)
+        log.debug ('get_collection_data: {} objects from {}'.format(len(data), unquote(url)))
+        return data
 
     def process_page_links (self, json_data):
         """ given json data, traverse thur all links in meta section 
@@ -321,13 +455,17 @@ class SempHandler:
         log.debug ("Processing link {}".format(url))  
         json_data = self.get_config_json (url, collection, paging)
 
-        # Write data to file
-        fname = json_h.get_unique_fname(path, obj)
-        log.trace ('fname: {} path: {} outdir: {}'.format(fname, path, self.out_dir))
-        outfile = '{}/{}/{}'.format(self.out_dir,path,fname)
+        if self.store is not None:
+            # export to snapshot db (see common/SnapshotStore.py)
+            self.store.add(path, obj, json_data)
+        else:
+            # Write data to file
+            fname = json_h.get_unique_fname(path, obj)
+            log.trace ('fname: {} path: {} outdir: {}'.format(fname, path, self.out_dir))
+            outfile = '{}/{}/{}'.format(self.out_dir,path,fname)
 
-        log.debug ("Save json to file: {}".format (outfile))
-        json_h.save_config_json (outfile, json_data )
+            log.debug ("Save json to file: {}".format (outfile))
+            json_h.save_config_json (outfile, json_data )
 
         # Process meta - look for cursor/paging
         meta_data = json_data['meta']
@@ -355,6 +493,11 @@ class SempHandler:
         log.notice ("SEMP Stats:")
         for k,v in Stats.items():
             log.notice("{:>20} : {}".format(k, v))
+        if self.cache is not None:
+            self.cache.print_stats(log)
+        self.auth.print_stats()
+        if self.reader.stats['read']:
+            self.reader.print_stats(log)
             
             
     #-------------------------------------------------------------
@@ -537,7 +680,8 @@ class SempHandler:
         log.debug (f" target_url: {target_url} target_obj: {target_obj} src_path: {src_path}")
         log.debug  ('LINKS:', links)
 
-        json_h = JsonHandler.JsonHandler(Cfg)
+        # export files are listed / decoded by self.reader (shared, prefetching)
+        reader = self.reader
 
         # links: http://localhost:8080/SEMP/v2/config/msgVpns/sys-test-vpn1/queues
         # http://localhost:8080/SEMP/v2/config/msgVpns/sys-test-vpn1/queues/sys-q1 
@@ -558,7 +702,7 @@ class SempHandler:
 
             #json_file = unquote("{}/{}.json".format(path, obj))
             url = "{}/{}/{}".format(target_url,target_obj,obj1)
-            json_files = json_h.list_json_files (path, obj1) 
+            json_files = reader.list_json_files (path, obj1) 
             
             # look for link-2 format 'http://localhost:8080/SEMP/v2/config/msgVpns/sys-test-vpn1/aclProfiles/sys-acl1/clientConnectException 
             if len(json_files) == 0 :
@@ -566,7 +710,7 @@ class SempHandler:
                 # src_obj2 : sys-acl1
                 src_link_tails2,obj2 = os.path.split(src_link_tails1)
                 path="{}/{}/{}".format(src_path, obj2, obj1)
-                json_files = json_h.list_json_files (path, obj1)
+                json_files = reader.list_json_files (path, obj1)
                 log.debug  (f'looking for path: {path} obj1: {obj1}')
 
                 if len(json_files) > 0 :
@@ -575,9 +719,11 @@ class SempHandler:
                     url = "{}/{}/{}".format(target_url, obj2, obj1)
                     #print (f'new url : {url}')
 
-            for json_file in json_files:
-                log.info  ('Reading JSON file  {}'.format(json_file))
-                js_obj = json_h.read_json_data(json_file)
+            # next files are decoded while this one is posted
+            for json_file, js_obj in reader.read(json_files):
+                log.info  ('Applying JSON file  {}'.format(json_file))
+                if not js_obj:
+                    continue # no data element (see read_json_data)
                 json_data = js_obj['data']
                 links = js_obj['links']
                 next_page_uri = js_obj['next_page_uri']
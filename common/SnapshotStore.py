@@ -0,0 +1,219 @@
+#####################################################################
+# SnapshotStore
+#   SQLite store for VPN config exports (see SempHandler.get_link_data)
+#   One table per SEMP object type (queues, aclProfiles, ...) with one
+#   row per object. Each export is a snapshot versioned by timestamp.
+#   Key reference attributes (system snapshot.refAttrs, eg: deadMsgQueue,
+#   aclProfileName) go to an indexed refs table so "which queues use
+#   DMQ X" is one indexed lookup.
+#
+#   snapshots (id, ts, router, vpn)
+#   <type>    (seq, snapshot, vpn, parent, name, data)
+#   refs      (snapshot, vpn, type, name, attr, value)
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+import re
+import json
+import time
+import sqlite3
+from urllib.parse import unquote
+
+# Globals
+Verbose = 0
+log = None
+Stats = {'snapshots': 0, 'objects': 0, 'refs': 0}
+
+TypeRe = re.compile(r'^[A-Za-z][A-Za-z0-9]*$')
+
+class SnapshotStore():
+
+    def __init__(self, cfg, dbfile, verbose = 0):
+        global Verbose
+        global log
+        Verbose = verbose
+        log = cfg['log_handler'].get()
+        log.enter ('Entering {}::{} db: {}'.format(__class__.__name__, inspect.stack()[0][3], dbfile))
+        self.cfg = cfg
+        self.ref_attrs = set(cfg['system']['snapshot']['refAttrs'])
+        path,_ = os.path.split(dbfile)
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self.db = sqlite3.connect(dbfile)
+        self.db.execute('CREATE TABLE IF NOT EXISTS snapshots (id INTEGER PRIMARY KEY, ts TEXT, router TEXT, vpn TEXT)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS refs (snapshot INTEGER, vpn TEXT, type TEXT, name TEXT, attr TEXT, value TEXT)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS refs_attr ON refs (attr, value, snapshot)')
+        self.db.commit()
+        self.types = set(self.object_types())
+        self.snapshot = None
+        self.seq = 0
+
+    #--------------------------------------------------------------------
+    # object_types
+    # object type tables in the db
+    #--------------------------------------------------------------------
+    def object_types (self):
+        rows = self.db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT IN ('snapshots', 'refs')")
+        return [r[0] for r in rows]
+
+    def create_type (self, obj_type):
+        if not TypeRe.match(obj_type):
+            raise ValueError('Invalid object type {}'.format(obj_type))
+        if obj_type in self.types:
+            return
+        self.db.execute('CREATE TABLE IF NOT EXISTS {} (seq INTEGER, snapshot INTEGER, vpn TEXT, parent TEXT, name TEXT, data TEXT)'.format(obj_type))
+        self.db.execute('CREATE INDEX IF NOT EXISTS {0}_name ON {0} (snapshot, vpn, name)'.format(obj_type))
+        self.db.execute('CREATE INDEX IF NOT EXISTS {0}_parent ON {0} (snapshot, parent)'.format(obj_type))
+        self.types.add(obj_type)
+
+    #--------------------------------------------------------------------
+    # begin / end
+    # one snapshot per export
+    #--------------------------------------------------------------------
+    def begin (self, router, vpn):
+        ts = time.strftime('%Y-%m-%dT%H:%M:%S')
+        cur = self.db.execute('INSERT INTO snapshots (ts, router, vpn) VALUES (?, ?, ?)', (ts, router, vpn))
+        self.snapshot = cur.lastrowid
+        self.vpn = vpn
+        self.seq = 0 # objects in this snapshot (export order)
+        Stats['snapshots'] += 1
+        log.notice ('Snapshot {} ({}) of VPN {} on {}'.format(self.snapshot, ts, vpn, router))
+        return self.snapshot
+
+    def end (self):
+        self.db.commit()
+        log.notice ('Snapshot {} saved: {} objects'.format(self.snapshot, self.seq))
+        self.snapshot = None
+
+    #--------------------------------------------------------------------
+    # name_of
+    # identifying attribute of an object
+    #   queues -> queueName, clientUsernames -> clientUsername,
+    #   subscriptions -> subscriptionTopic
+    #--------------------------------------------------------------------
+    def name_of (self, obj_type, data):
+        singular = obj_type[:-1] if obj_type.endswith('s') else obj_type
+        for k in [singular + 'Name', singular]:
+            if k in data:
+                return str(data[k])
+        for k in sorted(data):
+            if k.startswith(singular) and k != 'msgVpnName':
+                return str(data[k])
+        return json.dumps(data, sort_keys=True)
+
+    #--------------------------------------------------------------------
+    # add
+    # store SEMP response (as saved by get_link_data)
+    # path: path below the VPN (eg: /queues/q1/subscriptions)
+    #--------------------------------------------------------------------
+    def add (self, path, obj, json_data):
+        obj_type = obj if obj else 'msgVpns' # VPN object itself
+        parent = path[:path.rfind('/')] if obj else '' # /queues/q1/subscriptions -> /queues/q1
+        self.create_type(obj_type)
+        data = json_data.get('data', [])
+        if type(data) is not list:
+            data = [data]
+        for d in data:
+            name = self.name_of(obj_type, d)
+            self.seq = self.seq + 1
+            self.db.execute('INSERT INTO {} (seq, snapshot, vpn, parent, name, data) VALUES (?, ?, ?, ?, ?, ?)'.format(obj_type),
+                            (self.seq, self.snapshot, self.vpn, parent, name, json.dumps(d, sort_keys=True)))
+            Stats['objects'] += 1
+            for attr in self.ref_attrs.intersection(d.keys()):
+                self.db.execute('INSERT INTO refs (snapshot, vpn, type, name, attr, value) VALUES (?, ?, ?, ?, ?, ?)',
+                                (self.snapshot, self.vpn, obj_type, name, attr, str(d[attr])))
+                Stats['refs'] += 1
+
+    #--------------------------------------------------------------------
+    # queries
+    #--------------------------------------------------------------------
+    def snapshots (self):
+        return self.db.execute('SELECT id, ts, router, vpn FROM snapshots ORDER BY id').fetchall()
+
+    def latest (self):
+        return self.db.execute('SELECT max(id) FROM snapshots').fetchone()[0]
+
+    # objects referencing value thru attr. eg: ('deadMsgQueue', 'dmq1')
+    def find_refs (self, attr, value, snapshot=None, obj_type=None):
+        snapshot = snapshot or self.latest()
+        sql = 'SELECT type, vpn, name FROM refs WHERE attr = ? AND value = ? AND snapshot = ?'
+        args = [attr, value, snapshot]
+        if obj_type:
+            sql += ' AND type = ?'
+            args.append(obj_type)
+        return self.db.execute(sql + ' ORDER BY type, name', args).fetchall()
+
+    # objects of a type (parent path, name, data)
+    def objects (self, obj_type, snapshot=None, name=None):
+        if obj_type not in self.types:
+            return []
+        snapshot = snapshot or self.latest()
+        sql = 'SELECT parent, name, data FROM {} WHERE snapshot = ?'.format(obj_type)
+        args = [snapshot]
+        if name is not None:
+            sql += ' AND name = ?'
+            args.append(name)
+        return [(p, n, json.loads(d)) for p, n, d in self.db.execute(sql + ' ORDER BY seq', args)]
+
+    #--------------------------------------------------------------------
+    # diff
+    # objects added, removed and changed (with attrs) from snapshot a to b
+    #--------------------------------------------------------------------
+    def diff (self, snap_a, snap_b):
+        result = {}
+        for obj_type in sorted(self.types):
+            sql = 'SELECT parent, name, data FROM {} WHERE snapshot = ?'.format(obj_type)
+            a = {(p, n): d for p, n, d in self.db.execute(sql, (snap_a,))}
+            b = {(p, n): d for p, n, d in self.db.execute(sql, (snap_b,))}
+            changed = {}
+            for k in a.keys() & b.keys():
+                if a[k] != b[k]:
+                    da, db = json.loads(a[k]), json.loads(b[k])
+                    changed[self.label(k)] = {attr: {'from': da.get(attr), 'to': db.get(attr)}
+                                              for attr in sorted(da.keys() | db.keys())
+                                              if attr != 'msgVpnName' and da.get(attr) != db.get(attr)}
+            added = sorted(self.label(k) for k in b.keys() - a.keys())
+            removed = sorted(self.label(k) for k in a.keys() - b.keys())
+            if added or removed or changed:
+                result[obj_type] = {'added': added, 'removed': removed, 'changed': changed}
+        return result
+
+    def label (self, key):
+        parent, name = key
+        return '{}/{}'.format(unquote(parent), name) if parent else name
+
+    #--------------------------------------------------------------------
+    # restore
+    # apply snapshot to vpn_url (.../msgVpns/<vpn>) thru semp_apply
+    # object types are applied in export order (parents before children)
+    #--------------------------------------------------------------------
+    def restore (self, semp_h, vpn_url, snapshot):
+        log.enter ('Entering {}::{} snapshot: {}'.format(__class__.__name__, inspect.stack()[0][3], snapshot))
+        order = []
+        for obj_type in self.types:
+            first = self.db.execute('SELECT min(seq) FROM {} WHERE snapshot = ?'.format(obj_type), (snapshot,)).fetchone()[0]
+            if first is not None:
+                order.append((first, obj_type))
+        n = 0
+        for _, obj_type in sorted(order):
+            for parent, name, data in self.db.execute('SELECT parent, name, data FROM {} WHERE snapshot = ? ORDER BY seq'.format(obj_type), (snapshot,)):
+                if obj_type == 'msgVpns':
+                    url = os.path.split(vpn_url)[0]
+                else:
+                    url = '{}{}/{}'.format(vpn_url, parent, obj_type)
+                log.debug ('restore {} {} -> {}'.format(obj_type, name, url))
+                try:
+                    semp_h.semp_apply(url, obj_type, parent, json.loads(data))
+                    n = n + 1
+                except Exception as e:
+                    log.error ('restore: Failed to apply {} {}: {}'.format(obj_type, name, e))
+        log.notice ('Restored {} objects from snapshot {}'.format(n, snapshot))
+        return n
+
+    def print_stats(self):
+        log.notice ("Snapshot Stats:")
+        for k,v in Stats.items():
+            log.notice("{:>20} : {}".format(k, v))
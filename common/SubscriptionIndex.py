@@ -0,0 +1,195 @@
+#####################################################################
+# SubscriptionIndex
+#   Trie index of queue subscriptions (one level per node) that knows
+#   Solace wildcards:
+#     *      whole level wildcard          orders/*/new
+#     ab*    prefix wildcard in a level    orders/us*/new
+#     >      one or more trailing levels   orders/>
+#   #noexport/ and #share/<name>/ prefixes are indexed on the topic
+#   that follows them.
+#   match()   : queues attracting a topic  (time ~ topic depth)
+#   overlaps(): subscriptions that can match the same topic as a given
+#               subscription, and whether one covers (shadows) the other
+#   Built from the input (QueueInput) or from the broker (per queue
+#   subscription reads, see QueueVerifier.read_subscriptions)
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+from collections import Counter
+
+class Node():
+    __slots__ = ('children', 'prefixes', 'subs', 'rest')
+
+    def __init__(self):
+        self.children = {}  # level (literal, '*') -> Node
+        self.prefixes = {}  # 'ab' (for ab*) -> Node
+        self.subs = set()   # (queueName, subscription) ending here
+        self.rest = set()   # (queueName, subscription) ending with '>' here
+
+class SubscriptionIndex():
+
+    def __init__(self):
+        self.root = Node()
+        self.count = 0
+        self.queues = set()
+
+    # topic levels without #noexport / #share prefixes
+    def levels (self, topic):
+        levels = topic.split('/')
+        if levels[0] == '#noexport':
+            levels = levels[1:]
+        if len(levels) > 2 and levels[0] == '#share':
+            levels = levels[2:]
+        return levels
+
+    #--------------------------------------------------------------------
+    # add
+    #--------------------------------------------------------------------
+    def add (self, qname, subscription):
+        node = self.root
+        levels = self.levels(subscription)
+        for i, level in enumerate(levels):
+            if level == '>' and i == len(levels) - 1:
+                node.rest.add((qname, subscription))
+                break
+            if level.endswith('*') and level != '*':
+                node = node.prefixes.setdefault(level[:-1], Node())
+            else:
+                node = node.children.setdefault(level, Node())
+        else:
+            node.subs.add((qname, subscription))
+        self.count = self.count + 1
+        self.queues.add(qname)
+
+    def add_queue (self, qname, topics):
+        for topic in topics:
+            self.add(qname, topic)
+
+    #--------------------------------------------------------------------
+    # match
+    # (queueName, subscription) that attract a published topic
+    #--------------------------------------------------------------------
+    def match (self, topic):
+        levels = topic.split('/')
+        found = set()
+        nodes = [self.root]
+        for level in levels:
+            next_nodes = []
+            for node in nodes:
+                found.update(node.rest) # '>' needs one or more levels
+                child = node.children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+                child = node.children.get('*')
+                if child is not None:
+                    next_nodes.append(child)
+                for prefix, child in node.prefixes.items():
+                    if level.startswith(prefix):
+                        next_nodes.append(child)
+            nodes = next_nodes
+            if not nodes:
+                break
+        for node in nodes:
+            found.update(node.subs)
+        return found
+
+    def match_queues (self, topic):
+        return set(q for q, _ in self.match(topic))
+
+    #--------------------------------------------------------------------
+    # overlaps
+    # subscriptions that can match a topic also matched by subscription
+    # returns list of (queueName, other subscription, relation)
+    #   relation: equal | covers (subscription shadows other)
+    #             covered (other shadows subscription) | overlaps
+    #--------------------------------------------------------------------
+    def overlaps (self, subscription):
+        levels = self.levels(subscription)
+        result = []
+        self.walk_overlaps(self.root, levels, 0, True, True, result)
+        return result
+
+    # covers: subscription covers the path so far, covered: path covers subscription
+    def walk_overlaps (self, node, levels, i, covers, covered, result):
+        if i == len(levels):
+            for q, s in node.subs:
+                result.append((q, s, self.relation(covers, covered)))
+            return
+        level = levels[i]
+        last = i == len(levels) - 1
+        if level == '>' and last:
+            # rest of subscription matches anything below (1+ levels)
+            for q, s in node.rest:
+                result.append((q, s, self.relation(covers, covered)))
+            self.collect_below(node, covers, result)
+            return
+        # other subscriptions ending with '>' here cover this one
+        for q, s in node.rest:
+            result.append((q, s, self.relation(False, covered)))
+        for other, child in node.children.items():
+            if other == level:
+                self.walk_overlaps(child, levels, i + 1, covers, covered, result)
+            elif other == '*':
+                self.walk_overlaps(child, levels, i + 1, False, covered, result)
+            elif level == '*':
+                self.walk_overlaps(child, levels, i + 1, covers, False, result)
+            elif level.endswith('*') and other.startswith(level[:-1]):
+                self.walk_overlaps(child, levels, i + 1, covers, False, result)
+        for prefix, child in node.prefixes.items():
+            if level == '*':
+                self.walk_overlaps(child, levels, i + 1, covers, False, result)
+            elif level.endswith('*'):
+                mine = level[:-1]
+                if mine == prefix:
+                    self.walk_overlaps(child, levels, i + 1, covers, covered, result)
+                elif prefix.startswith(mine):
+                    self.walk_overlaps(child, levels, i + 1, covers, False, result)
+                elif mine.startswith(prefix):
+                    self.walk_overlaps(child, levels, i + 1, False, covered, result)
+            elif level.startswith(prefix):
+                self.walk_overlaps(child, levels, i + 1, False, covered, result)
+
+    # every subscription with one or more levels below node ('>' covers them)
+    def collect_below (self, node, covers, result):
+        stack = list(node.children.values()) + list(node.prefixes.values())
+        while stack:
+            n = stack.pop()
+            for q, s in n.subs:
+                result.append((q, s, self.relation(covers, False)))
+            for q, s in n.rest:
+                result.append((q, s, self.relation(covers, False)))
+            stack.extend(n.children.values())
+            stack.extend(n.prefixes.values())
+
+    def relation (self, covers, covered):
+        if covers and covered:
+            return 'equal'
+        if covers:
+            return 'covers'
+        if covered:
+            return 'covered'
+        return 'overlaps'
+
+    #--------------------------------------------------------------------
+    # match_file
+    # bulk match of sample topics (one per line)
+    # returns (matches per queue Counter, topics with no queue)
+    #--------------------------------------------------------------------
+    def match_file (self, fname):
+        per_queue = Counter()
+        unmatched = []
+        n = 0
+        with open(fname) as fp:
+            for line in fp:
+                topic = line.strip()
+                if not topic or topic.startswith('#'):
+                    continue
+                n = n + 1
+                queues = self.match_queues(topic)
+                if not queues:
+                    unmatched.append(topic)
+                per_queue.update(queues)
+        return n, per_queue, unmatched
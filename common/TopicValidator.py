@@ -0,0 +1,98 @@
+#####################################################################
+# TopicValidator
+#   Local validation and normalization of Solace SMF subscription topics
+#   Runs over the input before the first SEMP call so malformed topics
+#   don't cost a broker round trip
+#     - levels are separated by '/'. Empty levels are not allowed
+#     - '*' alone or at the end of a level (prefix wildcard: ord*)
+#     - '>' only as the whole last level
+#     - max topic length and number of levels (system topics.*)
+#     - #noexport/ and #share/<shareName>/ prefixes
+#   Normalization: surrounding blanks and trailing '/' are removed and
+#   duplicate topics in a queue are dropped (first one is kept)
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+#
+#####################################################################
+
+import sys, os, inspect
+
+class TopicValidator():
+
+    def __init__(self, cfg):
+        topics_cfg = cfg['system'].get('topics', {})
+        self.max_length = topics_cfg.get('maxLength', 250)
+        self.max_levels = topics_cfg.get('maxLevels', 128)
+
+    #--------------------------------------------------------------------
+    # check_topic
+    # returns (normalized topic, error or None)
+    #--------------------------------------------------------------------
+    def check_topic (self, topic):
+        topic = topic.strip()
+        while topic.endswith('/') and len(topic) > 1:
+            topic = topic[:-1]
+        if not topic:
+            return topic, 'empty topic'
+        if len(topic.encode()) > self.max_length:
+            return topic, 'longer than {} bytes'.format(self.max_length)
+
+        # fast path: no wildcards, prefixes or empty levels
+        if '*' not in topic and '>' not in topic and '#' not in topic and '//' not in topic and topic[0] != '/':
+            if topic.count('/') >= self.max_levels:
+                return topic, 'more than {} levels'.format(self.max_levels)
+            return topic, None
+
+        levels = topic.split('/')
+        if levels[0] == '#noexport':
+            levels = levels[1:]
+        if levels and levels[0] == '#share':
+            if len(levels) < 3:
+                return topic, '#share needs a share name and a topic'
+            if not levels[1] or '*' in levels[1] or '>' in levels[1]:
+                return topic, 'invalid share name {!r}'.format(levels[1])
+            levels = levels[2:]
+        if len(levels) > self.max_levels:
+            return topic, 'more than {} levels'.format(self.max_levels)
+        last = len(levels) - 1
+        for i, level in enumerate(levels):
+            if not level:
+                return topic, 'empty level {}'.format(i + 1)
+            if level.startswith('#'):
+                return topic, 'reserved level {!r}'.format(level)
+            if '>' in level and (level != '>' or i != last):
+                return topic, "'>' must be the whole last level"
+            if '*' in level[:-1]:
+                return topic, "'*' must be at the end of a level"
+        return topic, None
+
+    #--------------------------------------------------------------------
+    # check_topics
+    # returns (normalized unique topics, errors). invalid topics are
+    # kept as given
+    #--------------------------------------------------------------------
+    def check_topics (self, topics):
+        seen = set()
+        normalized = []
+        errors = []
+        for topic in topics:
+            topic, error = self.check_topic(topic)
+            if error:
+                errors.append('{}: {}'.format(topic, error))
+            if topic in seen:
+                continue
+            seen.add(topic)
+            normalized.append(topic)
+        return normalized, errors
+
+    #--------------------------------------------------------------------
+    # normalize_queue
+    # normalize subscriptionTopic (':' separated) of a queue in place
+    # returns list of errors
+    #--------------------------------------------------------------------
+    def normalize_queue (self, data):
+        if not data.get('subscriptionTopic'):
+            return []
+        topics, errors = self.check_topics(t for t in data['subscriptionTopic'].split(':') if t.strip())
+        data['subscriptionTopic'] = ':'.join(topics)
+        return errors
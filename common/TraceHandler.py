@@ -0,0 +1,153 @@
+########################################################################
+# TraceHandler
+#  Records spans (queue, SEMP call, local phases) and writes them
+#  in Chrome trace-event format (chrome://tracing, ui.perfetto.dev)
+#
+#  Tracing is off unless a TraceHandler is started. span() is a cheap
+#  no-op when tracing is off
+#
+#  with TraceHandler.span('yaml_load', 'local', file=fname):
+#      ...
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+########################################################################
+
+import os, sys
+import json
+import time
+import threading
+from urllib.parse import urlparse
+
+# active tracer (None when tracing is off)
+Tracer = None
+
+class Span :
+   'one timed span. args can be added before the span ends'
+
+   def __init__ (self, tracer, name, cat, args):
+      self.tracer = tracer
+      self.name = name
+      self.cat = cat
+      self.args = args
+
+   def set (self, **args):
+      self.args.update(args)
+
+   def __enter__ (self):
+      self.start = time.perf_counter()
+      return self
+
+   def __exit__ (self, exc_type, exc, tb):
+      if exc_type is not None:
+         self.args['error'] = exc_type.__name__
+      self.tracer.add(self.name, self.cat, self.start, time.perf_counter(), self.args)
+      return False
+
+class NoSpan :
+   'span used when tracing is off'
+
+   def set (self, **args):
+      pass
+
+   def __enter__ (self):
+      return self
+
+   def __exit__ (self, exc_type, exc, tb):
+      return False
+
+No_Span = NoSpan()
+
+class TraceHandler :
+   'Chrome trace-event recorder'
+
+   def __init__ (self, outfile):
+      self.outfile = outfile
+      self.events = []
+      self.threads = {}
+      self.lock = threading.Lock()
+      self.t0 = time.perf_counter()
+      self.pid = os.getpid()
+
+   def start (self):
+      global Tracer
+      Tracer = self
+      return self
+
+   def stop (self):
+      global Tracer
+      Tracer = None
+
+   # ------------------------------------------------------------------------------
+   # add a complete ('X') event. times are perf_counter seconds
+   #
+   def add (self, name, cat, start, end, args):
+      t = threading.current_thread()
+      ev = {'name': name, 'cat': cat, 'ph': 'X', 'pid': self.pid, 'tid': t.ident,
+            'ts': round((start - self.t0) * 1e6, 1), 'dur': round((end - start) * 1e6, 1)}
+      if args:
+         ev['args'] = args
+      with self.lock:
+         if t.ident not in self.threads:
+            self.threads[t.ident] = t.name
+         self.events.append(ev)
+
+   # ------------------------------------------------------------------------------
+   # save trace to outfile
+   #
+   def save (self):
+      events = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                for tid, name in self.threads.items()]
+      path,_ = os.path.split(self.outfile)
+      if path:
+         os.makedirs(path, exist_ok=True)
+      with open(self.outfile, 'w') as fp:
+         json.dump({'traceEvents': events + self.events, 'displayTimeUnit': 'ms'}, fp)
+      print ('Trace ({} events) written to {}'.format(len(self.events), self.outfile))
+
+# ------------------------------------------------------------------------------
+# span
+#   returns a Span when tracing is on, No_Span otherwise
+#
+def span (name, cat='local', **args):
+   tracer = Tracer
+   if tracer is None:
+      return No_Span
+   return Span(tracer, name, cat, args)
+
+# ------------------------------------------------------------------------------
+# semp_span
+#   span for a SEMP call. name: VERB url-template
+#
+def semp_span (verb, url):
+   tracer = Tracer
+   if tracer is None:
+      return No_Span
+   template = url_template(url)
+   return Span(tracer, '{} {}'.format(verb.upper(), template), 'semp', {'verb': verb.upper(), 'url': template})
+
+# ------------------------------------------------------------------------------
+# url_template
+#   SEMP url to template - object names replaced by {}
+#   https://host:943/SEMP/v2/config/msgVpns/vpn1/queues/q1/subscriptions
+#     -> /SEMP/v2/config/msgVpns/{}/queues/{}/subscriptions
+#
+def url_template (url):
+   u = urlparse(url)
+   parts = u.path.split('/')
+   if 'msgVpns' in parts:
+      i = parts.index('msgVpns')
+      for j in range(i + 1, len(parts), 2):
+         parts[j] = '{}'
+   return '/'.join(parts)
+
+# ------------------------------------------------------------------------------
+# trace_logger
+#   time log record formatting / writing on all handlers of a logger
+#
+def trace_logger (logger):
+   for h in logger.handlers:
+      emit = h.emit
+      def traced_emit (record, emit=emit, h=h):
+         with span('log', 'log', handler=type(h).__name__):
+            emit(record)
+      h.emit = traced_emit
@@ -2,8 +2,10 @@
 # create-queues2
 #
 # This program creates new or update existing queues on a Solace PubSub+ broker using SEMPv2
-# While updating, Queue will be temporarily disabled.
+# While updating, Queue is temporarily disabled only if a changed attribute requires it.
 # This version takes a single Yaml file as input with all required inputs
+# Queues can be listed in the Yaml file and / or streamed from CSV or JSONL
+# files (one queue per row with per queue overrides on top of templates.queue)
 #
 # Requirements:
 #  Python 3
@@ -12,6 +14,20 @@
 # Running:
 # Create queues:
 #   python3 create-queues2.py --input input/queues.yaml
+# Create queues listed in a CSV file (queueName,maxBindCount,subscriptionTopic,...):
+#   python3 create-queues2.py --input input/queues.yaml --queues-file input/orders.csv
+# Create / update queues and verify broker config matches the input:
+#   python3 create-queues2.py --input input/queues.yaml --patch --verify
+# Check for manual changes on the broker (read only, exit code 3 on drift,
+# 7 if the broker could not be read):
+#   python3 create-queues2.py --input input/queues.yaml --check-drift
+# Undo a run (run id is printed by each run):
+#   python3 create-queues2.py --input input/queues.yaml --rollback nram-dev1-20240101-120000
+# Drop new queues that don't fit in the VPN limits instead of failing the run:
+#   python3 create-queues2.py --input input/queues.yaml --capacity trim
+# Delete team1/ queues no longer in the input (show plan first):
+#   python3 create-queues2.py --input input/queues.yaml --patch --prune --owned team1/ --dry-run
+#   python3 create-queues2.py --input input/queues.yaml --patch --prune --owned team1/
 #
 # Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
 ########################################################################
@@ -27,6 +43,12 @@ from common import SempHandler
 #from common import JsonHandler
 from common import QueueConfig2
 from common import YamlHandler
+from common import QueueVerifier
+from common import RunSnapshot
+from common import QueueInput
+from common import CapacityPlanner
+from common import TraceHandler
+from common import ProfileHandler
 
 
 pp = pprint.PrettyPrinter(indent=4)
@@ -45,21 +67,55 @@ def main(argv):
     p = argparse.ArgumentParser()
     p.add_argument('--input', dest="input_file", required=True, 
                    help='user input Yaml file') 
+    p.add_argument('--queues-file', dest="queues_files", action='append', required=False, default=[], 
+                   help='CSV or JSONL file with one queue per row. Can be repeated') 
     p.add_argument('--patch', dest="patch_it", action='store_true', required=False, default=False, 
-                   help='user input csv file') 
+                   help='update existing queues') 
+    p.add_argument('--prune', dest="prune", action='store_true', required=False, default=False, 
+                   help='delete owned queues in the VPN that are not in the input (needs --owned)') 
+    p.add_argument('--owned', dest="owned", action='append', required=False, default=[], 
+                   help='queue name prefix or glob owned by this input (prune scope). Can be repeated') 
+    p.add_argument('--dry-run', dest="dry_run", action='store_true', required=False, default=False, 
+                   help='with --prune: print the prune plan and exit without changes') 
+    p.add_argument('--max-deletions', dest="max_deletions", type=int, required=False, default=None, 
+                   help='with --prune: refuse to delete more queues than this (default: system prune.maxDeletions)') 
+    p.add_argument('--capacity', dest="capacity", choices=['reject', 'trim', 'warn'], required=False, default=None, 
+                   help='plan exceeding VPN limits: reject (exit code 5), trim new queues or warn (default: system capacity.policy)') 
+    p.add_argument('--verify', dest="verify", action='store_true', required=False, default=False, 
+                   help='read back queues after apply and report drift (exit code 3 on drift, 7 if unreadable)') 
+    p.add_argument('--check-drift', dest="check_drift", action='store_true', required=False, default=False, 
+                   help='read only: compare broker queues and subscriptions with the input (exit code 3 on drift, 7 if unreadable)') 
+    p.add_argument('--rollback', dest="rollback", required=False, default=None, metavar='RUN_ID',
+                   help='restore queues to the state before run RUN_ID (queues in input file are not used)') 
     p.add_argument( '--verbose', '-v', action="count",  required=False, default=0,
                 help='Verbose output. use -vvv for tracing')
+    ProfileHandler.add_arguments(p, 'write Chrome trace-event JSON (queues, SEMP calls, local phases) to this file')
     r = p.parse_args()
 
+    if r.prune and not r.owned:
+        print ('ERROR: --prune requires --owned')
+        sys.exit(1)
+    # an empty prefix matches every queue in the VPN
+    if any(not pattern.strip() for pattern in r.owned):
+        print ('ERROR: --owned pattern can not be empty')
+        sys.exit(1)
+
+    ProfileHandler.run_main(r, me, run)
+
+def run(r):
+    """ create / update queues """
+
     print ('\n{}-{} Starting\n'.format(me,ver))
     print ("Reading input file: {}".format(r.input_file))
     yaml_h = YamlHandler.YamlHandler()
-    input_data = yaml_h.read_config_file(r.input_file)
+    with TraceHandler.span('yaml_load', file=r.input_file):
+        input_data = yaml_h.read_config_file(r.input_file)
     
     sys_cfg_file = input_data['system']['configFile']
     print ("Reading system config file: {}".format(sys_cfg_file))
 
-    system_config_all = yaml_h.read_config_file (sys_cfg_file)
+    with TraceHandler.span('yaml_load', file=sys_cfg_file):
+        system_config_all = yaml_h.read_config_file (sys_cfg_file)
     if r.verbose > 2:
         print ('SYSTEM CONFIG'); pp.pprint (system_config_all)
         
@@ -81,31 +137,135 @@ def main(argv):
 
     log_h = LogHandler.LogHandler(cfg)
     log = log_h.get()
+    TraceHandler.trace_logger(log)
     log.info('Starting {}-{}'.format(me, ver))
-    log.info ('SYSTEM CONFIG : {}'.format(json.dumps(system_config_all, indent=2)))
-    log.info ('Input Data    : {}'.format(json.dumps(input_data, indent=2)))
+    # full config / input only at debug (-v)
+    log.debug ('SYSTEM CONFIG : {}'.format(json.dumps(system_config_all)))
+    log.debug ('Input Data    : {}'.format(json.dumps(input_data)))
     # add this after dumping Cfg. josn.dumps() can't handle log object
     cfg['log_handler'] = log_h
 
-    # split input_df into regular queues and DLQs
-    # Add your logic here
-    q_list = input_data['queues']
-    #dmqs = input_df[input_df['queueName'].str.contains('(_DLQ)')]
+    # queue entries are expanded lazily (see common/QueueInput.py)
+    queue_files = input_data.get('queueFiles', []) + r.queues_files
+    queue_in = QueueInput.QueueInput(cfg, input_data.get('queues'), r.verbose, queue_files)
 
-    #log.info ('REGULAR QUEUES : {}'.format(json.dumps(q_list, indent=2)))
-    #log.info ('DMQS : {}'.format(json.dumps(dmqs['queueName'].to_dict(), indent=4)))
+    # subscription topics are checked locally before the first SEMP call
+    with TraceHandler.span('validate_topics'):
+        topic_errors = queue_in.validate()
+    if topic_errors:
+        for qname, errors in topic_errors.items():
+            log.error ('Invalid subscriptions in queue {}: {}'.format(qname, '; '.join(errors)))
+        log.error ('{} queues with invalid subscriptions. Nothing changed'.format(len(topic_errors)))
+        sys.exit(1)
+
+    ProfileHandler.phase('config_load')
 
     # create semp handler -- see common/SimpleSempHandler.py
-    semp_h = SempHandler.SempHandler(cfg, r.verbose)
+    semp_h = SempHandler.SempHandler(cfg, cfg['router']['vpn'], verbose=r.verbose)
 
     # create queue handlers
-    queue_h = QueueConfig2.Queues(semp_h, cfg, q_list, r.verbose)
-    #dmqueue_h = QueueConfig.Queues(semp_h, Cfg, dmqs, Verbose)
+    queue_h = QueueConfig2.Queues(semp_h, cfg, queue_in, r.verbose)
+
+    # drift check only. nothing is changed
+    if r.check_drift:
+        verify_queues(r, cfg, semp_h, queue_h, queue_in, 'drift')
+        return
+
+    # restore state saved before an earlier run
+    run_h = RunSnapshot.RunSnapshot(semp_h, cfg, r.verbose)
+    if r.rollback:
+        failed = run_h.rollback(r.rollback)
+        semp_h.print_stats()
+        if failed:
+            log.error ('Rollback of run {}: {} queues failed'.format(r.rollback, len(failed)))
+            sys.exit(1)
+        return
+
+    # prune plan. with --dry-run nothing is changed
+    if r.prune:
+        plan = queue_h.prune_plan(r.owned)
+        for qname in plan:
+            print ('Prune: {}'.format(qname))
+        max_deletions = r.max_deletions if r.max_deletions is not None else system_config_all['prune']['maxDeletions']
+        if len(plan) > max_deletions:
+            log.error ('Prune plan has {} queues, more than max deletions {}. Nothing changed'.format(len(plan), max_deletions))
+            sys.exit(4)
+        if r.dry_run:
+            log.notice ('Dry run: {} queues would be deleted'.format(len(plan)))
+            return
+
+    # pre-flight: plan must fit in VPN limits (endpoints, spool, subscriptions)
+    policy = r.capacity or system_config_all['capacity']['policy']
+    capacity_h = CapacityPlanner.CapacityPlanner(semp_h, cfg, r.verbose)
+    try:
+        with TraceHandler.span('capacity_plan'):
+            capacity = capacity_h.plan(queue_in, policy)
+    except ValueError as e:
+        log.error ('Unable to read limits of VPN {} ({}). Nothing changed'.format(cfg['router']['vpn'], e))
+        sys.exit(1)
+    capacity_h.print_report(capacity)
+    if not capacity['fits']:
+        if policy == 'reject':
+            log.error ('Plan exceeds limits of VPN {}. Nothing changed'.format(cfg['router']['vpn']))
+            sys.exit(5)
+        if policy == 'warn':
+            log.warn ('Plan exceeds limits of VPN {}. Applying anyway (policy: warn)'.format(cfg['router']['vpn']))
+    queue_defs = None
+    if capacity['skipped']:
+        queue_defs = capacity['queue_defs']
+    desired = queue_defs if queue_defs is not None else queue_in
+
+    # save prior state of queues in input (see --rollback)
+    # no snapshot, no writes: a failed read would make rollback unsafe
+    try:
+        run_id = run_h.capture(desired, plan if r.prune else None)
+    except ValueError as e:
+        log.error ('Unable to save prior state ({}). Nothing changed'.format(e))
+        sys.exit(1)
+    print ('Run id: {} (undo with --rollback {})'.format(run_id, run_id))
 
     # create / update queues
-    # Create DMQs followed by regular queues
-    #dmqueue_h.create_or_update_dmqueue ( r.patch_it)
-    queue_h.create_or_update_queue   ( r.patch_it)
+    # DMQs referenced by the queues are created first (once each, templates.dmqueue)
+    with TraceHandler.span('create_or_update_queue'):
+        queue_h.create_or_update_queue   ( r.patch_it, queue_defs)
+    failed = set(queue_h.failed_queues)
+    if r.prune and plan:
+        with TraceHandler.span('prune_queues'):
+            queue_h.prune_queues(plan)
+        failed.update(queue_h.failed_queues)
+    semp_h.print_stats()
+    ProfileHandler.phase('queue_loop')
+    if failed:
+        log.error ('{} queues failed: {}'.format(len(failed), ', '.join(sorted(failed))))
+        sys.exit(1)
+
+    # verify broker config matches expanded templates
+    if r.verify:
+        verify_queues(r, cfg, semp_h, queue_h, desired, 'verify')
+
+def verify_queues(r, cfg, semp_h, queue_h, queue_in, mode):
+    """ compare broker with expanded input. exit code 3 on drift, 7 if the broker can't be read """
+
+    log = cfg['log_handler'].get()
+    verify_h = QueueVerifier.QueueVerifier(semp_h, cfg, queue_h, r.verbose)
+    try:
+        with TraceHandler.span(mode):
+            report = verify_h.verify(queue_in)
+    except ValueError as e:
+        log.error ('{}: unable to read broker config ({}). Not checked'.format(mode.capitalize(), e))
+        sys.exit(7)
+    verify_h.print_report(report)
+    if mode == 'drift':
+        # only queues that drifted
+        report = {q: rpt for q, rpt in report.items() if rpt['status'] != 'PASS'}
+    verify_h.save_report(report, '{}/{}/{}-{}.json'.format(cfg['system']['system']['outputDir'], mode,
+                                                           cfg['router']['vpn'], LogHandler.ts()))
+    verify_h.print_stats()
+    ProfileHandler.phase('export')
+    if any(rpt['status'] != 'PASS' for rpt in report.values()):
+        log.error ('{}: broker config differs from input'.format(mode.capitalize()))
+        sys.exit(3)
+    log.notice ('{}: broker config matches input'.format(mode.capitalize()))
     
 # Program entry point
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+########################################################################
+# merge-queues
+#
+# Plans and applies queues from many input files (eg: one per team) as
+# one merged plan per router / VPN instead of applying each file on its
+# own (where the last file silently wins).
+#  - queues defined in several files are applied once (subscriptions
+#    of all files are merged)
+#  - queues with conflicting attribute values are reported and nothing
+#    is changed (exit code 6) unless --skip-conflicts
+#  - subscriptions of different files that overlap are reported
+# See common/QueuePlan.py
+#
+# Requirements:
+#  Python 3
+#  Modules: json, yaml, urllib3, requests
+#
+# Running:
+# Show merged plan, conflicts and overlaps (no changes):
+#   python3 merge-queues.py --input input/ --dry-run
+# Apply merged plan:
+#   python3 merge-queues.py --input input/team1.yaml --input input/team2.yaml --patch
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+########################################################################
+
+import sys, os
+import argparse
+import glob
+import pprint
+
+sys.path.insert(0, os.path.abspath("."))
+from common import LogHandler
+from common import SempHandler
+from common import QueueConfig2
+from common import QueuePlan
+from common import YamlHandler
+from common import TraceHandler
+from common import ProfileHandler
+
+
+pp = pprint.PrettyPrinter(indent=4)
+
+me = "merge-queues"
+ver = '1.0.0'
+
+# Define the minimum required Python version
+MIN_PYTHON_VERSION = (3, 6)
+
+
+def main(argv):
+    """ program entry drop point """
+
+    # parse command line arguments
+    p = argparse.ArgumentParser()
+    p.add_argument('--input', dest="inputs", action='append', required=True,
+                   help='user input Yaml file or directory of Yaml files. Can be repeated')
+    p.add_argument('--patch', dest="patch_it", action='store_true', required=False, default=False,
+                   help='update existing queues')
+    p.add_argument('--dry-run', dest="dry_run", action='store_true', required=False, default=False,
+                   help='print the merged plan, conflicts and overlaps and exit without changes')
+    p.add_argument('--skip-conflicts', dest="skip_conflicts", action='store_true', required=False, default=False,
+                   help='apply the plan without the conflicting queues (default: exit code 6, nothing changed)')
+    p.add_argument( '--verbose', '-v', action="count",  required=False, default=0,
+                help='Verbose output. use -vvv for tracing')
+    ProfileHandler.add_arguments(p, 'write Chrome trace-event JSON (queues, SEMP calls, local phases) to this file')
+    r = p.parse_args()
+
+    ProfileHandler.run_main(r, me, run)
+
+def input_files(inputs):
+    """ input files. directories are expanded to their *.yaml files """
+    files = []
+    for name in inputs:
+        if os.path.isdir(name):
+            files.extend(sorted(glob.glob(os.path.join(name, '*.yaml'))))
+        else:
+            files.append(name)
+    return files
+
+def run(r):
+    """ merge input files and apply one plan per router / vpn """
+
+    print ('\n{}-{} Starting\n'.format(me,ver))
+    yaml_h = YamlHandler.YamlHandler()
+    inputs = []
+    for fname in input_files(r.inputs):
+        print ("Reading input file: {}".format(fname))
+        input_data = yaml_h.read_config_file(fname)
+        if not input_data.get('queues') and not input_data.get('queueFiles'):
+            print ('No queues in {}. Skipped'.format(fname))
+            continue
+        inputs.append((fname, input_data))
+    if not inputs:
+        print ('ERROR: no input files with queues')
+        sys.exit(1)
+
+    # system config of the first file is used for all
+    sys_cfg_file = inputs[0][1]['system']['configFile']
+    print ("Reading system config file: {}".format(sys_cfg_file))
+    system_config_all = yaml_h.read_config_file (sys_cfg_file)
+
+    cfg = {}
+    cfg['script_name'] = me
+    cfg['verbose'] = r.verbose
+    cfg['system'] = system_config_all.copy()
+    # read password from environment variable
+    if os.environ.get('SEMP_PASSWORD') is None:
+        print ('ERROR: SEMP_PASSWORD environment variable not set')
+        sys.exit(1)
+    print ('Using SEMP_PASSWORD from environment')
+    cfg['router'] = {'sempPassword': os.environ.get('SEMP_PASSWORD')}
+
+    log_h = LogHandler.LogHandler(cfg)
+    log = log_h.get()
+    TraceHandler.trace_logger(log)
+    log.info('Starting {}-{}'.format(me, ver))
+    cfg['log_handler'] = log_h
+
+    plan_h = QueuePlan.QueuePlan(cfg, r.verbose)
+    for fname, input_data in inputs:
+        plan_h.add_file(fname, input_data)
+    if plan_h.errors:
+        for fname, errors in plan_h.errors.items():
+            for qname, e in errors.items():
+                log.error ('{}: invalid subscriptions in queue {}: {}'.format(fname, qname, '; '.join(e)))
+        log.error ('Invalid subscriptions. Nothing changed')
+        sys.exit(1)
+
+    report = plan_h.check()
+    plan_h.print_report(report)
+    plan_h.save_report(report, '{}/plan/merged-{}.json'.format(cfg['system']['system']['outputDir'], LogHandler.ts()))
+    plan_h.print_stats()
+    conflicts = sum(len(rpt['conflicts']) for rpt in report.values())
+    if conflicts and not r.skip_conflicts:
+        log.error ('{} conflicts in input files. Nothing changed'.format(conflicts))
+        sys.exit(6)
+    if r.dry_run:
+        log.notice ('Dry run: nothing changed')
+        return
+
+    # one pass per router / vpn
+    failed = 0
+    for key, group in plan_h.groups.items():
+        if 'templates.dmqueue' in group.conflicts:
+            group.cfg['templates'].pop('dmqueue', None) # DMQs are expected to exist
+        semp_h = SempHandler.SempHandler(group.cfg, key[1], verbose=r.verbose)
+        queue_h = QueueConfig2.Queues(semp_h, group.cfg, None, r.verbose)
+        queue_defs = list(group.queue_defs())
+        log.notice ('Applying {} queues to router {} vpn {}'.format(len(queue_defs), key[0], key[1]))
+        with TraceHandler.span('create_or_update_queue', router=key[0], vpn=key[1]):
+            queue_h.create_or_update_queue(r.patch_it, queue_defs)
+        failed = failed + len(queue_h.failed_queues)
+        semp_h.print_stats()
+    if failed:
+        log.error ('{} queues failed'.format(failed))
+        sys.exit(1)
+
+# Program entry point
+if __name__ == "__main__":
+    """ program entry point - must be  below main() """
+    # Check if the current Python version meets the requirement
+    if sys.version_info < MIN_PYTHON_VERSION:
+        print(f"This script requires Python {MIN_PYTHON_VERSION[0]}.{MIN_PYTHON_VERSION[1]} or later.")
+        print(f"Your Python version is {sys.version_info.major}.{sys.version_info.minor}.")
+        sys.exit(1)  # Exit the script with a non-zero status code
+
+    main(sys.argv[1:])
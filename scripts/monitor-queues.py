@@ -0,0 +1,124 @@
+########################################################################
+# monitor-queues
+#
+# This program polls queue depth / spool usage / bind count for all queues
+# in a VPN using SEMPv2 monitor API (bulk paged reads) and writes
+# delta encoded samples to a JSONL or CSV file.
+# Top-N queues by spool growth are reported after each poll.
+#
+# Requirements:
+#  Python 3
+#  Modules: json, yaml, urllib3, requests
+#
+# Running:
+#   python3 scripts/monitor-queues.py --input input/queues.yaml --output output/monitor/queues.jsonl
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+########################################################################
+
+import sys, os
+import argparse
+import json
+import pprint
+
+sys.path.insert(0, os.path.abspath("."))
+from common import LogHandler
+from common import SempHandler
+from common import QueueMonitor
+from common import YamlHandler
+from common import ProfileHandler
+from common import TraceHandler
+
+
+pp = pprint.PrettyPrinter(indent=4)
+
+me = "monitor-queues"
+ver = '1.0.0'
+
+# Define the minimum required Python version
+MIN_PYTHON_VERSION = (3, 6)
+
+
+def main(argv):
+    """ program entry drop point """
+
+    # parse command line arguments
+    p = argparse.ArgumentParser()
+    p.add_argument('--input', dest="input_file", required=True, 
+                   help='user input Yaml file (router info)') 
+    p.add_argument('--output', dest="output_file", required=False, default=None, 
+                   help='samples output file (default: <outputDir>/monitor/<vpn>-queues.<format>)') 
+    p.add_argument('--format', dest="fmt", choices=['jsonl', 'csv'], required=False, default='jsonl', 
+                   help='samples output format') 
+    p.add_argument('--interval', dest="interval", type=float, required=False, default=None, 
+                   help='poll interval in seconds (default: monitor.interval from system config)') 
+    p.add_argument('--count', dest="count", type=int, required=False, default=0, 
+                   help='number of polls. 0 to run forever') 
+    p.add_argument('--top', dest="top_n", type=int, required=False, default=None, 
+                   help='number of queues to report by spool growth (default: monitor.topN)') 
+    p.add_argument( '--verbose', '-v', action="count",  required=False, default=0,
+                help='Verbose output. use -vvv for tracing')
+    ProfileHandler.add_arguments(p, 'write Chrome trace-event JSON (SEMP calls, polls) to this file')
+    r = p.parse_args()
+
+    ProfileHandler.run_main(r, me, run)
+
+def run(r):
+    """ monitor queues """
+
+    print ('\n{}-{} Starting\n'.format(me,ver))
+    print ("Reading input file: {}".format(r.input_file))
+    yaml_h = YamlHandler.YamlHandler()
+    input_data = yaml_h.read_config_file(r.input_file)
+    
+    sys_cfg_file = input_data['system']['configFile']
+    print ("Reading system config file: {}".format(sys_cfg_file))
+    system_config_all = yaml_h.read_config_file (sys_cfg_file)
+
+    cfg = {}
+    cfg['script_name'] = me
+    cfg['verbose'] = r.verbose
+    cfg['system'] = system_config_all.copy()
+    cfg['router'] = input_data['router'].copy() 
+    # read password from environment variable
+    if os.environ.get('SEMP_PASSWORD') is None:
+        print ('ERROR: SEMP_PASSWORD environment variable not set')
+        sys.exit(1)
+    print ('Using SEMP_PASSWORD from environment')
+    cfg['router']['sempPassword'] = os.environ.get('SEMP_PASSWORD')
+
+    log_h = LogHandler.LogHandler(cfg)
+    log = log_h.get()
+    TraceHandler.trace_logger(log)
+    log.info('Starting {}-{}'.format(me, ver))
+    cfg['log_handler'] = log_h
+
+    mon_cfg = system_config_all['monitor']
+    interval = r.interval if r.interval is not None else mon_cfg['interval']
+    top_n = r.top_n if r.top_n is not None else mon_cfg['topN']
+    outfile = r.output_file
+    if outfile is None:
+        outfile = '{}/monitor/{}-queues.{}'.format(system_config_all['system']['outputDir'], cfg['router']['vpn'], r.fmt)
+
+    semp_h = SempHandler.SempHandler(cfg, cfg['router']['vpn'], verbose=r.verbose)
+    monitor_h = QueueMonitor.QueueMonitor(semp_h, cfg, r.verbose)
+    monitor_h.open_output(outfile, r.fmt)
+    try:
+        monitor_h.run(interval, r.count, top_n)
+    except KeyboardInterrupt:
+        print ('Interrupted')
+    finally:
+        monitor_h.close_output()
+    monitor_h.print_stats()
+    semp_h.print_stats()
+    
+# Program entry point
+if __name__ == "__main__":
+    """ program entry point - must be  below main() """
+    # Check if the current Python version meets the requirement
+    if sys.version_info < MIN_PYTHON_VERSION:
+        print(f"This script requires Python {MIN_PYTHON_VERSION[0]}.{MIN_PYTHON_VERSION[1]} or later.")
+        print(f"Your Python version is {sys.version_info.major}.{sys.version_info.minor}.")
+        sys.exit(1)  # Exit the script with a non-zero status code
+
+    main(sys.argv[1:])
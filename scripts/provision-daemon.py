@@ -0,0 +1,130 @@
+########################################################################
+# provision-daemon
+#
+# Long running version of create-queues2. Keeps SEMP connections and a
+# live index of the queues on the broker warm, watches an input
+# directory and / or takes reconcile requests on a local HTTP endpoint.
+# Only queues that changed in an input file are reconciled (patch mode).
+#
+# Requirements:
+#  Python 3
+#  Modules: json, yaml, urllib3, requests
+#
+# Running:
+# Watch input dir:
+#   python3 scripts/provision-daemon.py --input input/queues.yaml --watch input
+# Reconcile on request:
+#   python3 scripts/provision-daemon.py --input input/queues.yaml --port 8765
+#   curl -X POST -d '{"file": "input/queues.yaml"}' http://127.0.0.1:8765/reconcile
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+########################################################################
+
+import sys, os
+import argparse
+import json
+import pprint
+
+sys.path.insert(0, os.path.abspath("."))
+from common import LogHandler
+from common import SempHandler
+from common import QueueState
+from common import ProvisionDaemon
+from common import YamlHandler
+from common import ProfileHandler
+from common import TraceHandler
+
+
+pp = pprint.PrettyPrinter(indent=4)
+
+me = "provision-daemon"
+ver = '1.0.0'
+
+# Define the minimum required Python version
+MIN_PYTHON_VERSION = (3, 6)
+
+
+def main(argv):
+    """ program entry drop point """
+
+    # parse command line arguments
+    p = argparse.ArgumentParser()
+    p.add_argument('--input', dest="input_file", required=True, 
+                   help='user input Yaml file (router, templates and system config)') 
+    p.add_argument('--watch', dest="watch_dir", required=False, default=None, 
+                   help='input directory to watch for changed Yaml files') 
+    p.add_argument('--interval', dest="interval", type=float, required=False, default=2, 
+                   help='watch poll interval in seconds (default: 2)') 
+    p.add_argument('--port', dest="port", type=int, required=False, default=None, 
+                   help='local HTTP port for reconcile requests') 
+    p.add_argument('--refresh', dest="refresh", type=float, required=False, default=None, 
+                   help='reload broker queue index every N seconds (default: daemon.refresh in system config, 0: never)') 
+    p.add_argument( '--verbose', '-v', action="count",  required=False, default=0,
+                help='Verbose output. use -vvv for tracing')
+    ProfileHandler.add_arguments(p, 'write Chrome trace-event JSON (reconciles, SEMP calls) to this file')
+    r = p.parse_args()
+
+    if not r.watch_dir and not r.port:
+        print ('ERROR: --watch and / or --port is required')
+        sys.exit(1)
+
+    ProfileHandler.run_main(r, me, run)
+
+def run(r):
+    """ reconcile input files """
+
+    print ('\n{}-{} Starting\n'.format(me,ver))
+    print ("Reading input file: {}".format(r.input_file))
+    yaml_h = YamlHandler.YamlHandler()
+    input_data = yaml_h.read_config_file(r.input_file)
+    
+    sys_cfg_file = input_data['system']['configFile']
+    print ("Reading system config file: {}".format(sys_cfg_file))
+    system_config_all = yaml_h.read_config_file (sys_cfg_file)
+
+    cfg = {}
+    cfg['script_name'] = me
+    cfg['verbose'] = r.verbose
+    cfg['system'] = system_config_all.copy()
+    cfg['router'] = input_data['router'].copy() 
+    cfg['templates'] = input_data['templates'].copy()
+    # read password from environment variable
+    if os.environ.get('SEMP_PASSWORD') is None:
+        print ('ERROR: SEMP_PASSWORD environment variable not set')
+        sys.exit(1)
+    print ('Using SEMP_PASSWORD from environment')
+    cfg['router']['sempPassword'] = os.environ.get('SEMP_PASSWORD')
+
+    log_h = LogHandler.LogHandler(cfg)
+    log = log_h.get()
+    TraceHandler.trace_logger(log)
+    log.info('Starting {}-{}'.format(me, ver))
+    cfg['log_handler'] = log_h
+
+    semp_h = SempHandler.SempHandler(cfg, cfg['router']['vpn'], verbose=r.verbose)
+    state = QueueState.QueueState(semp_h, cfg, r.verbose)
+    daemon = ProvisionDaemon.ProvisionDaemon(semp_h, cfg, state, r.verbose)
+    state.load(daemon.state_attrs())
+
+    if r.port:
+        daemon.start_http(r.port)
+    try:
+        refresh = r.refresh if r.refresh is not None else system_config_all['daemon']['refresh']
+        daemon.run(r.watch_dir, r.interval, refresh)
+    except KeyboardInterrupt:
+        print ('Interrupted')
+    finally:
+        daemon.stop()
+    daemon.print_stats()
+    semp_h.print_stats()
+    
+# Program entry point
+if __name__ == "__main__":
+    """ program entry point - must be  below main() """
+    # Check if the current Python version meets the requirement
+    if sys.version_info < MIN_PYTHON_VERSION:
+        print(f"This script requires Python {MIN_PYTHON_VERSION[0]}.{MIN_PYTHON_VERSION[1]} or later.")
+        print(f"Your Python version is {sys.version_info.major}.{sys.version_info.minor}.")
+        sys.exit(1)  # Exit the script with a non-zero status code
+
+    main(sys.argv[1:])
@@ -0,0 +1,129 @@
+########################################################################
+# provision-objects
+#
+# Creates new or updates existing VPN objects (aclProfiles, clientProfiles,
+# clientUsernames, restDeliveryPoints, queues, ...) and their child
+# collections on a Solace PubSub+ broker using SEMPv2.
+# Object types are described in system config (schema) and all of them
+# are provisioned by one reconcile engine (see common/ObjectConfig.py):
+# one bulk read per type, concurrent writes, only changed attributes are
+# patched.
+#
+# Requirements:
+#  Python 3
+#  Modules: json, yaml, urllib3, requests
+#
+# Running:
+# Create objects:
+#   python3 provision-objects.py --input input/objects.yaml
+# Create / update objects (extra child objects are deleted):
+#   python3 provision-objects.py --input input/objects.yaml --patch
+# Only some types:
+#   python3 provision-objects.py --input input/objects.yaml --patch --type aclProfiles --type clientUsernames
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+########################################################################
+
+import sys, os
+import argparse
+import json
+import pprint
+
+sys.path.insert(0, os.path.abspath("."))
+from common import LogHandler
+from common import SempHandler
+from common import ObjectConfig
+from common import YamlHandler
+from common import TraceHandler
+from common import ProfileHandler
+
+
+pp = pprint.PrettyPrinter(indent=4)
+
+me = "provision-objects"
+ver = '1.0.0'
+
+# Define the minimum required Python version
+MIN_PYTHON_VERSION = (3, 6)
+
+
+def main(argv):
+    """ program entry drop point """
+
+    # parse command line arguments
+    p = argparse.ArgumentParser()
+    p.add_argument('--input', dest="input_file", required=True,
+                   help='user input Yaml file (objects and templates)')
+    p.add_argument('--patch', dest="patch_it", action='store_true', required=False, default=False,
+                   help='update existing objects and delete child objects not in input')
+    p.add_argument('--type', dest="types", action='append', required=False, default=[],
+                   help='provision only objects of this type (eg: aclProfiles). Can be repeated')
+    p.add_argument( '--verbose', '-v', action="count",  required=False, default=0,
+                help='Verbose output. use -vvv for tracing')
+    ProfileHandler.add_arguments(p, 'write Chrome trace-event JSON (objects, SEMP calls) to this file')
+    r = p.parse_args()
+
+    ProfileHandler.run_main(r, me, run)
+
+def run(r):
+    """ create / update objects """
+
+    print ('\n{}-{} Starting\n'.format(me,ver))
+    print ("Reading input file: {}".format(r.input_file))
+    yaml_h = YamlHandler.YamlHandler()
+    input_data = yaml_h.read_config_file(r.input_file)
+
+    sys_cfg_file = input_data['system']['configFile']
+    print ("Reading system config file: {}".format(sys_cfg_file))
+    system_config_all = yaml_h.read_config_file (sys_cfg_file)
+
+    cfg = {}
+    cfg['script_name'] = me
+    cfg['verbose'] = r.verbose
+    cfg['system'] = system_config_all.copy()
+    cfg['router'] = input_data['router'].copy()
+    cfg['templates'] = (input_data.get('templates') or {}).copy()
+    # read password from environment variable
+    if os.environ.get('SEMP_PASSWORD') is None:
+        print ('ERROR: SEMP_PASSWORD environment variable not set')
+        sys.exit(1)
+    print ('Using SEMP_PASSWORD from environment')
+    cfg['router']['sempPassword'] = os.environ.get('SEMP_PASSWORD')
+
+    log_h = LogHandler.LogHandler(cfg)
+    log = log_h.get()
+    TraceHandler.trace_logger(log)
+    log.info('Starting {}-{}'.format(me, ver))
+    log.debug ('Input Data    : {}'.format(json.dumps(input_data)))
+    cfg['log_handler'] = log_h
+
+    object_in = ObjectConfig.ObjectInput(cfg, input_data.get('objects'), r.verbose)
+    try:
+        types = object_in.types()
+    except ValueError as e:
+        log.error (str(e))
+        sys.exit(1)
+    unknown = [t for t in r.types if t not in types]
+    if unknown:
+        log.error ('No objects of type {} in input'.format(unknown))
+        sys.exit(1)
+
+    semp_h = SempHandler.SempHandler(cfg, cfg['router']['vpn'], verbose=r.verbose)
+    object_h = ObjectConfig.Objects(semp_h, cfg, r.verbose)
+    failed = object_h.apply(object_in, r.patch_it, r.types)
+    object_h.print_stats()
+    semp_h.print_stats()
+    if failed:
+        log.error ('{} objects failed'.format(len(failed)))
+        sys.exit(1)
+
+# Program entry point
+if __name__ == "__main__":
+    """ program entry point - must be  below main() """
+    # Check if the current Python version meets the requirement
+    if sys.version_info < MIN_PYTHON_VERSION:
+        print(f"This script requires Python {MIN_PYTHON_VERSION[0]}.{MIN_PYTHON_VERSION[1]} or later.")
+        print(f"Your Python version is {sys.version_info.major}.{sys.version_info.minor}.")
+        sys.exit(1)  # Exit the script with a non-zero status code
+
+    main(sys.argv[1:])
@@ -0,0 +1,119 @@
+########################################################################
+# provision-service
+#
+# Local provisioning API for self-service queue requests. Requests are
+# coalesced over a short window into one batch per router / VPN,
+# identical queue requests are deduplicated and each batch runs thru
+# one shared provisioning engine. Each caller gets its own results.
+#
+# Requirements:
+#  Python 3
+#  Modules: json, yaml, urllib3, requests
+#
+# Running:
+#   python3 scripts/provision-service.py --input input/queues.yaml --port 8766 --patch
+#   curl -X POST -d '{"queues": ["team1/q1", "team1/q2"]}' http://127.0.0.1:8766/queues
+#   curl -X POST -d '{"vpn": "vpn2", "queues": [{"name": "team2/q{1..3}", "template": {"maxTtl": 60}}]}' \
+#        http://127.0.0.1:8766/queues
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+########################################################################
+
+import sys, os
+import argparse
+import json
+import pprint
+
+sys.path.insert(0, os.path.abspath("."))
+from common import LogHandler
+from common import SempHandler
+from common import ProvisionService
+from common import YamlHandler
+from common import ProfileHandler
+from common import TraceHandler
+
+
+pp = pprint.PrettyPrinter(indent=4)
+
+me = "provision-service"
+ver = '1.0.0'
+
+# Define the minimum required Python version
+MIN_PYTHON_VERSION = (3, 6)
+
+
+def main(argv):
+    """ program entry drop point """
+
+    # parse command line arguments
+    p = argparse.ArgumentParser()
+    p.add_argument('--input', dest="input_file", required=True, 
+                   help='user input Yaml file (router, templates and system config)') 
+    p.add_argument('--port', dest="port", type=int, required=False, default=8766, 
+                   help='local HTTP port for provisioning requests (default: 8766)') 
+    p.add_argument('--window', dest="window", type=float, required=False, default=None, 
+                   help='seconds to coalesce requests into a batch (default: system service.window)') 
+    p.add_argument('--patch', dest="patch", action='store_true', required=False, default=False, 
+                   help='update existing queues') 
+    p.add_argument( '--verbose', '-v', action="count",  required=False, default=0,
+                help='Verbose output. use -vvv for tracing')
+    ProfileHandler.add_arguments(p, 'write Chrome trace-event JSON (batches, SEMP calls) to this file')
+    r = p.parse_args()
+
+    ProfileHandler.run_main(r, me, run)
+
+def run(r):
+    """ serve provisioning requests """
+
+    print ('\n{}-{} Starting\n'.format(me,ver))
+    print ("Reading input file: {}".format(r.input_file))
+    yaml_h = YamlHandler.YamlHandler()
+    input_data = yaml_h.read_config_file(r.input_file)
+    
+    sys_cfg_file = input_data['system']['configFile']
+    print ("Reading system config file: {}".format(sys_cfg_file))
+    system_config_all = yaml_h.read_config_file (sys_cfg_file)
+
+    cfg = {}
+    cfg['script_name'] = me
+    cfg['verbose'] = r.verbose
+    cfg['system'] = system_config_all.copy()
+    cfg['router'] = input_data['router'].copy() 
+    cfg['templates'] = input_data['templates'].copy()
+    # read password from environment variable
+    if os.environ.get('SEMP_PASSWORD') is None:
+        print ('ERROR: SEMP_PASSWORD environment variable not set')
+        sys.exit(1)
+    print ('Using SEMP_PASSWORD from environment')
+    cfg['router']['sempPassword'] = os.environ.get('SEMP_PASSWORD')
+
+    log_h = LogHandler.LogHandler(cfg)
+    log = log_h.get()
+    TraceHandler.trace_logger(log)
+    log.info('Starting {}-{}'.format(me, ver))
+    cfg['log_handler'] = log_h
+
+    semp_h = SempHandler.SempHandler(cfg, cfg['router']['vpn'], verbose=r.verbose)
+    window = r.window if r.window is not None else cfg['system'].get('service', {}).get('window', 0.5)
+    service = ProvisionService.ProvisionService(semp_h, cfg, window, r.patch, r.verbose)
+
+    service.start_http(r.port)
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        print ('Interrupted')
+    finally:
+        service.stop()
+    service.print_stats()
+    semp_h.print_stats()
+    
+# Program entry point
+if __name__ == "__main__":
+    """ program entry point - must be  below main() """
+    # Check if the current Python version meets the requirement
+    if sys.version_info < MIN_PYTHON_VERSION:
+        print(f"This script requires Python {MIN_PYTHON_VERSION[0]}.{MIN_PYTHON_VERSION[1]} or later.")
+        print(f"Your Python version is {sys.version_info.major}.{sys.version_info.minor}.")
+        sys.exit(1)  # Exit the script with a non-zero status code
+
+    main(sys.argv[1:])
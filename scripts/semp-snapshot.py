@@ -0,0 +1,162 @@
+########################################################################
+# semp-snapshot
+#
+# Export VPN config into a local SQLite snapshot db (one table per object
+# type, versioned by timestamp) and query / diff / restore snapshots
+# without re-reading JSON export trees.
+#
+# Requirements:
+#  Python 3
+#  Modules: json, yaml, urllib3, requests, sqlite3
+#
+# Running:
+# Export VPN (router / vpn from input file):
+#   python3 scripts/semp-snapshot.py --input input/queues.yaml --export
+# List snapshots:
+#   python3 scripts/semp-snapshot.py --input input/queues.yaml --list
+# Queues using DMQ dmq1 (latest snapshot):
+#   python3 scripts/semp-snapshot.py --input input/queues.yaml --query deadMsgQueue=dmq1 --type queues
+# Changes between snapshots 3 and 5:
+#   python3 scripts/semp-snapshot.py --input input/queues.yaml --diff 3 5
+# Restore snapshot 3 to router / vpn in input file:
+#   python3 scripts/semp-snapshot.py --input input/queues.yaml --restore 3
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+########################################################################
+
+import sys, os
+import argparse
+import json
+import pprint
+
+sys.path.insert(0, os.path.abspath("."))
+from common import LogHandler
+from common import SempHandler
+from common import SnapshotStore
+from common import YamlHandler
+from common import ProfileHandler
+from common import TraceHandler
+
+
+pp = pprint.PrettyPrinter(indent=4)
+
+me = "semp-snapshot"
+ver = '1.0.0'
+
+# Define the minimum required Python version
+MIN_PYTHON_VERSION = (3, 6)
+
+
+def main(argv):
+    """ program entry drop point """
+
+    # parse command line arguments
+    p = argparse.ArgumentParser()
+    p.add_argument('--input', dest="input_file", required=True, 
+                   help='user input Yaml file (router info)') 
+    p.add_argument('--db', dest="db_file", required=False, default=None, 
+                   help='snapshot db file (default: snapshot.dbFile from system config)') 
+    g = p.add_mutually_exclusive_group(required=True)
+    g.add_argument('--export', dest="export", action='store_true', default=False, 
+                   help='export VPN config to a new snapshot') 
+    g.add_argument('--list', dest="list", action='store_true', default=False, 
+                   help='list snapshots') 
+    g.add_argument('--query', dest="query", default=None, metavar='ATTR=VALUE',
+                   help='objects referencing VALUE thru ATTR (eg: deadMsgQueue=dmq1)') 
+    g.add_argument('--diff', dest="diff", type=int, nargs=2, default=None, metavar=('FROM', 'TO'),
+                   help='objects added / removed / changed between two snapshots') 
+    g.add_argument('--restore', dest="restore", type=int, default=None, metavar='SNAPSHOT',
+                   help='apply snapshot to router / vpn in input file') 
+    p.add_argument('--type', dest="obj_type", required=False, default=None, 
+                   help='with --query: limit to object type (eg: queues)') 
+    p.add_argument('--snapshot', dest="snapshot", type=int, required=False, default=None, 
+                   help='with --query: snapshot id (default: latest)') 
+    p.add_argument( '--verbose', '-v', action="count",  required=False, default=0,
+                help='Verbose output. use -vvv for tracing')
+    ProfileHandler.add_arguments(p, 'write Chrome trace-event JSON (SEMP calls, local phases) to this file')
+    r = p.parse_args()
+
+    ProfileHandler.run_main(r, me, run)
+
+def run(r):
+    """ take / diff / restore snapshots """
+
+    print ('\n{}-{} Starting\n'.format(me,ver))
+    print ("Reading input file: {}".format(r.input_file))
+    yaml_h = YamlHandler.YamlHandler()
+    input_data = yaml_h.read_config_file(r.input_file)
+    
+    sys_cfg_file = input_data['system']['configFile']
+    print ("Reading system config file: {}".format(sys_cfg_file))
+    system_config_all = yaml_h.read_config_file (sys_cfg_file)
+
+    cfg = {}
+    cfg['script_name'] = me
+    cfg['verbose'] = r.verbose
+    cfg['system'] = system_config_all.copy()
+    cfg['router'] = input_data['router'].copy() 
+    # semp_apply settings: post everything (no filter / patch / delete)
+    cfg['applyFilter'] = None
+    cfg['deleting'] = False
+    cfg['patching'] = False
+    cfg['items'] = []
+
+    log_h = LogHandler.LogHandler(cfg)
+    log = log_h.get()
+    TraceHandler.trace_logger(log)
+    log.info('Starting {}-{}'.format(me, ver))
+    cfg['log_handler'] = log_h
+
+    store = SnapshotStore.SnapshotStore(cfg, r.db_file or system_config_all['snapshot']['dbFile'], r.verbose)
+
+    if r.list:
+        for sid, ts, router, vpn in store.snapshots():
+            print ('{:>6}  {}  {}  {}'.format(sid, ts, router, vpn))
+        return
+
+    if r.query:
+        attr, _, value = r.query.partition('=')
+        snapshot = r.snapshot or store.latest()
+        rows = store.find_refs(attr, value, snapshot, r.obj_type)
+        print ('{} objects with {} = {} (snapshot {})'.format(len(rows), attr, value, snapshot))
+        for obj_type, vpn, name in rows:
+            print ('  {:<24} {:<16} {}'.format(obj_type, vpn, name))
+        return
+
+    if r.diff:
+        diff = store.diff(r.diff[0], r.diff[1])
+        print (json.dumps(diff, indent=2, sort_keys=True))
+        return
+
+    # export / restore need the broker
+    if os.environ.get('SEMP_PASSWORD') is None:
+        print ('ERROR: SEMP_PASSWORD environment variable not set')
+        sys.exit(1)
+    print ('Using SEMP_PASSWORD from environment')
+    cfg['router']['sempPassword'] = os.environ.get('SEMP_PASSWORD')
+
+    vpn = cfg['router']['vpn']
+    semp_h = SempHandler.SempHandler(cfg, vpn, verbose=r.verbose)
+    vpn_url = '{}/{}/{}'.format(cfg['router']['sempUrl'], system_config_all['semp']['vpnConfigUrl'], vpn)
+
+    if r.export:
+        semp_h.store = store
+        store.begin(cfg['router']['sempUrl'], vpn)
+        json_data = semp_h.get_link_data(vpn_url, False)
+        semp_h.process_page_links(json_data)
+        store.end()
+    else:
+        store.restore(semp_h, vpn_url, r.restore)
+    store.print_stats()
+    semp_h.print_stats()
+    
+# Program entry point
+if __name__ == "__main__":
+    """ program entry point - must be  below main() """
+    # Check if the current Python version meets the requirement
+    if sys.version_info < MIN_PYTHON_VERSION:
+        print(f"This script requires Python {MIN_PYTHON_VERSION[0]}.{MIN_PYTHON_VERSION[1]} or later.")
+        print(f"Your Python version is {sys.version_info.major}.{sys.version_info.minor}.")
+        sys.exit(1)  # Exit the script with a non-zero status code
+
+    main(sys.argv[1:])
@@ -0,0 +1,172 @@
+########################################################################
+# subscription-index
+#
+# Builds a trie index of queue subscriptions (Solace '*' and '>' aware)
+# from the input file or from the broker and answers:
+#   - which queues attract a topic (--match)
+#   - which subscriptions overlap or shadow each other (--overlap)
+#   - bulk match of sample topics for capacity planning (--match-file)
+#
+# Requirements:
+#  Python 3
+#  Modules: json, yaml, urllib3, requests
+#
+# Running:
+#   python3 scripts/subscription-index.py --input input/queues.yaml --match orders/us/new
+#   python3 scripts/subscription-index.py --input input/queues.yaml --overlap 'orders/*/new'
+#   python3 scripts/subscription-index.py --input input/queues.yaml --overlap
+#   python3 scripts/subscription-index.py --input input/queues.yaml --from-broker --match-file topics.txt
+#
+# Ramesh Natarajan (nram), Solace PSG (ramesh.natarajan@solace.com)
+########################################################################
+
+import sys, os
+import argparse
+import json
+import time
+import pprint
+
+sys.path.insert(0, os.path.abspath("."))
+from common import LogHandler
+from common import SempHandler
+from common import QueueInput
+from common import QueueVerifier
+from common import SubscriptionIndex
+from common import YamlHandler
+from common import ProfileHandler
+from common import TraceHandler
+
+
+pp = pprint.PrettyPrinter(indent=4)
+
+me = "subscription-index"
+ver = '1.0.0'
+
+# Define the minimum required Python version
+MIN_PYTHON_VERSION = (3, 6)
+
+
+def main(argv):
+    """ program entry drop point """
+
+    # parse command line arguments
+    p = argparse.ArgumentParser()
+    p.add_argument('--input', dest="input_file", required=True, 
+                   help='user input Yaml file') 
+    p.add_argument('--from-broker', dest="from_broker", action='store_true', required=False, default=False, 
+                   help='index subscriptions of all queues in the VPN instead of the input queues') 
+    p.add_argument('--match', dest="match", action='append', required=False, default=[], 
+                   help='queues attracting this topic. Can be repeated') 
+    p.add_argument('--overlap', dest="overlap", nargs='?', const='', required=False, default=None, 
+                   help='subscriptions overlapping this subscription (all overlapping pairs if no value)') 
+    p.add_argument('--match-file', dest="match_file", required=False, default=None, 
+                   help='file with sample topics (one per line). Reports topics per queue and unmatched topics') 
+    p.add_argument('--top', dest="top_n", type=int, required=False, default=20, 
+                   help='with --match-file: number of queues to report (default: 20)') 
+    p.add_argument( '--verbose', '-v', action="count",  required=False, default=0,
+                help='Verbose output. use -vvv for tracing')
+    ProfileHandler.add_arguments(p, 'write Chrome trace-event JSON (SEMP calls, local phases) to this file')
+    r = p.parse_args()
+
+    ProfileHandler.run_main(r, me, run)
+
+def run(r):
+    """ build and query the subscription index """
+
+    print ('\n{}-{} Starting\n'.format(me,ver))
+    print ("Reading input file: {}".format(r.input_file))
+    yaml_h = YamlHandler.YamlHandler()
+    input_data = yaml_h.read_config_file(r.input_file)
+    
+    sys_cfg_file = input_data['system']['configFile']
+    print ("Reading system config file: {}".format(sys_cfg_file))
+    system_config_all = yaml_h.read_config_file (sys_cfg_file)
+
+    cfg = {}
+    cfg['script_name'] = me
+    cfg['verbose'] = r.verbose
+    cfg['system'] = system_config_all.copy()
+    cfg['router'] = input_data['router'].copy() 
+    cfg['templates'] = input_data['templates'].copy()
+
+    log_h = LogHandler.LogHandler(cfg)
+    log = log_h.get()
+    TraceHandler.trace_logger(log)
+    log.info('Starting {}-{}'.format(me, ver))
+    cfg['log_handler'] = log_h
+
+    index = SubscriptionIndex.SubscriptionIndex()
+    t0 = time.time()
+    if r.from_broker:
+        # read password from environment variable
+        if os.environ.get('SEMP_PASSWORD') is None:
+            print ('ERROR: SEMP_PASSWORD environment variable not set')
+            sys.exit(1)
+        cfg['router']['sempPassword'] = os.environ.get('SEMP_PASSWORD')
+        semp_h = SempHandler.SempHandler(cfg, cfg['router']['vpn'], verbose=r.verbose)
+        verify_h = QueueVerifier.QueueVerifier(semp_h, cfg, None, r.verbose)
+        qnames = list(verify_h.read_queues([]).keys())
+        for qname, topics in verify_h.read_subscriptions(qnames).items():
+            index.add_queue(qname, topics)
+        semp_h.print_stats()
+    else:
+        queue_in = QueueInput.QueueInput(cfg, input_data.get('queues'), r.verbose, input_data.get('queueFiles', []))
+        for data in queue_in:
+            index.add_queue(data['queueName'], [t for t in data.get('subscriptionTopic', '').split(':') if t])
+    log.notice ('Indexed {} subscriptions of {} queues in {:.2f}s'.format(index.count, len(index.queues), time.time() - t0))
+
+    for topic in r.match:
+        found = sorted(index.match(topic))
+        print ('{} : {} queues'.format(topic, len(set(q for q, _ in found))))
+        for qname, sub in found:
+            print ('   {:<40} {}'.format(qname, sub))
+
+    if r.overlap is not None:
+        if r.overlap:
+            pairs = [((None, r.overlap), (q, s), rel) for q, s, rel in index.overlaps(r.overlap)]
+        else:
+            pairs = []
+            seen = set()
+            for node_subs in all_subs(index):
+                for q, s, rel in index.overlaps(node_subs[1]):
+                    pair = frozenset([node_subs, (q, s)])
+                    if (q, s) == node_subs or pair in seen:
+                        continue
+                    seen.add(pair)
+                    pairs.append((node_subs, (q, s), rel))
+        print ('{} overlapping subscriptions'.format(len(pairs)))
+        for (q1, s1), (q2, s2), rel in pairs:
+            same = ' (same queue)' if q1 == q2 else ''
+            print ('   {} {} {} {} {}{}'.format(q1 or '', s1, rel, q2, s2, same))
+
+    if r.match_file:
+        t0 = time.time()
+        n, per_queue, unmatched = index.match_file(r.match_file)
+        log.notice ('Matched {} topics in {:.2f}s'.format(n, time.time() - t0))
+        print ('Top {} queues by matching topics:'.format(r.top_n))
+        for qname, count in per_queue.most_common(r.top_n):
+            print ('   {:>8} {:6.1f}%  {}'.format(count, 100.0 * count / max(1, n), qname))
+        print ('{} of {} topics match no queue'.format(len(unmatched), n))
+        for topic in unmatched[:r.top_n]:
+            print ('   {}'.format(topic))
+
+def all_subs(index):
+    """ all (queueName, subscription) in index """
+    stack = [index.root]
+    while stack:
+        node = stack.pop()
+        yield from node.subs
+        yield from node.rest
+        stack.extend(node.children.values())
+        stack.extend(node.prefixes.values())
+    
+# Program entry point
+if __name__ == "__main__":
+    """ program entry point - must be  below main() """
+    # Check if the current Python version meets the requirement
+    if sys.version_info < MIN_PYTHON_VERSION:
+        print(f"This script requires Python {MIN_PYTHON_VERSION[0]}.{MIN_PYTHON_VERSION[1]} or later.")
+        print(f"Your Python version is {sys.version_info.major}.{sys.version_info.minor}.")
+        sys.exit(1)  # Exit the script with a non-zero status code
+
+    main(sys.argv[1:])